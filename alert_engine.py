@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+套利机会提醒模块
+后台轮询每完成一轮扫描，把有变化的套利机会与所有用户的自选基金和提醒阈值匹配，
+批量创建站内通知；匹配通过 基金代码 -> 订阅用户 的倒排索引进行，
+开销与套利机会数量成正比，与用户数无关
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from notification_manager import NotificationType
+
+
+class AlertEngine:
+    """套利机会提醒引擎"""
+    
+    def __init__(self, notification_manager, user_manager, config: Dict = None):
+        """
+        初始化提醒引擎
+        
+        Args:
+            notification_manager: 通知管理器
+            user_manager: 用户管理器（读取自选基金和用户设置）
+            config: DATA_SOURCE['alerts'] 配置，格式：
+                {
+                    'enabled': True,
+                    'min_profit_rate': 5.0,  # 默认提醒阈值（收益率%），用户设置 alert_min_profit_rate 可覆盖
+                    'window': 300,           # 同一基金的提醒间隔（秒）
+                }
+        """
+        config = config or {}
+        self.notification_manager = notification_manager
+        self.user_manager = user_manager
+        self.enabled = config.get('enabled', True)
+        self.min_profit_rate = config.get('min_profit_rate', 5.0)
+        self.window = config.get('window', 300)
+        
+        # 基金代码 -> [(提醒阈值, 用户名), ...]（按阈值升序），None表示需要重建
+        self._index: Optional[Dict[str, List[Tuple[float, str]]]] = None
+        self._lock = threading.Lock()
+    
+    def invalidate(self):
+        """用户的自选基金或设置变化后调用，下次匹配时重建索引"""
+        with self._lock:
+            self._index = None
+    
+    def get_threshold(self, username: str) -> Optional[float]:
+        """
+        用户的提醒阈值（收益率%）
+        
+        Returns:
+            阈值；用户关闭了提醒返回None
+        """
+        settings = self.user_manager.get_user_settings(username)
+        if settings.get('alert_enabled', True) is False:
+            return None
+        try:
+            return float(settings.get('alert_min_profit_rate', self.min_profit_rate))
+        except (TypeError, ValueError):
+            return self.min_profit_rate
+    
+    def _build_index(self) -> Dict[str, List[Tuple[float, str]]]:
+        index: Dict[str, List[Tuple[float, str]]] = {}
+        for user in self.user_manager.list_all_users():
+            username = user['username']
+            threshold = self.get_threshold(username)
+            if threshold is None:
+                continue
+            for fund_code in set(self.user_manager.get_user_favorites(username)):
+                index.setdefault(fund_code, []).append((threshold, username))
+        for subscribers in index.values():
+            subscribers.sort()
+        return index
+    
+    def _get_index(self) -> Dict[str, List[Tuple[float, str]]]:
+        with self._lock:
+            if self._index is None:
+                self._index = self._build_index()
+            return self._index
+    
+    def process(self, results: List[Dict]) -> int:
+        """
+        为订阅了相应基金的用户发送套利机会提醒（在后台轮询线程中调用）
+        
+        Args:
+            results: 本轮有变化的套利结果
+        
+        Returns:
+            创建的通知数
+        """
+        if not self.enabled:
+            return 0
+        index = self._get_index()
+        created = 0
+        for result in results:
+            if not result.get('has_opportunity'):
+                continue
+            subscribers = index.get(result.get('fund_code'))
+            if not subscribers:
+                continue
+            profit_rate = result.get('profit_rate', 0)
+            usernames = []
+            for threshold, username in subscribers:
+                # 阈值升序，后面的用户阈值更高
+                if profit_rate <= threshold:
+                    break
+                if self.notification_manager.should_notify(username, result['fund_code'], self.window):
+                    usernames.append(username)
+            if usernames:
+                self._notify(usernames, result)
+                created += len(usernames)
+        return created
+    
+    def notify_user(self, username: str, results: List[Dict]) -> int:
+        """
+        为单个用户检查一组结果并发送提醒（未开启后台轮询时由请求线程调用，不限自选基金）
+        
+        Args:
+            username: 用户名
+            results: 套利结果列表
+        
+        Returns:
+            创建的通知数
+        """
+        threshold = self.get_threshold(username)
+        if not self.enabled or threshold is None:
+            return 0
+        created = 0
+        for result in results:
+            if not result.get('has_opportunity') or result.get('profit_rate', 0) <= threshold:
+                continue
+            if self.notification_manager.should_notify(username, result.get('fund_code', ''), self.window):
+                self._notify([username], result)
+                created += 1
+        return created
+    
+    def _notify(self, usernames: List[str], result: Dict):
+        fund_code = result.get('fund_code', '')
+        fund_name = result.get('fund_name', fund_code)
+        arbitrage_type = result.get('arbitrage_type', '')
+        profit_rate = result.get('profit_rate', 0)
+        try:
+            self.notification_manager.create_notifications(
+                usernames,
+                notification_type=NotificationType.ARBITRAGE_OPPORTUNITY,
+                title=f'发现套利机会：{fund_name} ({fund_code})',
+                content=f'{arbitrage_type}，预期收益率 {profit_rate:.2f}%',
+                data={
+                    'fund_code': fund_code,
+                    'fund_name': fund_name,
+                    'arbitrage_type': arbitrage_type,
+                    'profit_rate': profit_rate,
+                    'price': result.get('price'),
+                    'nav': result.get('nav'),
+                    'price_diff_pct': result.get('price_diff_pct')
+                }
+            )
+        except Exception as e:
+            print(f"发送套利机会通知失败: {e}")
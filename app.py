@@ -3,15 +3,24 @@
 LOF基金套利工具 - Web界面
 """
 
-from flask import Flask, render_template, jsonify, request, session
+from flask import Flask, Response, render_template, jsonify, request, session, stream_with_context
 from functools import wraps
-from data_fetcher import LOFDataFetcher, MockDataFetcher
+from data_fetcher import LOFDataFetcher, MockDataFetcher, classify_fund_type
 from arbitrage_calculator import ArbitrageCalculator
 from arbitrage_recorder import ArbitrageRecorder
 from user_manager import UserManager
 from notification_manager import NotificationManager, NotificationType
+from market_poller import MarketPoller
+from alert_engine import AlertEngine
+from trading_calendar import create_scheduler
+from fund_universe import FundUniverse
+from fund_name_resolver import FundNameResolver, has_chinese_name
+from http_pool import pool_stats
+from tracing import tracer, trace
+from async_data_fetcher import AsyncLOFDataFetcher, AIOHTTP_AVAILABLE
 from config import LOF_FUNDS, DATA_SOURCE, TRADE_FEES, ARBITRAGE_THRESHOLD
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
 import threading
 import time
 import secrets
@@ -27,6 +36,8 @@ calculator = None
 arbitrage_recorder = ArbitrageRecorder()
 user_manager = UserManager()
 notification_manager = NotificationManager()
+# 套利机会提醒：后台每轮扫描后按自选基金和提醒阈值批量通知所有用户
+alert_engine = AlertEngine(notification_manager, user_manager, DATA_SOURCE.get('alerts', {}))
 
 
 # 登录验证装饰器
@@ -57,8 +68,7 @@ def admin_required(f):
             }), 401
         
         username = session.get('username')
-        user = user_manager.get_user(username)
-        if not user or user.get('role') != 'admin':
+        if user_manager.get_role(username) != 'admin':
             return jsonify({
                 'success': False,
                 'message': '需要管理员权限',
@@ -78,27 +88,12 @@ def init_fetcher(mock=False):
     else:
         # 从配置获取Tushare token（优先级：环境变量 > fund_list_sources > tushare_token）
         import os
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'app.py:init_fetcher:entry',
-            'message': '开始初始化数据获取器',
-            'data': {
-                'use_tushare': DATA_SOURCE.get('use_tushare'),
-                'env_token_exists': 'TUSHARE_TOKEN' in os.environ,
-                'config_token': DATA_SOURCE.get('tushare_token', '')[:10] + '...' if DATA_SOURCE.get('tushare_token') else None,
-                'fund_list_token_exists': 'fund_list_sources' in DATA_SOURCE and 'tushare' in DATA_SOURCE.get('fund_list_sources', {})
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:init_fetcher:entry', '开始初始化数据获取器', {
+            'use_tushare': DATA_SOURCE.get('use_tushare'),
+            'env_token_exists': 'TUSHARE_TOKEN' in os.environ,
+            'config_token_exists': bool(DATA_SOURCE.get('tushare_token')),
+            'fund_list_token_exists': 'fund_list_sources' in DATA_SOURCE and 'tushare' in DATA_SOURCE.get('fund_list_sources', {})
+        })
         
         # 优先级1：环境变量
         tushare_token = os.environ.get('TUSHARE_TOKEN')
@@ -117,26 +112,12 @@ def init_fetcher(mock=False):
             tushare_token = DATA_SOURCE.get('tushare_token')
             token_source = 'tushare_token'
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'app.py:init_fetcher:token_resolved',
-            'message': 'Token解析完成',
-            'data': {
-                'token_source': token_source,
-                'token_length': len(tushare_token) if tushare_token else 0,
-                'token_preview': tushare_token[:20] + '...' if tushare_token and len(tushare_token) > 20 else tushare_token,
-                'token_is_placeholder': tushare_token and 'your_tushare_token' in tushare_token.lower() if tushare_token else False
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:init_fetcher:token_resolved', 'Token解析完成', {
+            'token_source': token_source,
+            'token_length': len(tushare_token) if tushare_token else 0,
+            'has_token': bool(tushare_token),
+            'token_is_placeholder': tushare_token and 'your_tushare_token' in tushare_token.lower() if tushare_token else False
+        })
         
         data_fetcher = LOFDataFetcher(tushare_token=tushare_token)
     calculator = ArbitrageCalculator()
@@ -146,73 +127,173 @@ def init_fetcher(mock=False):
 init_fetcher()
 
 # 启动时自动发现所有LOF基金
+# 自动发现的基金列表缓存（启动时直接加载，后台按天刷新）
+fund_universe_config = DATA_SOURCE.get('fund_universe', {})
+fund_universe = FundUniverse(
+    cache_file=fund_universe_config.get('cache_file', 'fund_universe.json'),
+    max_age=fund_universe_config.get('max_age', 86400),
+    retry_interval=fund_universe_config.get('retry_interval', 3600)
+)
+
+
+def resolve_fund_name(fund_code: str):
+    """逐个解析基金中文名称（后台补全线程调用，模拟数据模式下不请求）"""
+    if use_mock_data:
+        return None
+    return data_fetcher.get_fund_chinese_name(fund_code)
+
+
+def resolve_fund_names(fund_codes: list) -> dict:
+    """批量解析基金中文名称（后台补全线程调用，模拟数据模式下不请求）"""
+    if use_mock_data:
+        return {}
+    return data_fetcher.get_fund_chinese_names(fund_codes)
+
+
+# 基金中文名称字典：接口只查字典，缺失的名称由后台线程限速补全
+name_resolver_config = DATA_SOURCE.get('name_resolver', {})
+fund_name_resolver = FundNameResolver(
+    resolve_func=resolve_fund_name,
+    bulk_resolve_func=resolve_fund_names,
+    names_file=name_resolver_config.get('names_file', 'fund_names.json'),
+    rate_per_minute=name_resolver_config.get('rate_per_minute', 30),
+    retry_interval=name_resolver_config.get('retry_interval', 86400)
+)
+
+
+def get_fund_name(fund_code: str) -> str:
+    """
+    基金显示名称（名称字典 > 基金列表中的中文名称 > 基金列表中的名称 > 基金代码），不发请求
+    
+    列表中的名称不是中文时登记到后台补全
+    """
+    name = fund_name_resolver.get(fund_code)
+    if name:
+        return name
+    name = LOF_FUNDS.get(fund_code, '')
+    if not has_chinese_name(name) and name_resolver_config.get('enabled', True):
+        fund_name_resolver.request([fund_code])
+    return name or fund_code
+
+
+def discover_funds_in_background():
+    """后台刷新线程调用的发现函数（模拟数据模式下不发现）"""
+    if use_mock_data:
+        return None
+    return data_fetcher.get_lof_funds_list()
+
+
 def auto_discover_funds():
-    """启动时自动发现所有LOF基金"""
+    """启动时加载本地缓存的LOF基金列表，缓存过期时由后台线程重新发现（首个请求时启动，不阻塞启动）"""
     global LOF_FUNDS
     
-    # #region agent log
-    import json
-    log_data = {
-        'sessionId': 'debug-session',
-        'runId': 'run1',
-        'hypothesisId': 'A',
-        'location': 'app.py:auto_discover_funds:entry',
-        'message': '开始自动发现LOF基金',
-        'data': {'initial_funds_count': len(LOF_FUNDS)},
-        'timestamp': int(time.time() * 1000)
-    }
-    try:
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-    except: pass
-    # #endregion
+    trace('app.py:auto_discover_funds:entry', '开始自动发现LOF基金', {'initial_funds_count': len(LOF_FUNDS)})
     
     if not use_mock_data:
-        try:
-            funds_list = data_fetcher.get_lof_funds_list()
-            if funds_list:
-                funds_dict = {fund['code']: fund['name'] for fund in funds_list}
-                LOF_FUNDS.update(funds_dict)
-                
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'A',
-                    'location': 'app.py:auto_discover_funds:success',
-                    'message': '自动发现LOF基金完成',
-                    'data': {'discovered_count': len(funds_dict), 'total_count': len(LOF_FUNDS)},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
-                
-                print(f"自动发现 {len(funds_dict)} 只LOF基金，总计 {len(LOF_FUNDS)} 只")
-        except Exception as e:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'A',
-                'location': 'app.py:auto_discover_funds:error',
-                'message': '自动发现LOF基金失败',
-                'data': {'error': str(e)},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
-            print(f"自动发现LOF基金失败: {e}")
+        cached_funds = fund_universe.load()
+        if cached_funds:
+            LOF_FUNDS.update(cached_funds)
+            trace('app.py:auto_discover_funds:cache_loaded', '已加载本地基金列表缓存', {'cached_count': len(cached_funds), 'total_count': len(LOF_FUNDS)})
+            print(f"从本地缓存加载 {len(cached_funds)} 只LOF基金，总计 {len(LOF_FUNDS)} 只")
 
 # 启动时自动发现
 auto_discover_funds()
 
 
+def scan_funds(fund_codes: list) -> dict:
+    """
+    获取并计算一组基金的套利结果
+    
+    Args:
+        fund_codes: 基金代码列表
+        
+    Returns:
+        字典，key为基金代码，value为套利结果（无法获取数据时为None）
+    """
+    # 每轮扫描批量取一次限购信息（查索引，不逐个请求）
+    try:
+        purchase_limits = data_fetcher.get_fund_purchase_limits(fund_codes, fallback=False)
+    except Exception as e:
+        print(f"批量获取限购信息失败: {e}")
+        purchase_limits = {}
+    
+    def decorate(fund_code: str, result: dict):
+        """为套利结果补充限购信息和基金名称"""
+        if not result:
+            return None
+        
+        # 限购信息：本轮扫描开始时从申购信息索引批量取出，按基金代码合并
+        result['purchase_limit'] = purchase_limits.get(fund_code) or {
+            'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购', 'limit_as_of': None
+        }
+        result['limit_as_of'] = result['purchase_limit'].get('limit_as_of')
+        
+        # 基金名称只查名称字典，缺失的中文名称由后台线程补全
+        result['fund_name'] = get_fund_name(fund_code)
+        return result
+    
+    # 异步抓取引擎：所有请求在一个事件循环中并发完成，不受线程数限制
+    if (DATA_SOURCE.get('fetch_engine') == 'async' and AIOHTTP_AVAILABLE and
+            isinstance(data_fetcher, LOFDataFetcher)):
+        fund_infos = AsyncLOFDataFetcher(data_fetcher).scan(
+            fund_codes, use_snapshot=DATA_SOURCE.get('use_market_snapshot', True))
+    else:
+        # 市场快照模式：一次（分页）批量拉取全市场套利数据，快照中缺失的基金再逐个回退获取
+        snapshot = None
+        if DATA_SOURCE.get('use_market_snapshot', True):
+            snapshot = data_fetcher.get_market_snapshot() or None
+        
+        # 快照中缺失的基金先用多代码合并请求批量取价，写入行情缓存后逐个回退时直接命中
+        missing_codes = [code for code in fund_codes if snapshot is None or code not in snapshot]
+        if missing_codes:
+            data_fetcher.get_fund_prices(missing_codes)
+        
+        fund_infos = {}
+        # 使用线程池并行获取（并发数：30，平衡速度和API限制）
+        max_workers = 30
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_fund = {executor.submit(data_fetcher.get_fund_info, fund_code, snapshot=snapshot): fund_code
+                              for fund_code in fund_codes}
+            
+            for future in as_completed(future_to_fund):
+                fund_code = future_to_fund[future]
+                try:
+                    fund_info = future.result()
+                    if fund_info:
+                        fund_info.setdefault('code', fund_code)
+                    fund_infos[fund_code] = fund_info
+                except Exception as e:
+                    fund_infos[fund_code] = None
+                    print(f"获取基金 {fund_code} 失败: {e}")
+    
+    # 所有基金的价格和净值取齐后一次性向量化计算套利结果（价格、净值、费率都没变的基金复用上次结果）
+    results = calculator.calculate_batch_incremental([info for info in fund_infos.values() if info])
+    return {fund_code: decorate(fund_code, results.get(fund_code)) for fund_code in fund_infos}
+
+
+# 后台行情轮询：盘中每个更新间隔为所有基金计算一次套利结果，接口直接从结果表取数；
+# 按交易日历调度，收盘后只再抓取收盘价和当日净值各一次，休市时空闲
+market_poller = MarketPoller(
+    scan_func=scan_funds,
+    fund_codes_func=lambda: list(LOF_FUNDS.keys()),
+    interval_func=lambda started: create_scheduler().next_delay(DATA_SOURCE.get('update_interval', 60),
+                                                                started=started)
+)
+market_poller.add_listener(alert_engine.process)
+
+# 接口等待后台首轮扫描完成的最长时间（秒），超时则实时获取
+POLLER_READY_TIMEOUT = 60
+
+
+@app.before_request
+def start_market_poller():
+    """启动后台行情轮询和基金列表刷新（首个请求时启动，避免调试模式下reloader父进程重复运行）"""
+    if DATA_SOURCE.get('background_poll', True) and not market_poller.is_running:
+        market_poller.start()
+    if not use_mock_data and not fund_universe.is_running:
+        fund_universe.start_refresher(discover_funds_in_background, LOF_FUNDS.update)
+
+
 @app.route('/')
 def index():
     """主页"""
@@ -222,22 +303,7 @@ def index():
 @app.route('/api/funds')
 def get_funds():
     """获取基金列表"""
-    # #region agent log
-    import json
-    log_data = {
-        'sessionId': 'debug-session',
-        'runId': 'run1',
-        'hypothesisId': 'A',
-        'location': 'app.py:get_funds',
-        'message': 'API返回基金列表',
-        'data': {'funds_count': len(LOF_FUNDS), 'funds_keys': list(LOF_FUNDS.keys())[:5]},
-        'timestamp': int(time.time() * 1000)
-    }
-    try:
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-    except: pass
-    # #endregion
+    trace('app.py:get_funds', 'API返回基金列表', {'funds_count': len(LOF_FUNDS), 'funds_keys': list(LOF_FUNDS.keys())[:5]})
     
     return jsonify({
         'funds': LOF_FUNDS,
@@ -259,9 +325,10 @@ def discover_funds():
         funds_list = data_fetcher.get_lof_funds_list()
         if funds_list:
             funds_dict = {fund['code']: fund['name'] for fund in funds_list}
-            # 更新全局基金列表（合并，不覆盖）
+            # 更新全局基金列表（合并，不覆盖），并写入本地缓存
             global LOF_FUNDS
             LOF_FUNDS.update(funds_dict)
+            fund_universe.save(funds_dict)
             
             return jsonify({
                 'success': True,
@@ -287,6 +354,19 @@ def discover_funds():
 def get_fund_info(fund_code):
     """获取单个基金信息"""
     try:
+        # 优先从后台轮询的结果表中直接取数
+        scanned, result = market_poller.get_result(fund_code)
+        if scanned:
+            if not result:
+                return jsonify({
+                    'success': False,
+                    'message': f'无法获取基金 {fund_code} 的数据'
+                }), 404
+            return jsonify({
+                'success': True,
+                'data': {**result, 'snapshot_time': market_poller.snapshot_time}
+            })
+        
         fund_info = data_fetcher.get_fund_info(fund_code)
         if not fund_info:
             return jsonify({
@@ -296,7 +376,12 @@ def get_fund_info(fund_code):
         
         result = calculator.calculate_arbitrage(fund_info)
         if result:
-            result['fund_name'] = LOF_FUNDS.get(fund_code, '')
+            result['fund_name'] = get_fund_name(fund_code)
+            result['purchase_limit'] = data_fetcher.get_fund_purchase_limits([fund_code], fallback=False).get(fund_code) or {
+                'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购', 'limit_as_of': None
+            }
+            result['limit_as_of'] = result['purchase_limit'].get('limit_as_of')
+            result['snapshot_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             return jsonify({
                 'success': True,
                 'data': result
@@ -313,186 +398,107 @@ def get_fund_info(fund_code):
         }), 500
 
 
+def fund_category(result: dict) -> str:
+    """套利结果所属的基金分类（'index' 或 'stock'）"""
+    fund_code = result.get('fund_code', '')
+    return classify_fund_type(result.get('fund_name') or LOF_FUNDS.get(fund_code) or fund_code)
+
+
 @app.route('/api/funds/batch', methods=['POST'])
 def get_funds_batch():
-    """批量获取基金信息"""
-    # #region agent log
-    import json
-    log_data = {
-        'sessionId': 'debug-session',
-        'runId': 'run1',
-        'hypothesisId': 'C',
-        'location': 'app.py:get_funds_batch:entry',
-        'message': '开始批量获取基金信息',
-        'data': {},
-        'timestamp': int(time.time() * 1000)
-    }
-    try:
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-    except: pass
-    # #endregion
+    """
+    批量获取基金信息
+    
+    请求参数（JSON）：
+        codes: 基金代码列表，默认全部
+        top: 只返回收益率最高的前top个（每个分类分别取），默认全部
+        category: 'index' / 'stock' 时 data 只包含该分类，默认 'all'
+        changed_since: 上次响应中的seq，只返回此后有变化的基金（removed 为变为无数据的基金）；
+                       无法按增量回答时（如数据源切换后）返回全量并置 full 为 true
+    """
+    trace('app.py:get_funds_batch:entry', '开始批量获取基金信息')
     
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         fund_codes = data.get('codes', list(LOF_FUNDS.keys()))
-        
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'C',
-            'location': 'app.py:get_funds_batch:received',
-            'message': '收到批量请求',
-            'data': {'fund_codes_count': len(fund_codes), 'sample_codes': fund_codes[:5]},
-            'timestamp': int(time.time() * 1000)
-        }
+        category = data.get('category', 'all')
+        if category not in ('all', 'index', 'stock'):
+            return jsonify({'success': False, 'message': f'不支持的分类: {category}'}), 400
+        top = data.get('top')
         try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
-        
-        # 优化方案2：并行请求处理（使用多线程，显著提升速度）
-        results = []
-        processed = 0
-        errors = 0
+            top = int(top) if top is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'top必须是整数'}), 400
+        changed_since = data.get('changed_since')
+        try:
+            changed_since = int(changed_since) if changed_since is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'changed_since必须是整数'}), 400
         
-        def process_single_fund(fund_code: str):
-            """处理单个基金的函数（用于并行执行）"""
-            try:
-                fund_info = data_fetcher.get_fund_info(fund_code)
-                if fund_info:
-                    result = calculator.calculate_arbitrage(fund_info)
-                    if result:
-                        # 暂时不获取限购信息，避免批量请求超时
-                        result['purchase_limit'] = {'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购'}
-                        
-                        # 获取基金名称，确保是中文
-                        fund_name = LOF_FUNDS.get(fund_code, '')
-                        is_chinese = fund_name and any('\u4e00' <= char <= '\u9fff' for char in fund_name)
-                        
-                        # 如果名称不是中文，尝试获取中文名称（但不在并行中获取，避免过多请求）
-                        # 可以后续异步更新
-                        result['fund_name'] = fund_name if fund_name else fund_code
-                        return {'success': True, 'result': result, 'fund_code': fund_code}
-                return {'success': False, 'fund_code': fund_code, 'reason': 'no_data'}
-            except Exception as e:
-                return {'success': False, 'fund_code': fund_code, 'reason': str(e)}
+        trace('app.py:get_funds_batch:received', '收到批量请求', {'fund_codes_count': len(fund_codes), 'sample_codes': fund_codes[:5]})
         
-        # 使用线程池并行处理（并发数：30，平衡速度和API限制）
-        max_workers = 30
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_fund = {executor.submit(process_single_fund, fund_code): fund_code 
-                            for fund_code in fund_codes}
-            
-            # 收集结果
-            for future in as_completed(future_to_fund):
-                fund_code = future_to_fund[future]
-                try:
-                    result_data = future.result()
-                    if result_data['success']:
-                        result = result_data['result']
-                        results.append(result)
-                        processed += 1
-                        
-                        # 检测套利机会并发送通知（仅对已登录用户）
-                        if result.get('has_opportunity') and 'logged_in' in session and session.get('logged_in'):
-                            username = session.get('username')
-                            if username:
-                                try:
-                                    fund_code = result.get('fund_code', '')
-                                    fund_name = result.get('fund_name', fund_code)
-                                    arbitrage_type = result.get('arbitrage_type', '')
-                                    profit_rate = result.get('profit_rate', 0)
-                                    
-                                    # 检查是否已经通知过（避免重复通知）
-                                    # 可以通过检查最近的通知来判断
-                                    recent_notifications = notification_manager.get_notifications(
-                                        username, unread_only=True, limit=10
-                                    )
-                                    already_notified = any(
-                                        n.get('type') == NotificationType.ARBITRAGE_OPPORTUNITY and
-                                        n.get('data', {}).get('fund_code') == fund_code and
-                                        # 检查是否是最近5分钟内的通知
-                                        (datetime.now() - datetime.fromisoformat(n.get('created_at', ''))).total_seconds() < 300
-                                        for n in recent_notifications
-                                    )
-                                    
-                                    # 只通知收益率高于5%的套利机会
-                                    if not already_notified and profit_rate > 5:
-                                        notification_manager.create_notification(
-                                            username=username,
-                                            notification_type=NotificationType.ARBITRAGE_OPPORTUNITY,
-                                            title=f'发现套利机会：{fund_name} ({fund_code})',
-                                            content=f'{arbitrage_type}，预期收益率 {profit_rate:.2f}%',
-                                            data={
-                                                'fund_code': fund_code,
-                                                'fund_name': fund_name,
-                                                'arbitrage_type': arbitrage_type,
-                                                'profit_rate': profit_rate,
-                                                'price': result.get('price'),
-                                                'nav': result.get('nav'),
-                                                'price_diff_pct': result.get('price_diff_pct')
-                                            }
-                                        )
-                                except Exception as e:
-                                    print(f"发送套利机会通知失败: {e}")
-                    else:
-                        errors += 1
-                except Exception as e:
-                    errors += 1
-                    print(f"获取基金 {fund_code} 失败: {e}")
-        
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'C',
-            'location': 'app.py:get_funds_batch:completed',
-            'message': '批量处理完成',
-            'data': {'total': len(fund_codes), 'processed': processed, 'errors': errors, 'results_count': len(results)},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        # 优先从后台轮询的结果表中直接取数（所有用户共享，无需每个请求重新扫描）
+        results = []
+        removed = []
+        missing_codes = fund_codes
+        snapshot_time = None
+        seq = None
+        full = True
+        if market_poller.wait_until_ready(timeout=POLLER_READY_TIMEOUT):
+            seq = market_poller.seq
+            changes = None
+            if changed_since is not None:
+                changes = market_poller.get_changes(fund_codes, changed_since)
+            if changes is not None:
+                results, removed, missing_codes = changes
+                full = False
+            else:
+                results, missing_codes = market_poller.get_results(fund_codes)
+            snapshot_time = market_poller.snapshot_time
+        
+        # 结果表中没有的基金（轮询未开启、首轮未完成或新增的基金）再实时获取
+        if missing_codes:
+            scanned = scan_funds(missing_codes)
+            results.extend(result for result in scanned.values() if result)
+            if snapshot_time is None:
+                snapshot_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        processed = len(results)
+        errors = len(fund_codes) - processed
+        
+        # 后台轮询开启时由提醒引擎在每轮扫描后统一通知；否则为当前登录用户检查本次结果
+        if not market_poller.is_running and session.get('logged_in'):
+            username = session.get('username')
+            if username:
+                alert_engine.notify_user(username, results)
         
-        # 按收益率排序
-        sorted_results = calculator.sort_by_profit(results)
+        trace('app.py:get_funds_batch:completed', '批量处理完成', {'total': len(fund_codes), 'processed': processed, 'errors': errors, 'results_count': len(results)})
         
-        # 分类基金：指数型和股票型
-        index_funds = [r for r in sorted_results if LOF_FUNDS.get(r['fund_code'], '').endswith('指数') or '指数' in r.get('fund_name', '')]
-        stock_funds = [r for r in sorted_results if r not in index_funds]
+        # 按分类（指数型/股票型）分组，各组按收益率取前top个
+        ranked = calculator.rank_by_category(results, fund_category, top)
+        index_group = ranked.get('index', {'items': [], 'count': 0})
+        stock_group = ranked.get('stock', {'items': [], 'count': 0})
+        if category == 'all':
+            sorted_results = calculator.top_by_profit(results, top)
+        else:
+            sorted_results = ranked.get(category, {'items': []})['items']
         
         return jsonify({
             'success': True,
             'data': sorted_results,
             'count': len(sorted_results),
-            'index_funds': index_funds,
-            'stock_funds': stock_funds,
-            'index_count': len(index_funds),
-            'stock_count': len(stock_funds)
+            'total': len(results),
+            'snapshot_time': snapshot_time,
+            'index_funds': index_group['items'],
+            'stock_funds': stock_group['items'],
+            'index_count': index_group['count'],
+            'stock_count': stock_group['count'],
+            'seq': seq,
+            'full': full,
+            'removed': removed
         })
     except Exception as e:
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'C',
-            'location': 'app.py:get_funds_batch:error',
-            'message': '批量处理出错',
-            'data': {'error': str(e)},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:get_funds_batch:error', '批量处理出错', {'error': str(e)}, level='error')
         
         return jsonify({
             'success': False,
@@ -500,37 +506,80 @@ def get_funds_batch():
         }), 500
 
 
+# SSE连接无数据时发送心跳的间隔（秒），防止代理断开空闲连接
+STREAM_KEEPALIVE = 15
+
+
+def sse_event(event: str, payload: dict) -> str:
+    """格式化一条SSE消息（id为增量序号，客户端重连时通过Last-Event-ID续传）"""
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    return f"id: {payload['seq']}\nevent: {event}\ndata: {data}\n\n"
+
+
+@app.route('/api/funds/stream')
+def stream_funds():
+    """
+    以SSE推送套利结果表的增量（只推送有变化的行，由后台轮询统一计算）
+    
+    首次连接推送 snapshot（完整结果表），之后推送 delta：
+        {'seq', 'snapshot_time', 'reset', 'rows': 变化的结果, 'removed': 没有数据的基金代码}
+    重连时浏览器自动携带 Last-Event-ID（也可用 ?last_id= 指定），能续传则只补发缺失的增量
+    """
+    if not DATA_SOURCE.get('background_poll', True):
+        return jsonify({
+            'success': False,
+            'message': '后台轮询未开启，请使用 /api/funds/batch'
+        }), 503
+    
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_id')
+    try:
+        last_seq = int(last_id) if last_id is not None else None
+    except ValueError:
+        last_seq = None
+    
+    def generate():
+        seq = last_seq
+        # 告诉浏览器断线后3秒重连
+        yield 'retry: 3000\n\n'
+        while True:
+            deltas = None
+            if seq is not None:
+                deltas = market_poller.wait_for_deltas(seq, timeout=STREAM_KEEPALIVE)
+            
+            if deltas is None:
+                # 首次连接或增量已过期：先等首轮扫描完成，再发送完整结果表
+                if not market_poller.wait_until_ready(timeout=STREAM_KEEPALIVE):
+                    if not market_poller.is_running:
+                        time.sleep(STREAM_KEEPALIVE)
+                    yield ': waiting\n\n'
+                    continue
+                snapshot = market_poller.get_snapshot()
+                seq = snapshot['seq']
+                yield sse_event('snapshot', snapshot)
+            elif not deltas:
+                yield ': keepalive\n\n'
+            else:
+                for delta in deltas:
+                    yield sse_event('delta', delta)
+                seq = deltas[-1]['seq']
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @app.route('/api/funds/purchase-limits', methods=['POST'])
 def get_purchase_limits():
     """批量获取基金限购信息（异步调用，不阻塞主流程）"""
-    # #region agent log
-    import json
-    log_data = {
-        'sessionId': 'debug-session',
-        'runId': 'run1',
-        'hypothesisId': 'H',
-        'location': 'app.py:get_purchase_limits:entry',
-        'message': '开始批量获取限购信息',
-        'data': {},
-        'timestamp': int(time.time() * 1000)
-    }
-    try:
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-    except: pass
-    # #endregion
+    trace('app.py:get_purchase_limits:entry', '开始批量获取限购信息')
     
     try:
         data = request.get_json()
         fund_codes = data.get('codes', [])
         
-        limits = {}
-        for fund_code in fund_codes:
-            try:
-                purchase_limit = data_fetcher.get_fund_purchase_limit(fund_code)
-                limits[fund_code] = purchase_limit
-            except Exception as e:
-                limits[fund_code] = {'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购'}
+        # 直接查申购信息索引，数百只基金也只需毫秒级
+        limits = data_fetcher.get_fund_purchase_limits(fund_codes)
         
         return jsonify({
             'success': True,
@@ -548,22 +597,7 @@ def get_purchase_limits():
 @login_required
 def check_purchase_limit():
     """检查申购金额是否超过限购（用于实时验证）"""
-    # #region agent log
-    import json
-    log_data = {
-        'sessionId': 'debug-session',
-        'runId': 'run1',
-        'hypothesisId': 'J',
-        'location': 'app.py:check_purchase_limit:entry',
-        'message': '开始检查申购限购',
-        'data': {},
-        'timestamp': int(time.time() * 1000)
-    }
-    try:
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-    except: pass
-    # #endregion
+    trace('app.py:check_purchase_limit:entry', '开始检查申购限购')
     
     try:
         data = request.get_json()
@@ -571,21 +605,7 @@ def check_purchase_limit():
         amount = float(data.get('amount', 0))
         date = data.get('date')
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'K',
-            'location': 'app.py:check_purchase_limit:params',
-            'message': '接收到的参数',
-            'data': {'fund_code': fund_code, 'amount': amount, 'date': date},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:check_purchase_limit:params', '接收到的参数', {'fund_code': fund_code, 'amount': amount, 'date': date})
         
         if not fund_code or amount <= 0:
             return jsonify({
@@ -599,21 +619,7 @@ def check_purchase_limit():
         # 获取基金限购信息
         try:
             purchase_limit = data_fetcher.get_fund_purchase_limit(fund_code)
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'L',
-                'location': 'app.py:check_purchase_limit:purchase_limit',
-                'message': '获取限购信息',
-                'data': {'purchase_limit': purchase_limit},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('app.py:check_purchase_limit:purchase_limit', '获取限购信息', {'purchase_limit': purchase_limit})
         except Exception as e:
             purchase_limit = {'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购'}
         
@@ -651,26 +657,12 @@ def check_purchase_limit():
             date=date
         )
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'M',
-            'location': 'app.py:check_purchase_limit:daily_amount',
-            'message': '获取当天累计申购金额',
-            'data': {
-                'daily_amount': daily_amount,
-                'new_amount': amount,
-                'total_after': daily_amount + amount,
-                'limit_amount': limit_amount
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:check_purchase_limit:daily_amount', '获取当天累计申购金额', {
+            'daily_amount': daily_amount,
+            'new_amount': amount,
+            'total_after': daily_amount + amount,
+            'limit_amount': limit_amount
+        })
         
         # 检查累计申购金额
         total_amount = daily_amount + amount
@@ -705,21 +697,7 @@ def check_purchase_limit():
         })
         
     except Exception as e:
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'N',
-            'location': 'app.py:check_purchase_limit:error',
-            'message': '检查限购失败',
-            'data': {'error': str(e)},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:check_purchase_limit:error', '检查限购失败', {'error': str(e)}, level='error')
         
         return jsonify({
             'success': False,
@@ -809,6 +787,7 @@ def toggle_mode():
         data = request.get_json()
         mock = data.get('mock', False)
         init_fetcher(mock)
+        market_poller.reset()
         
         return jsonify({
             'success': True,
@@ -826,22 +805,7 @@ def toggle_mode():
 @login_required
 def create_arbitrage_record():
     """创建套利记录"""
-    # #region agent log
-    import json
-    log_data = {
-        'sessionId': 'debug-session',
-        'runId': 'run1',
-        'hypothesisId': 'A',
-        'location': 'app.py:create_arbitrage_record:entry',
-        'message': '开始创建套利记录',
-        'data': {},
-        'timestamp': int(time.time() * 1000)
-    }
-    try:
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-    except: pass
-    # #endregion
+    trace('app.py:create_arbitrage_record:entry', '开始创建套利记录')
     
     try:
         data = request.get_json()
@@ -853,26 +817,12 @@ def create_arbitrage_record():
         initial_amount = float(data.get('initial_amount', 0))
         initial_date = data.get('initial_date')
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'app.py:create_arbitrage_record:params',
-            'message': '接收到的参数',
-            'data': {
-                'fund_code': fund_code,
-                'arbitrage_type': arbitrage_type,
-                'initial_amount': initial_amount,
-                'initial_date': initial_date
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:create_arbitrage_record:params', '接收到的参数', {
+            'fund_code': fund_code,
+            'arbitrage_type': arbitrage_type,
+            'initial_amount': initial_amount,
+            'initial_date': initial_date
+        })
         
         if not fund_code or not arbitrage_type or initial_price <= 0 or initial_amount <= 0:
             return jsonify({
@@ -884,78 +834,22 @@ def create_arbitrage_record():
         
         # 只对溢价套利（申购）进行限购验证
         if arbitrage_type == 'premium':
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'C',
-                'location': 'app.py:create_arbitrage_record:check_limit_start',
-                'message': '开始检查限购',
-                'data': {'fund_code': fund_code, 'initial_amount': initial_amount},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('app.py:create_arbitrage_record:check_limit_start', '开始检查限购', {'fund_code': fund_code, 'initial_amount': initial_amount})
             
             # 获取基金限购信息
             try:
                 purchase_limit = data_fetcher.get_fund_purchase_limit(fund_code)
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'D',
-                    'location': 'app.py:create_arbitrage_record:purchase_limit',
-                    'message': '获取限购信息',
-                    'data': {'purchase_limit': purchase_limit},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('app.py:create_arbitrage_record:purchase_limit', '获取限购信息', {'purchase_limit': purchase_limit})
             except Exception as e:
                 # 如果获取限购信息失败，默认不限购
                 purchase_limit = {'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购'}
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'E',
-                    'location': 'app.py:create_arbitrage_record:purchase_limit_error',
-                    'message': '获取限购信息失败，使用默认值',
-                    'data': {'error': str(e), 'purchase_limit': purchase_limit},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('app.py:create_arbitrage_record:purchase_limit_error', '获取限购信息失败，使用默认值', {'error': str(e), 'purchase_limit': purchase_limit}, level='error')
             
             # 如果基金有限购，进行验证
             if purchase_limit and purchase_limit.get('is_limited') and purchase_limit.get('limit_amount'):
                 limit_amount = float(purchase_limit.get('limit_amount', 0))
                 
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'F',
-                    'location': 'app.py:create_arbitrage_record:limit_check',
-                    'message': '基金有限购，开始验证',
-                    'data': {'limit_amount': limit_amount, 'initial_amount': initial_amount},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('app.py:create_arbitrage_record:limit_check', '基金有限购，开始验证', {'limit_amount': limit_amount, 'initial_amount': initial_amount})
                 
                 # 检查单次申购金额是否超过限购
                 if initial_amount > limit_amount:
@@ -977,27 +871,13 @@ def create_arbitrage_record():
                     date=initial_date
                 )
                 
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'G',
-                    'location': 'app.py:create_arbitrage_record:daily_amount',
-                    'message': '获取当天累计申购金额',
-                    'data': {
-                        'daily_amount': daily_amount,
-                        'initial_date': initial_date,
-                        'new_amount': initial_amount,
-                        'total_after': daily_amount + initial_amount,
-                        'limit_amount': limit_amount
-                    },
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('app.py:create_arbitrage_record:daily_amount', '获取当天累计申购金额', {
+                    'daily_amount': daily_amount,
+                    'initial_date': initial_date,
+                    'new_amount': initial_amount,
+                    'total_after': daily_amount + initial_amount,
+                    'limit_amount': limit_amount
+                })
                 
                 # 检查累计申购金额是否超过限购
                 total_amount = daily_amount + initial_amount
@@ -1023,21 +903,7 @@ def create_arbitrage_record():
             username=username
         )
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'H',
-            'location': 'app.py:create_arbitrage_record:success',
-            'message': '套利记录创建成功',
-            'data': {'record_id': record_id},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:create_arbitrage_record:success', '套利记录创建成功', {'record_id': record_id})
         
         return jsonify({
             'success': True,
@@ -1045,21 +911,7 @@ def create_arbitrage_record():
             'message': '套利记录创建成功'
         })
     except Exception as e:
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'I',
-            'location': 'app.py:create_arbitrage_record:error',
-            'message': '创建套利记录失败',
-            'data': {'error': str(e)},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('app.py:create_arbitrage_record:error', '创建套利记录失败', {'error': str(e)}, level='error')
         
         return jsonify({
             'success': False,
@@ -1319,6 +1171,49 @@ def get_all_arbitrage_statistics():
         }), 500
 
 
+@app.route('/api/admin/tracing', methods=['GET'])
+@admin_required
+def get_tracing():
+    """获取调试追踪级别和最近的追踪记录（仅管理员）"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({
+        'success': True,
+        'level': tracer.level,
+        'records': tracer.recent(limit)
+    })
+
+
+@app.route('/api/admin/tracing', methods=['POST'])
+@admin_required
+def update_tracing():
+    """切换调试追踪级别（off/error/info/debug，仅管理员）"""
+    try:
+        data = request.get_json() or {}
+        tracer.set_level(data.get('level', 'off'))
+        return jsonify({
+            'success': True,
+            'level': tracer.level
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+
+@app.route('/api/admin/http-pools', methods=['GET'])
+@admin_required
+def get_http_pool_stats():
+    """获取各上游主机的连接池统计（取连接次数、等待时间、丢弃连接数，仅管理员）"""
+    if request.args.get('reset') == '1':
+        pool_stats.reset()
+        return jsonify({'success': True, 'stats': {}})
+    return jsonify({
+        'success': True,
+        'stats': pool_stats.snapshot()
+    })
+
+
 # ==================== 用户认证相关API ====================
 
 # 初始化防护模块
@@ -1359,11 +1254,7 @@ def register():
         email = (data.get('email') or '').strip() or None
         captcha_answer = data.get('captcha_answer', '').strip()
         
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'app.py:register:entry','message':'开始注册','data':{'username':username,'passwordLength':len(password) if password else 0,'hasEmail':bool(email),'hasCaptcha':bool(captcha_answer)},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'1,2'})+'\n')
-        # #endregion
+        trace('app.py:register:entry', '开始注册', {'username':username,'passwordLength':len(password) if password else 0,'hasEmail':bool(email),'hasCaptcha':bool(captcha_answer)})
         
         # 获取客户端IP
         client_ip = request.remote_addr or request.environ.get('HTTP_X_FORWARDED_FOR', '').split(',')[0] or 'unknown'
@@ -1371,11 +1262,7 @@ def register():
         # 检查频率限制
         rate_ok, rate_message = rate_limiter.check_rate_limit(client_ip, username)
         if not rate_ok:
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'app.py:register:rate_limit','message':'频率限制','data':{'ip':client_ip,'username':username,'message':rate_message},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'6'})+'\n')
-            # #endregion
+            trace('app.py:register:rate_limit', '频率限制', {'ip':client_ip,'username':username,'message':rate_message})
             rate_limiter.record_attempt(client_ip, username, success=False)
             return jsonify({
                 'success': False,
@@ -1383,11 +1270,7 @@ def register():
             }), 429  # Too Many Requests
         
         if not username or not password:
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'app.py:register:validation_failed','message':'用户名或密码为空','data':{'hasUsername':bool(username),'hasPassword':bool(password)},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'2'})+'\n')
-            # #endregion
+            trace('app.py:register:validation_failed', '用户名或密码为空', {'hasUsername':bool(username),'hasPassword':bool(password)}, level='error')
             rate_limiter.record_attempt(client_ip, username, success=False)
             return jsonify({
                 'success': False,
@@ -1401,30 +1284,18 @@ def register():
         
         captcha_ok, captcha_message = captcha_manager.verify_captcha(session_id, captcha_answer)
         if not captcha_ok:
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'app.py:register:captcha_failed','message':'验证码验证失败','data':{'message':captcha_message},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'7'})+'\n')
-            # #endregion
+            trace('app.py:register:captcha_failed', '验证码验证失败', {'message':captcha_message}, level='error')
             rate_limiter.record_attempt(client_ip, username, success=False)
             return jsonify({
                 'success': False,
                 'message': captcha_message
             }), 400
         
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'app.py:register:before_register','message':'调用user_manager.register前','data':{'username':username,'usernameLength':len(username),'passwordLength':len(password)},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'1,2'})+'\n')
-        # #endregion
+        trace('app.py:register:before_register', '调用user_manager.register前', {'username':username,'usernameLength':len(username),'passwordLength':len(password)})
         
         success, message = user_manager.register(username, password, email)
         
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'app.py:register:after_register','message':'调用user_manager.register后','data':{'success':success,'message':message},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'1,2,5'})+'\n')
-        # #endregion
+        trace('app.py:register:after_register', '调用user_manager.register后', {'success':success,'message':message})
         
         if success:
             # 记录成功的注册
@@ -1441,11 +1312,7 @@ def register():
                 'message': message
             }), 400
     except Exception as e:
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'app.py:register:exception','message':'注册异常','data':{'error':str(e),'type':type(e).__name__},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'3,4'})+'\n')
-        # #endregion
+        trace('app.py:register:exception', '注册异常', {'error':str(e),'type':type(e).__name__}, level='error')
         return jsonify({
             'success': False,
             'message': str(e)
@@ -1554,6 +1421,7 @@ def update_user_favorites():
         fund_codes = data.get('favorites', [])
         
         success = user_manager.set_user_favorites(username, fund_codes)
+        alert_engine.invalidate()
         if success:
             return jsonify({
                 'success': True,
@@ -1578,6 +1446,7 @@ def add_user_favorite(fund_code):
     try:
         username = session.get('username')
         success = user_manager.add_user_favorite(username, fund_code)
+        alert_engine.invalidate()
         if success:
             return jsonify({
                 'success': True,
@@ -1602,6 +1471,7 @@ def remove_user_favorite(fund_code):
     try:
         username = session.get('username')
         success = user_manager.remove_user_favorite(username, fund_code)
+        alert_engine.invalidate()
         if success:
             return jsonify({
                 'success': True,
@@ -1641,6 +1511,7 @@ def update_user_settings():
         settings = data.get('settings', {})
         
         success = user_manager.set_user_settings(username, settings)
+        alert_engine.invalidate()
         if success:
             return jsonify({
                 'success': True,
@@ -1713,6 +1584,9 @@ def update_data_source_config():
                 data_fetcher = LOFDataFetcher(tushare_token=tushare_token)
                 data_fetcher.data_source_config = DATA_SOURCE
         
+        # 数据源变化后立即按新配置重新扫描
+        market_poller.reset()
+        
         return jsonify({
             'success': True,
             'message': '数据源配置已更新'
@@ -1803,6 +1677,7 @@ def delete_user(username):
             }), 400
         
         success = user_manager.delete_user(username)
+        alert_engine.invalidate()
         if success:
             return jsonify({
                 'success': True,
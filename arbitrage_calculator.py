@@ -4,8 +4,18 @@ LOF基金套利计算模块
 计算套利机会和收益
 """
 
-from typing import Dict, Optional
+import heapq
+import threading
+from typing import Callable, Dict, Optional, List
 from config import TRADE_FEES, ARBITRAGE_THRESHOLD
+from tracing import trace
+
+# 尝试导入numpy（批量向量化计算）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 
 class ArbitrageCalculator:
@@ -14,6 +24,9 @@ class ArbitrageCalculator:
     def __init__(self):
         self.fees = TRADE_FEES
         self.threshold = ARBITRAGE_THRESHOLD
+        # 增量计算缓存：基金代码 -> (输入(价格, 净值, 费率, 阈值), 上次的计算结果)
+        self._last_inputs: Dict[str, tuple] = {}
+        self._last_inputs_lock = threading.Lock()
     
     def calculate_arbitrage(self, fund_info: Dict) -> Optional[Dict]:
         """
@@ -59,32 +72,16 @@ class ArbitrageCalculator:
             net_profit = final_value - investment
             profit_rate = (net_profit / investment) * 100
             
-            # #region agent log
-            import json
-            import time
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'A',
-                'location': 'arbitrage_calculator.py:calculate_arbitrage:premium',
-                'message': '溢价套利计算',
-                'data': {
-                    'fund_code': fund_info.get('code', ''),
-                    'price': price,
-                    'nav': nav,
-                    'investment': investment,
-                    'subscribe_shares': subscribe_shares,
-                    'final_value': final_value,
-                    'net_profit': net_profit,
-                    'profit_rate': profit_rate
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('arbitrage_calculator.py:calculate_arbitrage:premium', '溢价套利计算', {
+                'fund_code': fund_info.get('code', ''),
+                'price': price,
+                'nav': nav,
+                'investment': investment,
+                'subscribe_shares': subscribe_shares,
+                'final_value': final_value,
+                'net_profit': net_profit,
+                'profit_rate': profit_rate
+            })
             
             arbitrage_type = '溢价套利'
             operation = '场外申购 → 场内卖出'
@@ -105,32 +102,16 @@ class ArbitrageCalculator:
             net_profit = final_value - investment
             profit_rate = (net_profit / investment) * 100
             
-            # #region agent log
-            import json
-            import time
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'arbitrage_calculator.py:calculate_arbitrage:discount',
-                'message': '折价套利计算',
-                'data': {
-                    'fund_code': fund_info.get('code', ''),
-                    'price': price,
-                    'nav': nav,
-                    'investment': investment,
-                    'buy_shares': buy_shares,
-                    'final_value': final_value,
-                    'net_profit': net_profit,
-                    'profit_rate': profit_rate
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('arbitrage_calculator.py:calculate_arbitrage:discount', '折价套利计算', {
+                'fund_code': fund_info.get('code', ''),
+                'price': price,
+                'nav': nav,
+                'investment': investment,
+                'buy_shares': buy_shares,
+                'final_value': final_value,
+                'net_profit': net_profit,
+                'profit_rate': profit_rate
+            })
             
             arbitrage_type = '折价套利'
             operation = '场内买入 → 场外赎回'
@@ -156,23 +137,182 @@ class ArbitrageCalculator:
             'update_time': fund_info.get('update_time', ''),
         }
     
-    def calculate_batch(self, funds_info: list) -> list:
+    def calculate_batch(self, funds_info: list, columnar: bool = False):
         """
-        批量计算套利机会
+        批量计算套利机会（安装了numpy时使用向量化计算）
         
         Args:
             funds_info: 基金信息列表
+            columnar: 是否返回列式结果（见 calculate_columns）
             
         Returns:
-            套利分析结果列表
+            套利分析结果列表；columnar=True 时返回列式字典
         """
-        results = []
-        for fund_info in funds_info:
-            result = self.calculate_arbitrage(fund_info)
-            if result:
-                results.append(result)
+        valid = [f for f in funds_info if f and 'price' in f and 'nav' in f]
+        columns = self.calculate_columns(
+            [f['price'] for f in valid],
+            [f['nav'] for f in valid],
+            codes=[f.get('code', '') for f in valid],
+            update_times=[f.get('update_time', '') for f in valid]
+        )
+        if columnar:
+            return columns
+        return self.columns_to_rows(columns)
+    
+    def calculate_batch_incremental(self, funds_info: list) -> Dict[str, Dict]:
+        """
+        增量批量计算：价格、净值、费率和阈值都没变的基金直接复用上次的结果，只重新计算有变化的
+        
+        Args:
+            funds_info: 基金信息列表
+            
+        Returns:
+            {基金代码: 套利分析结果}（每次返回新的字典，调用方可以直接修改，不影响缓存）
+        """
+        settings = (tuple(sorted(self.fees.items())), tuple(sorted(self.threshold.items())))
+        results = {}
+        changed = []
+        with self._last_inputs_lock:
+            for fund_info in funds_info:
+                if not fund_info or 'price' not in fund_info or 'nav' not in fund_info:
+                    continue
+                fund_code = fund_info.get('code', '')
+                inputs = (fund_info['price'], fund_info['nav'], settings)
+                cached = self._last_inputs.get(fund_code)
+                if cached is not None and cached[0] == inputs:
+                    result = dict(cached[1])
+                    result['update_time'] = fund_info.get('update_time', '')
+                    results[fund_code] = result
+                else:
+                    changed.append((fund_code, inputs, fund_info))
+        
+        if changed:
+            computed = self.calculate_batch([fund_info for _, _, fund_info in changed])
+            computed = {result['fund_code']: result for result in computed}
+            with self._last_inputs_lock:
+                for fund_code, inputs, _ in changed:
+                    result = computed.get(fund_code)
+                    if result is None:
+                        self._last_inputs.pop(fund_code, None)
+                        continue
+                    self._last_inputs[fund_code] = (inputs, result)
+                    results[fund_code] = dict(result)
+        
+        trace('arbitrage_calculator.py:calculate_batch_incremental', '增量计算', {
+            'total': len(funds_info), 'recalculated': len(changed)
+        })
         return results
     
+    def calculate_columns(self, prices, navs, codes: List[str] = None, update_times: List[str] = None,
+                          fee_overrides: Dict = None) -> Dict[str, list]:
+        """
+        向量化批量计算套利机会（数千只基金一次算完，可用于全市场扫描和历史回放）
+        
+        计算公式与 calculate_arbitrage 相同；价格或净值无效（<=0）的行会被剔除。
+        
+        Args:
+            prices: 场内价格数组
+            navs: 净值数组
+            codes: 基金代码列表（可选）
+            update_times: 数据更新时间列表（可选）
+            fee_overrides: 按基金覆盖的费率，如 {'subscribe_fee': [...], 'redeem_fee': 0.005}，
+                           值可以是与prices等长的数组或标量，未提供的费率使用配置值
+            
+        Returns:
+            列式结果字典，每个key对应一列（list），可直接序列化为JSON：
+            fund_code, price, nav, price_diff, price_diff_pct, arbitrage_type, operation,
+            total_cost_rate, profit_rate, net_profit_10k, has_opportunity, update_time
+        """
+        count = len(prices)
+        codes = list(codes) if codes is not None else [''] * count
+        update_times = list(update_times) if update_times is not None else [''] * count
+        fees = dict(self.fees)
+        fees.update(fee_overrides or {})
+        
+        if not NUMPY_AVAILABLE:
+            return self._calculate_columns_python(prices, navs, codes, update_times, fees)
+        
+        price = np.asarray(prices, dtype=float)
+        nav = np.asarray(navs, dtype=float)
+        valid = (price > 0) & (nav > 0)
+        
+        def fee_array(name):
+            return np.broadcast_to(np.asarray(fees[name], dtype=float), valid.shape)[valid]
+        
+        subscribe_fee = fee_array('subscribe_fee')
+        redeem_fee = fee_array('redeem_fee')
+        buy_commission = fee_array('buy_commission')
+        sell_cost = fee_array('sell_commission') + fee_array('stamp_tax')
+        price = price[valid]
+        nav = nav[valid]
+        
+        price_diff = price - nav
+        price_diff_pct = price_diff / nav * 100
+        is_premium = price > nav
+        
+        investment = 10000
+        # 溢价：场外申购（按净值）→ 场内卖出（按价格）；折价：场内买入（按价格）→ 场外赎回（按净值）
+        premium_value = investment * (1 - subscribe_fee) / nav * price * (1 - sell_cost)
+        discount_value = investment * (1 - buy_commission) / price * nav * (1 - redeem_fee)
+        net_profit = np.where(is_premium, premium_value, discount_value) - investment
+        profit_rate = net_profit / investment * 100
+        total_cost = np.where(is_premium, subscribe_fee + sell_cost, redeem_fee + buy_commission)
+        
+        has_opportunity = (
+            (np.abs(price_diff) >= self.threshold['min_price_diff']) &
+            (profit_rate >= self.threshold['min_profit_rate'] * 100)
+        )
+        
+        def rounded(values, digits):
+            # 与 calculate_arbitrage 一样使用内置round（np.round 先放大再取整，个别值末位会不同）
+            return [round(v, digits) for v in values.tolist()]
+        
+        valid_idx = np.flatnonzero(valid)
+        premium_list = is_premium.tolist()
+        return {
+            'fund_code': [codes[i] for i in valid_idx],
+            'price': price.tolist(),
+            'nav': nav.tolist(),
+            'price_diff': rounded(price_diff, 4),
+            'price_diff_pct': rounded(price_diff_pct, 2),
+            'arbitrage_type': ['溢价套利' if p else '折价套利' for p in premium_list],
+            'operation': ['场外申购 → 场内卖出' if p else '场内买入 → 场外赎回' for p in premium_list],
+            'total_cost_rate': rounded(total_cost * 100, 2),
+            'profit_rate': rounded(profit_rate, 2),
+            'net_profit_10k': rounded(net_profit, 2),
+            'has_opportunity': has_opportunity.tolist(),
+            'update_time': [update_times[i] for i in valid_idx],
+        }
+    
+    def _calculate_columns_python(self, prices, navs, codes: List[str], update_times: List[str],
+                                  fees: Dict) -> Dict[str, list]:
+        """未安装numpy时的逐行计算（结果格式与向量化计算相同）"""
+        def fee_at(name, i):
+            value = fees[name]
+            return value[i] if isinstance(value, (list, tuple)) else value
+        
+        columns = {key: [] for key in ('fund_code', 'price', 'nav', 'price_diff', 'price_diff_pct',
+                                       'arbitrage_type', 'operation', 'total_cost_rate', 'profit_rate',
+                                       'net_profit_10k', 'has_opportunity', 'update_time')}
+        calculator = ArbitrageCalculator.__new__(ArbitrageCalculator)
+        calculator.threshold = self.threshold
+        for i, (price, nav) in enumerate(zip(prices, navs)):
+            calculator.fees = {name: fee_at(name, i) for name in
+                               ('subscribe_fee', 'redeem_fee', 'buy_commission', 'sell_commission', 'stamp_tax')}
+            result = calculator.calculate_arbitrage({
+                'code': codes[i], 'price': price, 'nav': nav, 'update_time': update_times[i]
+            })
+            if result:
+                for key in columns:
+                    columns[key].append(result[key])
+        return columns
+    
+    @staticmethod
+    def columns_to_rows(columns: Dict[str, list]) -> list:
+        """把列式结果转换为与 calculate_arbitrage 相同格式的结果列表"""
+        keys = list(columns.keys())
+        return [dict(zip(keys, values)) for values in zip(*(columns[key] for key in keys))]
+    
     def filter_opportunities(self, results: list) -> list:
         """
         过滤出有套利机会的结果
@@ -197,3 +337,41 @@ class ArbitrageCalculator:
             排序后的结果列表
         """
         return sorted(results, key=lambda x: x.get('profit_rate', 0), reverse=reverse)
+    
+    def top_by_profit(self, results: list, top: Optional[int] = None) -> list:
+        """
+        按收益率取前top个结果（堆选择，O(n log k)；top为None时完整排序）
+        
+        Args:
+            results: 套利分析结果列表
+            top: 返回数量
+            
+        Returns:
+            按收益率降序排列的结果列表
+        """
+        if top is None or top >= len(results):
+            return self.sort_by_profit(results)
+        if top <= 0:
+            return []
+        return heapq.nlargest(top, results, key=lambda x: x.get('profit_rate', 0))
+    
+    def rank_by_category(self, results: list, classify: Callable[[Dict], str],
+                         top: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        按分类取收益率前top的结果（一次遍历分组，各组分别做堆选择）
+        
+        Args:
+            results: 套利分析结果列表
+            classify: 分类函数，传入单个结果返回分类名（如 'index' / 'stock'）
+            top: 每个分类返回的数量，None表示全部
+            
+        Returns:
+            {分类名: {'items': 排序后的结果列表, 'count': 该分类的结果总数}}
+        """
+        groups: Dict[str, list] = {}
+        for result in results:
+            groups.setdefault(classify(result), []).append(result)
+        return {
+            category: {'items': self.top_by_profit(items, top), 'count': len(items)}
+            for category, items in groups.items()
+        }
@@ -6,6 +6,8 @@
 
 import json
 import os
+import sqlite3
+import threading
 from datetime import datetime
 from typing import Dict, List, Optional
 from enum import Enum
@@ -26,47 +28,153 @@ class ArbitrageType(Enum):
 
 
 class ArbitrageRecorder:
-    """套利记录器"""
+    """套利记录器（SQLite存储，WAL模式）"""
     
-    def __init__(self, data_file: str = "arbitrage_records.json"):
+    def __init__(self, db_file: str = "arbitrage_records.db", legacy_file: str = "arbitrage_records.json"):
         """
         初始化套利记录器
         
         Args:
-            data_file: 记录文件路径
+            db_file: SQLite数据库文件路径
+            legacy_file: 旧版JSON记录文件路径，数据库为空且该文件存在时自动迁移
         """
-        self.data_file = data_file
-        self.records = self._load_records()
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._init_db()
+        if legacy_file and os.path.exists(legacy_file) and self._count() == 0:
+            self.migrate_from_json(legacy_file)
     
-    def _load_records(self) -> Dict[str, List[Dict]]:
-        """加载记录（按用户ID组织）"""
-        if os.path.exists(self.data_file):
+    def _init_db(self):
+        """创建数据表和索引"""
+        with self._lock:
+            # WAL模式下读写互不阻塞，每次写入只追加变化的页
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS arbitrage_records (
+                    id TEXT PRIMARY KEY,
+                    username TEXT,
+                    fund_code TEXT NOT NULL,
+                    arbitrage_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    initial_date TEXT,
+                    initial_amount REAL,
+                    created_at TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_records_user_fund_date_status "
+                "ON arbitrage_records (username, fund_code, initial_date, status)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_records_user_created "
+                "ON arbitrage_records (username, created_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_records_created ON arbitrage_records (created_at)"
+            )
+            self._conn.commit()
+    
+    def _count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM arbitrage_records").fetchone()[0]
+    
+    @staticmethod
+    def _row_values(record: Dict) -> tuple:
+        """记录字典 -> 数据表各列的值（查询用的字段单独成列，完整记录以JSON保存）"""
+        initial = record.get('initial_operation') or {}
+        return (
+            record['id'],
+            record.get('username'),
+            record.get('fund_code', ''),
+            record.get('arbitrage_type', ''),
+            record.get('status', ''),
+            initial.get('date'),
+            initial.get('amount'),
+            record.get('created_at', ''),
+            json.dumps(record, ensure_ascii=False),
+        )
+    
+    def _insert_record(self, record: Dict):
+        """插入一条记录（ID已存在时抛出 sqlite3.IntegrityError）"""
+        with self._lock:
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # 兼容旧格式（列表格式）
-                    if isinstance(data, list):
-                        # 转换为新格式：按用户ID组织
-                        return {}
-                    return data
-            except Exception as e:
-                print(f"加载套利记录失败: {e}")
-                return {}
-        return {}
+                self._conn.execute(
+                    "INSERT INTO arbitrage_records (id, username, fund_code, arbitrage_type, status, "
+                    "initial_date, initial_amount, created_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._row_values(record)
+                )
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+    
+    def _update_record(self, record: Dict):
+        """只更新这一条记录"""
+        values = self._row_values(record)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE arbitrage_records SET username = ?, fund_code = ?, arbitrage_type = ?, status = ?, "
+                "initial_date = ?, initial_amount = ?, created_at = ?, data = ? WHERE id = ?",
+                values[1:] + values[:1]
+            )
+            self._conn.commit()
     
-    def _save_records(self):
-        """保存记录"""
+    def _query_records(self, where: str = '', params: tuple = ()) -> List[Dict]:
+        """按条件查询记录（按创建时间倒序）"""
+        sql = "SELECT data FROM arbitrage_records"
+        if where:
+            sql += " WHERE " + where
+        sql += " ORDER BY created_at DESC"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def migrate_from_json(self, json_file: str) -> int:
+        """
+        从旧版JSON文件（按用户名组织的记录列表）一次性导入记录，导入后把原文件重命名为 .migrated
+        
+        Args:
+            json_file: JSON记录文件路径
+        
+        Returns:
+            导入的记录条数
+        """
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.records, f, ensure_ascii=False, indent=2)
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         except Exception as e:
-            print(f"保存套利记录失败: {e}")
-    
-    def _get_user_records(self, username: str) -> List[Dict]:
-        """获取用户的记录列表"""
-        if username not in self.records:
-            self.records[username] = []
-        return self.records[username]
+            print(f"读取旧版套利记录失败: {e}")
+            return 0
+        
+        # 更早的列表格式不区分用户，无法迁移
+        if not isinstance(data, dict):
+            return 0
+        
+        rows = []
+        for username, user_records in data.items():
+            for record in user_records:
+                if record.get('id'):
+                    # 旧版按字典键区分用户，记录本身可能没有 username 字段
+                    record.setdefault('username', username)
+                    rows.append(self._row_values(record))
+        
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO arbitrage_records (id, username, fund_code, arbitrage_type, status, "
+                "initial_date, initial_amount, created_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        
+        try:
+            os.replace(json_file, json_file + '.migrated')
+        except OSError as e:
+            print(f"重命名旧版套利记录文件失败: {e}")
+        print(f"已从 {json_file} 迁移 {len(rows)} 条套利记录")
+        return len(rows)
     
     def create_record(self, fund_code: str, fund_name: str, arbitrage_type: str, 
                      initial_price: float, initial_shares: float, initial_amount: float,
@@ -82,11 +190,12 @@ class ArbitrageRecorder:
             initial_shares: 初始份额
             initial_amount: 初始金额
             initial_date: 初始日期（格式：YYYY-MM-DD），默认为今天
-            
+        
         Returns:
             记录ID
         """
-        record_id = f"{fund_code}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        base_id = f"{fund_code}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        record_id = base_id
         
         if initial_date is None:
             initial_date = datetime.now().strftime('%Y-%m-%d')
@@ -113,10 +222,15 @@ class ArbitrageRecorder:
             'updated_at': datetime.now().isoformat()
         }
         
-        user_records = self._get_user_records(username)
-        user_records.append(record)
-        self._save_records()
-        return record_id
+        # 同一秒内对同一基金创建多条记录时ID冲突，追加序号重试（由主键保证唯一，并发创建也安全）
+        suffix = 1
+        while True:
+            try:
+                self._insert_record(record)
+                return record['id']
+            except sqlite3.IntegrityError:
+                suffix += 1
+                record['id'] = f"{base_id}_{suffix}"
     
     def complete_record(self, record_id: str, final_price: float, final_shares: float = None,
                        final_amount: float = None, final_date: str = None, username: str = None) -> bool:
@@ -129,7 +243,7 @@ class ArbitrageRecorder:
             final_shares: 最终份额（如果与初始份额不同）
             final_amount: 最终金额（如果提供，将使用此值计算）
             final_date: 最终日期（格式：YYYY-MM-DD），默认为今天
-            
+        
         Returns:
             是否成功
         """
@@ -172,7 +286,7 @@ class ArbitrageRecorder:
         record['status'] = ArbitrageStatus.COMPLETED.value
         record['updated_at'] = datetime.now().isoformat()
         
-        self._save_records()
+        self._update_record(record)
         return True
     
     def cancel_record(self, record_id: str, username: str = None) -> bool:
@@ -182,7 +296,7 @@ class ArbitrageRecorder:
         Args:
             record_id: 记录ID
             username: 用户名（如果提供，只在该用户的记录中查找）
-            
+        
         Returns:
             是否成功
         """
@@ -193,7 +307,7 @@ class ArbitrageRecorder:
         if record['status'] == ArbitrageStatus.IN_PROGRESS.value:
             record['status'] = ArbitrageStatus.CANCELLED.value
             record['updated_at'] = datetime.now().isoformat()
-            self._save_records()
+            self._update_record(record)
             return True
         return False
     
@@ -204,22 +318,18 @@ class ArbitrageRecorder:
         Args:
             record_id: 记录ID
             username: 用户名（如果提供，只在该用户的记录中查找）
-            
+        
         Returns:
             记录字典，如果不存在返回None
         """
+        sql = "SELECT data FROM arbitrage_records WHERE id = ?"
+        params = (record_id,)
         if username:
-            user_records = self._get_user_records(username)
-            for record in user_records:
-                if record['id'] == record_id:
-                    return record
-        else:
-            # 在所有用户的记录中查找
-            for user_records in self.records.values():
-                for record in user_records:
-                    if record['id'] == record_id:
-                        return record
-        return None
+            sql += " AND username = ?"
+            params += (username,)
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
     
     def get_all_records(self, fund_code: str = None, status: str = None, username: str = None) -> List[Dict]:
         """
@@ -229,25 +339,22 @@ class ArbitrageRecorder:
             fund_code: 基金代码（可选，用于筛选）
             status: 状态（可选，用于筛选）
             username: 用户名（如果提供，只返回该用户的记录）
-            
+        
         Returns:
             记录列表
         """
+        conditions = []
+        params = []
         if username:
-            records = self._get_user_records(username)
-        else:
-            # 合并所有用户的记录
-            records = []
-            for user_records in self.records.values():
-                records.extend(user_records)
-        
+            conditions.append("username = ?")
+            params.append(username)
         if fund_code:
-            records = [r for r in records if r['fund_code'] == fund_code]
+            conditions.append("fund_code = ?")
+            params.append(fund_code)
         if status:
-            records = [r for r in records if r['status'] == status]
-        # 按创建时间倒序排列
-        records.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        return records
+            conditions.append("status = ?")
+            params.append(status)
+        return self._query_records(" AND ".join(conditions), tuple(params))
     
     def get_all_users_statistics(self) -> Dict:
         """
@@ -327,17 +434,11 @@ class ArbitrageRecorder:
         
         Args:
             username: 用户名（如果提供，只统计该用户的记录）
-            
+        
         Returns:
             统计信息字典
         """
-        if username:
-            records = self._get_user_records(username)
-        else:
-            # 合并所有用户的记录
-            records = []
-            for user_records in self.records.values():
-                records.extend(user_records)
+        records = self.get_all_records(username=username)
         
         completed = [r for r in records if r['status'] == ArbitrageStatus.COMPLETED.value]
         
@@ -373,28 +474,23 @@ class ArbitrageRecorder:
             username: 用户名
             fund_code: 基金代码
             date: 日期（格式：YYYY-MM-DD），默认为今天
-            
+        
         Returns:
             累计申购金额（元）
         """
         if date is None:
             date = datetime.now().strftime('%Y-%m-%d')
         
-        user_records = self._get_user_records(username)
-        total_amount = 0.0
-        
-        for record in user_records:
-            # 只统计同一基金、同一日期、且是溢价套利（申购）的记录
-            if (record.get('fund_code') == fund_code and 
-                record.get('arbitrage_type') == 'premium' and
-                record.get('initial_operation', {}).get('date') == date):
-                # 只统计进行中或已完成的记录（不包括已取消的）
-                if record.get('status') in ['in_progress', 'completed']:
-                    amount = record.get('initial_operation', {}).get('amount', 0)
-                    if amount:
-                        total_amount += float(amount)
-        
-        return total_amount
+        # 只统计同一基金、同一日期、且是溢价套利（申购）的记录，
+        # 不包括已取消的记录；走 (username, fund_code, initial_date, status) 索引
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(initial_amount), 0) FROM arbitrage_records "
+                "WHERE username = ? AND fund_code = ? AND initial_date = ? "
+                "AND status IN ('in_progress', 'completed') AND arbitrage_type = 'premium'",
+                (username, fund_code, date)
+            ).fetchone()
+        return float(row[0])
     
     def delete_record(self, record_id: str) -> bool:
         """
@@ -402,13 +498,11 @@ class ArbitrageRecorder:
         
         Args:
             record_id: 记录ID
-            
+        
         Returns:
             是否成功
         """
-        for i, record in enumerate(self.records):
-            if record['id'] == record_id:
-                self.records.pop(i)
-                self._save_records()
-                return True
-        return False
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM arbitrage_records WHERE id = ?", (record_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
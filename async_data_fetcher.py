@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""
+LOF基金异步数据获取模块
+基于asyncio + aiohttp，在单个线程上并发发起数百个请求，用于批量扫描全部基金
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Dict, Optional, List
+
+from config import DATA_SOURCE
+from data_fetcher import LOFDataFetcher
+
+# 尝试导入aiohttp
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+    print("警告: aiohttp未安装，异步抓取引擎不可用，将使用线程池")
+
+
+class AsyncLOFDataFetcher:
+    """
+    LOF基金异步数据获取器
+    
+    对外接口与 LOFDataFetcher 一致（价格、净值、套利数据、限购信息），
+    解析逻辑、数据验证和行情缓存都复用同步获取器，只替换网络请求部分。
+    所有协程方法都需要在 session() 打开的会话内调用；同步代码使用 scan() 即可。
+    """
+    
+    ARBITRAGE_URL = 'https://zqhdplus.eastmoney.com/api/fundArbitrage/getFundArbitrageList'
+    
+    def __init__(self, sync_fetcher: LOFDataFetcher = None):
+        """
+        初始化异步获取器
+        
+        Args:
+            sync_fetcher: 同步获取器，复用其解析函数、数据源开关和行情缓存；
+                          限购信息等依赖akshare的接口也委托给它在线程池中执行
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp未安装，请运行 pip install aiohttp")
+        
+        self.sync_fetcher = sync_fetcher or LOFDataFetcher()
+        self.data_source_config = DATA_SOURCE
+        self.quote_cache = self.sync_fetcher.quote_cache
+        
+        engine_config = self.data_source_config.get('async_engine', {})
+        self.max_in_flight = engine_config.get('max_in_flight', 200)
+        self.per_host_limit = engine_config.get('per_host_limit', 50)
+        self.timeout = engine_config.get('timeout', 10)
+        
+        self._session = None
+    
+    def session(self) -> 'aiohttp.ClientSession':
+        """
+        创建HTTP会话（连接复用 + 全局/单主机并发上限）
+        
+        用法：async with fetcher.session(): ...
+        """
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            limit_per_host=self.per_host_limit,
+            ttl_dns_cache=300
+        )
+        headers = dict(self.sync_fetcher.session.headers)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self._session
+    
+    async def _get_text(self, url: str, params: Dict = None, headers: Dict = None) -> Optional[str]:
+        """发起GET请求，返回响应文本，非200返回None"""
+        async with self._session.get(url, params=params, headers=headers) as response:
+            if response.status != 200:
+                return None
+            return await response.text(errors='replace')
+    
+    async def _get_json(self, url: str, params: Dict = None) -> Optional[Dict]:
+        text = await self._get_text(url, params=params)
+        return json.loads(text) if text else None
+    
+    async def get_fund_price(self, fund_code: str) -> Optional[Dict]:
+        """
+        获取LOF基金场内实时价格
+        
+        Args:
+            fund_code: 基金代码（6位数字）
+        
+        Returns:
+            包含价格信息的字典，如果失败返回None
+        """
+        prices = await self.get_fund_prices([fund_code])
+        return prices.get(fund_code)
+    
+    async def get_fund_prices(self, fund_codes: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取场内实时价格（新浪/腾讯多代码合并请求，各批次并发发起）
+        
+        Args:
+            fund_codes: 基金代码列表
+        
+        Returns:
+            字典，key为基金代码，value为价格信息（获取失败的基金不包含在内）
+        """
+        cache_config = self.data_source_config.get('quote_cache', {})
+        cache_enabled = cache_config.get('enabled', True)
+        price_ttl = cache_config.get('price_ttl', 10)
+        batch_size = self.data_source_config.get('batch_quote_size', 80)
+        
+        results = {}
+        pending = []
+        for fund_code in dict.fromkeys(fund_codes):
+            cached = self.quote_cache.get((fund_code, 'price')) if cache_enabled else None
+            if cached:
+                results[fund_code] = cached
+            else:
+                pending.append(fund_code)
+        
+        batch_sources = [
+            ('sina', self._get_prices_sina_batch),
+            ('tencent', self._get_prices_tencent_batch),
+        ]
+        for source_name, fetch_batch in batch_sources:
+            if not pending or not self.sync_fetcher._is_source_enabled('price_sources', source_name):
+                continue
+            chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            for batch in await asyncio.gather(*(fetch_batch(chunk) for chunk in chunks)):
+                for fund_code, price_data in batch.items():
+                    if not 0.01 < price_data['price'] < 100:
+                        continue
+                    price_info = {k: v for k, v in price_data.items() if k != 'source'}
+                    results[fund_code] = price_info
+                    if cache_enabled:
+                        self.quote_cache.set((fund_code, 'price'), price_info, price_ttl)
+            pending = [code for code in pending if code not in results]
+        
+        return results
+    
+    async def _get_prices_sina_batch(self, fund_codes: List[str]) -> Dict[str, Dict]:
+        """新浪财经批量行情"""
+        import re
+        symbols = ','.join(f'{self.sync_fetcher._guess_market(code)}{code}' for code in fund_codes)
+        try:
+            content = await self._get_text(
+                f'http://hq.sinajs.cn/list={symbols}',
+                headers={'Referer': 'http://finance.sina.com.cn'}
+            )
+        except Exception as e:
+            print(f"新浪财经批量行情获取失败（{len(fund_codes)}只基金）: {e}")
+            return {}
+        
+        prices = {}
+        for match in re.finditer(r'hq_str_(?:sz|sh)(\d{6})="([^"]*)"', content or ''):
+            try:
+                price_data = self.sync_fetcher._parse_sina_quote(match.group(1), match.group(2))
+            except (ValueError, IndexError):
+                price_data = None
+            if price_data:
+                prices[match.group(1)] = price_data
+        return prices
+    
+    async def _get_prices_tencent_batch(self, fund_codes: List[str]) -> Dict[str, Dict]:
+        """腾讯财经批量行情"""
+        import re
+        symbols = ','.join(f'{self.sync_fetcher._guess_market(code)}{code}' for code in fund_codes)
+        try:
+            content = await self._get_text(
+                f'http://qt.gtimg.cn/q={symbols}',
+                headers={'Referer': 'http://qq.com'}
+            )
+        except Exception as e:
+            print(f"腾讯财经批量行情获取失败（{len(fund_codes)}只基金）: {e}")
+            return {}
+        
+        prices = {}
+        for match in re.finditer(r'v_(?:sz|sh)(\d{6})="([^"]*)"', content or ''):
+            try:
+                price_data = self.sync_fetcher._parse_tencent_quote(match.group(1), match.group(2))
+            except (ValueError, IndexError):
+                price_data = None
+            if price_data:
+                prices[match.group(1)] = price_data
+        return prices
+    
+    async def get_fund_nav(self, fund_code: str) -> Optional[Dict]:
+        """
+        获取LOF基金场外净值（多数据源并发请求，取日期最新的净值）
+        
+        Args:
+            fund_code: 基金代码（6位数字）
+        
+        Returns:
+            包含净值信息的字典，如果失败返回None
+        """
+        cache_config = self.data_source_config.get('quote_cache', {})
+        cache_enabled = cache_config.get('enabled', True)
+        if cache_enabled:
+            cached = self.quote_cache.get((fund_code, 'nav'))
+            if cached:
+                return cached
+        
+        # 本地净值存储中已有预期日期的净值时不请求上游
+        nav_store = self.sync_fetcher.nav_store
+        stored = nav_store.get_latest(fund_code) if nav_store else None
+        if nav_store and not nav_store.needs_refresh(fund_code, stored):
+            nav_info = stored
+        else:
+            nav_info = await self._fetch_fund_nav(fund_code)
+            if nav_store:
+                if nav_info:
+                    nav_store.save(nav_info)
+                else:
+                    nav_store.mark_checked(fund_code)
+            nav_info = nav_info or stored
+        
+        if nav_info and cache_enabled:
+            self.quote_cache.set((fund_code, 'nav'), nav_info, cache_config.get('nav_ttl', 4 * 3600))
+        return nav_info
+    
+    async def _fetch_fund_nav(self, fund_code: str) -> Optional[Dict]:
+        """从上游获取净值（多数据源并发请求，取日期最新的净值）"""
+        tasks = []
+        if self.sync_fetcher._is_source_enabled('nav_sources', 'eastmoney_api'):
+            tasks.append(self._get_nav_eastmoney_api(fund_code))
+        if self.sync_fetcher._is_source_enabled('nav_sources', '1234567'):
+            tasks.append(self._get_nav_1234567(fund_code))
+        
+        navs = [nav for nav in await asyncio.gather(*tasks) if nav]
+        if not navs:
+            return None
+        
+        navs.sort(key=lambda x: x['date'], reverse=True)
+        return {k: v for k, v in navs[0].items() if k != 'source'}
+    
+    async def _get_nav_eastmoney_api(self, fund_code: str) -> Optional[Dict]:
+        """东方财富基金净值API"""
+        params = {
+            'callback': 'jQuery',
+            'fundCode': fund_code,
+            'pageIndex': 1,
+            'pageSize': 1,
+            'startDate': '',
+            'endDate': '',
+            '_': int(time.time() * 1000)
+        }
+        try:
+            content = await self._get_text('http://api.fund.eastmoney.com/f10/lsjz', params=params)
+            if content:
+                return self.sync_fetcher._parse_lsjz_nav(fund_code, content)
+        except Exception as e:
+            print(f"东方财富净值API获取失败 {fund_code}: {e}")
+        return None
+    
+    async def _get_nav_1234567(self, fund_code: str) -> Optional[Dict]:
+        """天天基金网API"""
+        try:
+            content = await self._get_text(f'http://fundgz.1234567.com.cn/js/{fund_code}.js')
+            if content:
+                return self.sync_fetcher._parse_fundgz_nav(fund_code, content)
+        except Exception as e:
+            print(f"天天基金API获取失败 {fund_code}: {e}")
+        return None
+    
+    async def get_fund_arbitrage_data(self, fund_code: str) -> Optional[Dict]:
+        """
+        从东方财富套利API获取单只基金的套利数据（价格+净值+溢价率）
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            包含套利相关信息的字典
+        """
+        params = {'pageIndex': 1, 'pageSize': 100, 'fundCode': fund_code}
+        try:
+            data = await self._get_json(self.ARBITRAGE_URL, params=params)
+            for item in ((data or {}).get('Data') or {}).get('List') or []:
+                if item.get('FundCode') == fund_code:
+                    return self.sync_fetcher._parse_arbitrage_item(item)
+        except Exception as e:
+            print(f"套利API获取失败 {fund_code}: {e}")
+        return None
+    
+    async def get_market_snapshot(self, page_size: int = 500, max_pages: int = 20) -> Dict[str, Dict]:
+        """
+        获取全市场套利数据快照：先取第一页得到总数，其余页并发请求
+        
+        Returns:
+            字典，key为基金代码，value为套利数据；获取失败返回空字典
+        """
+        async def fetch_page(page_index: int) -> Dict:
+            params = {'pageIndex': page_index, 'pageSize': page_size}
+            return ((await self._get_json(self.ARBITRAGE_URL, params=params)) or {}).get('Data') or {}
+        
+        snapshot = {}
+        try:
+            first_page = await fetch_page(1)
+            pages = [first_page]
+            items = first_page.get('List') or []
+            total_count = int(first_page.get('TotalCount') or first_page.get('Total') or 0)
+            if total_count > len(items) and len(items) >= page_size:
+                page_count = min(max_pages, -(-total_count // page_size))
+                pages += await asyncio.gather(*(fetch_page(i) for i in range(2, page_count + 1)))
+            
+            for page in pages:
+                for item in page.get('List') or []:
+                    fund_data = self.sync_fetcher._parse_arbitrage_item(item)
+                    if fund_data:
+                        snapshot[fund_data['code']] = fund_data
+        except Exception as e:
+            print(f"全市场套利快照获取失败: {e}")
+        return snapshot
+    
+    async def get_fund_purchase_limit(self, fund_code: str) -> Optional[Dict]:
+        """
+        获取基金限购信息（数据源主要是akshare同步接口，放到默认线程池执行，不阻塞事件循环）
+        
+        Args:
+            fund_code: 基金代码
+        
+        Returns:
+            限购信息字典
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.sync_fetcher.get_fund_purchase_limit, fund_code)
+    
+    async def get_fund_info(self, fund_code: str, snapshot: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
+        """
+        获取基金完整信息（价格+净值），数据验证规则与 LOFDataFetcher.get_fund_info 相同
+        
+        Args:
+            fund_code: 基金代码
+            snapshot: 全市场套利快照，传入时直接从快照取数
+        
+        Returns:
+            包含价格和净值的完整信息
+        """
+        if snapshot is not None:
+            arbitrage_data = snapshot.get(fund_code)
+        else:
+            arbitrage_data = await self.get_fund_arbitrage_data(fund_code)
+        
+        quotes = None
+        if not arbitrage_data:
+            price_info, nav_info = await asyncio.gather(self.get_fund_price(fund_code),
+                                                        self.get_fund_nav(fund_code))
+            quotes = {'price': price_info, 'nav': nav_info}
+        
+        # 数据已全部取到，验证逻辑不会再发起请求
+        return self.sync_fetcher.get_fund_info(
+            fund_code,
+            snapshot={fund_code: arbitrage_data} if arbitrage_data else {},
+            quotes=quotes
+        )
+    
+    async def get_fund_infos(self, fund_codes: List[str], use_snapshot: bool = True) -> Dict[str, Optional[Dict]]:
+        """
+        批量获取基金完整信息
+        
+        先取全市场快照，快照缺失的基金批量取价，再并发获取净值，所有请求在同一个事件循环中完成
+        
+        Args:
+            fund_codes: 基金代码列表
+            use_snapshot: 是否使用全市场快照
+        
+        Returns:
+            字典，key为基金代码，value为完整信息（无法获取时为None）
+        """
+        snapshot = await self.get_market_snapshot() if use_snapshot else None
+        if snapshot is not None and not snapshot:
+            snapshot = None
+        
+        missing_codes = [code for code in fund_codes if snapshot is None or code not in snapshot]
+        if missing_codes:
+            await self.get_fund_prices(missing_codes)
+        
+        async def fetch_one(fund_code: str) -> Optional[Dict]:
+            try:
+                return await self.get_fund_info(fund_code, snapshot=snapshot)
+            except Exception as e:
+                print(f"获取基金 {fund_code} 失败: {e}")
+                return None
+        
+        infos = await asyncio.gather(*(fetch_one(code) for code in fund_codes))
+        return dict(zip(fund_codes, infos))
+    
+    async def _scan(self, fund_codes: List[str], use_snapshot: bool) -> Dict[str, Optional[Dict]]:
+        async with self.session():
+            return await self.get_fund_infos(fund_codes, use_snapshot=use_snapshot)
+    
+    def scan(self, fund_codes: List[str], use_snapshot: bool = True) -> Dict[str, Optional[Dict]]:
+        """
+        同步入口：在新的事件循环中批量获取基金完整信息（供Flask后台轮询和命令行调用）
+        
+        Args:
+            fund_codes: 基金代码列表
+            use_snapshot: 是否使用全市场快照
+        
+        Returns:
+            字典，key为基金代码，value为完整信息（无法获取时为None）
+        """
+        started = time.time()
+        results = asyncio.run(self._scan(list(fund_codes), use_snapshot))
+        print(f"异步抓取完成：{len(results)} 只基金，耗时 {time.time() - started:.1f} 秒 "
+              f"({datetime.now().strftime('%H:%M:%S')})")
+        return results
@@ -27,6 +27,104 @@ ARBITRAGE_THRESHOLD = {
 # 数据源配置
 DATA_SOURCE = {
     'update_interval': 60,          # 数据更新间隔（秒）
+    'background_poll': True,        # 后台按更新间隔预先计算所有基金的套利结果，所有用户共享
+    
+    # 市场快照模式：批量接口一次拉取全市场套利数据，缺失的基金才逐个请求
+    'use_market_snapshot': True,
+    'snapshot_ttl': 30,             # 快照缓存时间（秒），同一刷新周期的多个批次共用
+    
+    # 行情缓存：所有用户和请求共享，同一基金的并发请求只访问一次上游
+    'quote_cache': {
+        'enabled': True,
+        'price_ttl': 10,            # 场内价格缓存时间（秒）
+        'nav_ttl': 4 * 3600,        # 净值缓存时间（秒），净值每天只更新一次
+        'max_size': 2000,           # 最多缓存条数（超出按LRU淘汰）
+    },
+    
+    # 价格数据源并发策略：所有启用的数据源同时请求，满足任一条件即返回
+    'price_quorum': {
+        'min_agree': 2,             # 有N个数据源价格一致即返回（0表示等待全部数据源）
+        'tolerance': 0.002,         # 价格一致的相对误差（0.2%）
+        'latency_budget': 2.0,      # 延迟预算（秒），超时后用已返回的价格
+        'max_workers': 50,          # 数据源请求线程池大小（进程内共享，修改后需重启）
+    },
+    'batch_quote_size': 80,         # 批量行情每次请求的基金代码数（新浪/腾讯多代码合并请求）
+    
+    # 净值本地存储：已公布的净值保存到SQLite，重启或晚间重复扫描不再请求上游
+    'nav_store': {
+        'enabled': True,
+        'db_file': 'nav_store.db',
+        'publish_hour': 21,         # 当日净值预计公布时间（时），之后才去取当天净值
+        'recheck_interval': 1800,   # 净值未按时公布（QDII、节假日等）时的重试间隔（秒）
+    },
+    
+    # 调试追踪：记录先写入内存环形缓冲区，由后台线程批量写文件；off时几乎没有开销
+    'tracing': {
+        'level': 'off',             # off / error / info / debug，管理员可在运行时切换
+        'log_file': 'trace.log',
+        'buffer_size': 10000,       # 内存缓冲区最多保留的记录数
+        'flush_interval': 2.0,      # 写文件间隔（秒）
+    },
+    
+    # HTTP连接池：每个上游主机单独的连接池大小和重试策略（池大小应不小于并发线程数）
+    'http_pools': {
+        'pool_block': True,         # 连接池耗尽时等待空闲连接，而不是新建连接后丢弃
+        'default': {'pool_maxsize': 20, 'retries': 1, 'backoff_factor': 0.3},
+        'hosts': {
+            'push2.eastmoney.com': {'pool_maxsize': 50, 'retries': 2, 'backoff_factor': 0.2},
+            'zqhdplus.eastmoney.com': {'pool_maxsize': 20, 'retries': 2, 'backoff_factor': 0.5},
+            'hq.sinajs.cn': {'pool_maxsize': 50, 'retries': 1, 'backoff_factor': 0.2},
+            'qt.gtimg.cn': {'pool_maxsize': 50, 'retries': 1, 'backoff_factor': 0.2},
+            'api.fund.eastmoney.com': {'pool_maxsize': 50, 'retries': 2, 'backoff_factor': 0.3},
+        },
+    },
+    
+    # 抓取引擎：'thread'=线程池（默认），'async'=asyncio+aiohttp（需安装aiohttp，单线程数百并发）
+    'fetch_engine': 'thread',
+    'async_engine': {
+        'max_in_flight': 200,       # 同时进行中的请求上限
+        'per_host_limit': 50,       # 单个上游主机的并发连接上限
+        'timeout': 10,              # 单个请求超时（秒）
+    },
+    
+    # 自动发现的基金列表缓存：启动时直接加载，过期后后台重新发现
+    'fund_universe': {
+        'cache_file': 'fund_universe.json',
+        'max_age': 86400,           # 缓存有效期（秒），默认每天重新发现一次
+        'retry_interval': 3600,     # 重新发现失败后的重试间隔（秒）
+    },
+    # 基金中文名称字典：接口只查本地字典，缺失的名称由后台线程先批量、再逐个（限速）补全
+    'name_resolver': {
+        'enabled': True,
+        'names_file': 'fund_names.json',
+        'rate_per_minute': 30,      # 逐个解析时每分钟最多请求数
+        'retry_interval': 86400,    # 解析失败的基金多久后再试（秒）
+    },
+    # 套利机会提醒：后台每轮扫描后，按用户的自选基金和提醒阈值批量创建站内通知
+    # （用户设置 alert_min_profit_rate 可覆盖默认阈值，alert_enabled 为 False 时不提醒）
+    'alerts': {
+        'enabled': True,
+        'min_profit_rate': 5.0,     # 默认提醒阈值（预期收益率%）
+        'window': 300,              # 同一基金的提醒间隔（秒）
+    },
+    # Tushare场内基金索引（基金列表和名称查询共用）的有效期（秒）
+    'tushare_fund_index_ttl': 86400,
+    # Tushare场内基金索引下载失败（限流、积分不足）后的重试间隔（秒），期间继续使用上次的索引
+    'tushare_fund_index_retry_interval': 3600,
+    # 东方财富基金列表的条件请求缓存（ETag/Last-Modified + 上次筛选结果），未变化时不重新下载
+    'fund_list_http_cache': 'fund_list_http_cache.json',
+    
+    # 交易日历调度：盘中按 update_interval 刷新，开盘、收盘前后加快；收盘后抓一次收盘价、
+    # 净值公布后抓一次净值，夜间、周末和节假日空闲
+    'trading_schedule': {
+        'enabled': True,
+        'calendar_file': 'trading_calendar.json',  # 节假日文件（配置Tushare时自动从 trade_cal 导入）
+        'fast_interval': 10,        # 开盘、收盘前后的刷新间隔（秒）
+        'edge_minutes': 5,          # 开盘后、收盘前多少分钟内使用 fast_interval
+        'post_close_delay': 120,    # 收盘后多久抓取一次收盘价（秒）
+        'nav_fetch_hour': 21,       # 交易日晚间抓取当日净值的时间（时）
+        'pre_open_seconds': 60,     # 开盘前多久醒来（秒）
+    },
     
     # 价格数据源配置（可启用多个，按优先级使用）
     'price_sources': {
@@ -64,6 +162,7 @@ DATA_SOURCE = {
         'eastmoney_api': {'enabled': True, 'priority': 2, 'name': '东方财富API'},
         'eastmoney_scrape': {'enabled': True, 'priority': 3, 'name': '东方财富网页爬取'},
     },
+    'purchase_limit_ttl': 300,      # akshare全量申购信息索引的刷新间隔（秒），过期后后台刷新
     
     # 向后兼容的旧配置
     'use_tushare': True,
@@ -4,12 +4,21 @@ LOF基金数据获取模块
 获取场内价格和场外净值
 """
 
+import os
 import requests
 import json
 import time
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Optional, List
 from datetime import datetime, timedelta
 from config import DATA_SOURCE
+from http_pool import mount_host_pools
+from nav_store import NavStore
+from trading_calendar import trading_calendar
+from tracing import trace
 
 # 尝试导入Tushare
 try:
@@ -36,11 +45,177 @@ except ImportError:
     print("警告: baostock未安装，将使用其他数据源")
 
 
+class _InFlightCall:
+    """正在进行中的一次数据获取（供并发请求等待同一结果）"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+@lru_cache(maxsize=8192)
+def classify_fund_type(name: str, fund_type: str = '') -> str:
+    """
+    分类基金类型：指数型或股票型（按名称缓存，排序分类时可反复调用）
+    
+    Args:
+        name: 基金名称
+        fund_type: 基金类型字段
+        
+    Returns:
+        'index' 或 'stock'
+    """
+    name_lower = name.lower()
+    type_lower = fund_type.lower() if fund_type else ''
+    
+    # 指数型LOF的特征
+    index_keywords = [
+        '指数', 'index', 'etf', '中证', '国证', '上证', '深证',
+        '沪深', '创业板', '中小板', '行业', '主题', '分级'
+    ]
+    
+    # 股票型LOF的特征
+    stock_keywords = [
+        '混合', '股票', '成长', '价值', '精选', '优选', '灵活',
+        '配置', '策略', '主题', '行业精选'
+    ]
+    
+    # 优先判断指数型（特征更明显）
+    for keyword in index_keywords:
+        if keyword in name_lower or keyword in type_lower:
+            return 'index'
+    
+    # 判断股票型
+    for keyword in stock_keywords:
+        if keyword in name_lower or keyword in type_lower:
+            return 'stock'
+    
+    # 默认：如果名称包含"指数"相关词汇，归为指数型，否则归为股票型
+    if any(kw in name_lower for kw in ['指数', 'index', 'etf']):
+        return 'index'
+    else:
+        return 'stock'
+
+
+class QuoteCache:
+    """
+    进程内行情缓存
+    
+    按 (基金代码, 数据类型) 缓存价格/净值等行情数据：
+    - 每条数据有独立的过期时间（TTL）
+    - 超过容量时按LRU淘汰最久未使用的数据
+    - single-flight：同一个key同时只发起一次上游请求，并发请求等待该次结果
+    """
+    
+    def __init__(self, max_size: int = 2000):
+        self.max_size = max_size
+        self._data = OrderedDict()  # key -> (过期时间戳, 数据)
+        self._inflight = {}  # key -> _InFlightCall
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """获取未过期的缓存数据，不存在或已过期返回None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return self._copy(entry[1])
+    
+    def set(self, key, value, ttl: float):
+        """写入缓存数据"""
+        with self._lock:
+            self._set_locked(key, value, ttl)
+    
+    def get_or_fetch(self, key, ttl: float, fetch_func):
+        """
+        获取缓存数据，未命中时调用fetch_func获取并写入缓存
+        
+        Args:
+            key: 缓存键，如 ('161725', 'price')
+            ttl: 缓存有效期（秒）
+            fetch_func: 无参数的数据获取函数，返回None表示获取失败（不缓存）
+            
+        Returns:
+            缓存或新获取的数据
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._data.move_to_end(key)
+                    return self._copy(entry[1])
+                del self._data[key]
+            
+            call = self._inflight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InFlightCall()
+                self._inflight[key] = call
+        
+        if not is_leader:
+            # 已有相同请求在进行中，等待其结果而不是重复请求上游
+            call.event.wait()
+            return self._copy(call.value)
+        
+        value = None
+        try:
+            value = fetch_func()
+            return self._copy(value)
+        finally:
+            with self._lock:
+                if value is not None:
+                    self._set_locked(key, value, ttl)
+                self._inflight.pop(key, None)
+            call.value = value
+            call.event.set()
+    
+    def invalidate(self, key):
+        """删除指定缓存"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def _set_locked(self, key, value, ttl: float):
+        self._data[key] = (time.time() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+    
+    @staticmethod
+    def _copy(value):
+        # 返回副本，避免调用方修改缓存中的数据
+        return dict(value) if isinstance(value, dict) else value
+
+
+# 进程内共享的行情缓存（所有LOFDataFetcher实例共用，重建数据获取器后缓存仍有效）
+quote_cache = QuoteCache(max_size=DATA_SOURCE.get('quote_cache', {}).get('max_size', 2000))
+
+# 进程内共享的价格数据源并发请求线程池（多个数据源同时请求，按法定数量提前返回）；
+# 所有LOFDataFetcher实例共用，运行时重建数据获取器不会遗留线程池
+price_source_executor = ThreadPoolExecutor(
+    max_workers=DATA_SOURCE.get('price_quorum', {}).get('max_workers', 50),
+    thread_name_prefix='price-source'
+)
+
+
 class LOFDataFetcher:
     """LOF基金数据获取器 - 多数据源支持（包括Tushare）"""
     
     def __init__(self, tushare_token: str = None):
         self.session = requests.Session()
+        # 按上游主机挂载连接池（池大小与并发线程数匹配，避免连接被反复丢弃和重新握手）
+        mount_host_pools(self.session, DATA_SOURCE.get('http_pools'))
         # 禁用代理，避免代理错误
         self.session.proxies = {
             'http': None,
@@ -62,100 +237,80 @@ class LOFDataFetcher:
         tushare_config = fund_list_sources.get('tushare', {})
         use_tushare = tushare_config.get('enabled', True) if fund_list_sources else DATA_SOURCE.get('use_tushare', True)
         
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'C',
-            'location': 'data_fetcher.py:__init__:tushare_init_check',
-            'message': '检查Tushare初始化条件',
-            'data': {
-                'tushare_available': TUSHARE_AVAILABLE,
-                'use_tushare': use_tushare,
-                'has_token': tushare_token is not None,
-                'token_length': len(tushare_token) if tushare_token else 0,
-                'token_preview': tushare_token[:20] + '...' if tushare_token and len(tushare_token) > 20 else tushare_token
-            },
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('data_fetcher.py:__init__:tushare_init_check', '检查Tushare初始化条件', {
+            'tushare_available': TUSHARE_AVAILABLE,
+            'use_tushare': use_tushare,
+            'has_token': tushare_token is not None,
+            'token_length': len(tushare_token) if tushare_token else 0
+        })
         
         if TUSHARE_AVAILABLE and use_tushare and tushare_token:
             try:
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'C',
-                    'location': 'data_fetcher.py:__init__:before_set_token',
-                    'message': '准备设置Tushare token',
-                    'data': {},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:__init__:before_set_token', '准备设置Tushare token')
                 
                 ts.set_token(tushare_token)
                 self.tushare_pro = ts.pro_api()
                 
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'C',
-                    'location': 'data_fetcher.py:__init__:tushare_init_success',
-                    'message': 'Tushare数据源初始化成功',
-                    'data': {},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:__init__:tushare_init_success', 'Tushare数据源初始化成功')
                 
                 print("Tushare数据源已初始化")
             except Exception as e:
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'C',
-                    'location': 'data_fetcher.py:__init__:tushare_init_error',
-                    'message': 'Tushare初始化失败',
-                    'data': {
-                        'error_type': type(e).__name__,
-                        'error_message': str(e),
-                        'error_str': str(e)
-                    },
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:__init__:tushare_init_error', 'Tushare初始化失败', {
+                    'error_type': type(e).__name__,
+                    'error_message': str(e),
+                    'error_str': str(e)
+                }, level='error')
                 print(f"Tushare初始化失败: {e}")
                 self.tushare_pro = None
         
+        # 本地交易日历未覆盖今年时，后台从Tushare导入节假日
+        if self.tushare_pro and not trading_calendar.covers(datetime.now().year):
+            threading.Thread(target=trading_calendar.seed_from_tushare, args=(self.tushare_pro,),
+                             name='trading-calendar-seed', daemon=True).start()
+        
         # baostock在需要时再登录
         self.baostock_logged_in = False
         
-        # 缓存akshare基金申购信息（避免重复下载所有基金数据）
-        self._akshare_purchase_cache = None
-        self._akshare_purchase_cache_time = None
+        # akshare基金申购信息索引（基金代码 -> 解析后的限购信息），下载后一次性建好，过期后后台刷新
+        self._purchase_limit_index: Dict[str, Dict] = {}
+        # 最近一次尝试下载的时间（失败也更新，用于控制刷新频率）
+        self._purchase_limit_index_time = None
+        # 当前索引实际下载成功的时间（用作 limit_as_of）
+        self._purchase_limit_downloaded_at = None
+        self._purchase_limit_index_lock = threading.Lock()
+        self._purchase_limit_refreshing = False
+        
+        # Tushare场内基金索引（基金代码 -> 名称/类型/分类），整表下载一次，供基金列表和名称查询共用
+        self._tushare_fund_index: Dict[str, Dict] = {}
+        self._tushare_fund_index_time = None
+        # 最近一次下载失败的时间，重试间隔内继续使用上次的索引（可能为空）
+        self._tushare_fund_index_failed_at = None
+        self._tushare_fund_index_lock = threading.Lock()
+        
+        # 价格/净值行情缓存（进程内共享）
+        self.quote_cache = quote_cache
+        
+        # 净值本地存储（已公布的净值持久化，重启后无需重新请求）
+        self.nav_store = None
+        nav_store_config = self.data_source_config.get('nav_store', {})
+        if nav_store_config.get('enabled', True):
+            try:
+                self.nav_store = NavStore(
+                    db_file=nav_store_config.get('db_file', 'nav_store.db'),
+                    publish_hour=nav_store_config.get('publish_hour', 21),
+                    recheck_interval=nav_store_config.get('recheck_interval', 1800),
+                    calendar=trading_calendar
+                )
+            except Exception as e:
+                print(f"净值本地存储初始化失败，将直接请求上游: {e}")
+        
+        # 全市场套利数据快照（批量接口一次拉取，供同一刷新周期的多个批次复用）
+        self._market_snapshot = {}
+        self._market_snapshot_time = None
+        self._market_snapshot_lock = threading.Lock()
         
-        # 缓存akshare基金申购信息（避免重复下载）
-        self._akshare_purchase_cache = None
-        self._akshare_purchase_cache_time = None
+        # 价格数据源并发请求线程池（进程内共享）
+        self._price_source_executor = price_source_executor
     
     def _is_source_enabled(self, source_type: str, source_name: str) -> bool:
         """检查数据源是否启用"""
@@ -172,7 +327,7 @@ class LOFDataFetcher:
     
     def get_fund_chinese_name_tushare(self, fund_code: str) -> Optional[str]:
         """
-        使用Tushare获取基金中文名称
+        使用Tushare获取基金中文名称（优先查场内基金索引，索引中没有时再按代码单独查询）
         
         Args:
             fund_code: 基金代码（6位数字）
@@ -183,244 +338,140 @@ class LOFDataFetcher:
         if not self.tushare_pro:
             return None
         
+        def has_chinese(name):
+            return bool(name) and any('\u4e00' <= char <= '\u9fff' for char in name)
+        
+        entry = self._get_tushare_fund_index().get(str(fund_code))
+        if entry is not None:
+            return entry['name'] if has_chinese(entry['name']) else None
+        
         try:
-            # 使用Tushare获取基金基本信息
-            # Tushare的基金代码格式：市场代码+基金代码，如 159001.SZ
-            # LOF基金通常在深圳(SZ)或上海(SH)
-            markets = ['SZ', 'SH']
-            
-            for market in markets:
+            # 索引只包含上市中的场内基金，其余基金按 代码.市场 单独查询
+            # Tushare的基金代码格式：基金代码+市场代码，如 159001.SZ
+            for market in ['SZ', 'SH']:
                 try:
-                    # 构建Tushare代码格式
-                    ts_code = f"{fund_code}.{market}"
-                    
-                    # 获取基金基本信息
                     df = self.tushare_pro.fund_basic(
-                        ts_code=ts_code,
+                        ts_code=f"{fund_code}.{market}",
                         fields='ts_code,name,fund_type,market'
                     )
-                    
                     if df is not None and not df.empty:
                         name = df.iloc[0]['name']
-                        if name and any('\u4e00' <= char <= '\u9fff' for char in name):
+                        if has_chinese(name):
                             return name
                 except:
                     continue
-            
-            # 如果直接查询失败，尝试通过基金代码匹配
-            try:
-                df = self.tushare_pro.fund_basic(
-                    market='E',  # E表示场内基金
-                    status='L'   # L表示上市
-                )
-                
-                if df is not None and not df.empty:
-                    # 查找匹配的基金代码
-                    fund_code_str = str(fund_code)
-                    for _, row in df.iterrows():
-                        ts_code = str(row.get('ts_code', ''))
-                        # 如果ts_code包含基金代码
-                        if fund_code_str in ts_code:
-                            name = row.get('name', '')
-                            if name and any('\u4e00' <= char <= '\u9fff' for char in name):
-                                return name
-            except:
-                pass
-                
         except Exception as e:
             print(f"Tushare获取基金名称失败 {fund_code}: {e}")
         
         return None
     
-    def get_lof_funds_list_tushare(self) -> List[Dict]:
+    def _get_tushare_fund_index(self) -> Dict[str, Dict]:
         """
-        使用Tushare获取LOF基金列表（包含基金类型）
+        获取Tushare场内基金索引（过期后重新下载，默认每天一次；下载失败后按重试间隔再试）
         
         Returns:
-            基金列表，包含代码、中文名称和类型（index/stock）
+            {基金代码: {'ts_code', 'name', 'fund_type', 'category', 'is_lof'}}，Tushare不可用时返回空字典
         """
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'data_fetcher.py:get_lof_funds_list_tushare:entry',
-            'message': '开始从Tushare获取LOF基金列表',
-            'data': {'tushare_pro_available': self.tushare_pro is not None},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
-        
         if not self.tushare_pro:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'data_fetcher.py:get_lof_funds_list_tushare:no_tushare',
-                'message': 'Tushare未初始化，无法获取基金列表',
-                'data': {},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
-            return []
+            return {}
         
-        try:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'data_fetcher.py:get_lof_funds_list_tushare:before_api_call',
-                'message': '准备调用Tushare API',
-                'data': {},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
-            
-            # 获取场内上市基金
-            df = self.tushare_pro.fund_basic(
-                market='E',  # E表示场内基金
-                status='L'   # L表示上市
-            )
-            
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'data_fetcher.py:get_lof_funds_list_tushare:after_api_call',
-                'message': 'Tushare API调用完成',
-                'data': {
-                    'df_is_none': df is None,
-                    'df_empty': df.empty if df is not None else None,
-                    'df_shape': list(df.shape) if df is not None else None
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
-            
-            if df is not None and not df.empty:
-                lof_funds = []
-                for _, row in df.iterrows():
-                    ts_code = str(row.get('ts_code', ''))
-                    name = str(row.get('name', ''))
-                    fund_type = str(row.get('fund_type', ''))
-                    
-                    # 筛选LOF基金（名称包含LOF或基金类型为LOF）
-                    if 'LOF' in name.upper() or 'LOF' in fund_type.upper():
-                        # 提取基金代码（从ts_code中提取，如159001.SZ -> 159001）
-                        if '.' in ts_code:
-                            code = ts_code.split('.')[0]
-                            if len(code) == 6 and code.isdigit():
-                                # 判断基金类型：指数型或股票型
-                                fund_category = self._classify_fund_type(name, fund_type)
-                                
-                                lof_funds.append({
-                                    'code': code,
-                                    'name': name,
-                                    'type': fund_category  # 'index' 或 'stock'
-                                })
-                
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'B',
-                    'location': 'data_fetcher.py:get_lof_funds_list_tushare:success',
-                    'message': '成功获取LOF基金列表',
-                    'data': {'lof_funds_count': len(lof_funds)},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
-                
-                return lof_funds
-        except Exception as e:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'data_fetcher.py:get_lof_funds_list_tushare:error',
-                'message': 'Tushare获取LOF基金列表失败',
-                'data': {
-                    'error_type': type(e).__name__,
-                    'error_message': str(e),
-                    'error_str': str(e)
-                },
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
-            print(f"Tushare获取LOF基金列表失败: {e}")
+        if not self._tushare_fund_index_due():
+            return self._tushare_fund_index
         
-        return []
+        with self._tushare_fund_index_lock:
+            # 其他线程可能已经下载完成（或刚刚失败）
+            if not self._tushare_fund_index_due():
+                return self._tushare_fund_index
+            try:
+                df = self.tushare_pro.fund_basic(
+                    market='E',  # E表示场内基金
+                    status='L'   # L表示上市
+                )
+                index = self._build_tushare_fund_index(df)
+                self._tushare_fund_index = index
+                self._tushare_fund_index_time = datetime.now()
+                self._tushare_fund_index_failed_at = None
+                trace('data_fetcher.py:_get_tushare_fund_index:built', 'Tushare场内基金索引已建立', {'count': len(index)})
+            except Exception as e:
+                self._tushare_fund_index_failed_at = datetime.now()
+                print(f"Tushare获取场内基金列表失败: {e}")
+        return self._tushare_fund_index
     
-    def _classify_fund_type(self, name: str, fund_type: str = '') -> str:
+    def _tushare_fund_index_due(self) -> bool:
+        """Tushare场内基金索引是否需要（重新）下载"""
+        now = datetime.now()
+        failed_at = self._tushare_fund_index_failed_at
+        retry_interval = self.data_source_config.get('tushare_fund_index_retry_interval', 3600)
+        if failed_at is not None and (now - failed_at).total_seconds() < retry_interval:
+            return False
+        index_time = self._tushare_fund_index_time
+        ttl = self.data_source_config.get('tushare_fund_index_ttl', 86400)
+        return index_time is None or (now - index_time).total_seconds() >= ttl
+    
+    def _build_tushare_fund_index(self, df) -> Dict[str, Dict]:
         """
-        分类基金类型：指数型或股票型
+        用向量化的字符串操作把 fund_basic 结果整理为索引
         
         Args:
-            name: 基金名称
-            fund_type: 基金类型字段
+            df: tushare fund_basic 返回的DataFrame
             
         Returns:
-            'index' 或 'stock'
+            {基金代码: {'ts_code', 'name', 'fund_type', 'category', 'is_lof'}}
         """
-        name_lower = name.lower()
-        type_lower = fund_type.lower() if fund_type else ''
+        if df is None or df.empty:
+            return {}
+        
+        ts_codes = df['ts_code'].fillna('').astype(str)
+        names = df['name'].fillna('').astype(str)
+        fund_types = df['fund_type'].fillna('').astype(str) if 'fund_type' in df.columns else names.str.slice(0, 0)
+        # 从ts_code中提取基金代码（如159001.SZ -> 159001），只保留6位数字代码
+        codes = ts_codes.str.split('.', n=1).str[0]
+        valid = ts_codes.str.contains('.', regex=False) & codes.str.fullmatch(r'\d{6}')
+        # 名称包含LOF或基金类型为LOF
+        is_lof = (names.str.upper().str.contains('LOF', regex=False) |
+                  fund_types.str.upper().str.contains('LOF', regex=False))
+        
+        index = {}
+        for code, ts_code, name, fund_type, lof in zip(codes[valid], ts_codes[valid], names[valid],
+                                                        fund_types[valid], is_lof[valid]):
+            index[code] = {
+                'ts_code': ts_code,
+                'name': name,
+                'fund_type': fund_type,
+                'category': classify_fund_type(name, fund_type),
+                'is_lof': bool(lof),
+            }
+        return index
+    
+    def get_lof_funds_list_tushare(self) -> List[Dict]:
+        """
+        使用Tushare获取LOF基金列表（包含基金类型）
         
-        # 指数型LOF的特征
-        index_keywords = [
-            '指数', 'index', 'etf', '中证', '国证', '上证', '深证',
-            '沪深', '创业板', '中小板', '行业', '主题', '分级'
-        ]
+        Returns:
+            基金列表，包含代码、中文名称和类型（index/stock）
+        """
+        trace('data_fetcher.py:get_lof_funds_list_tushare:entry', '开始从Tushare获取LOF基金列表', {'tushare_pro_available': self.tushare_pro is not None})
         
-        # 股票型LOF的特征
-        stock_keywords = [
-            '混合', '股票', '成长', '价值', '精选', '优选', '灵活',
-            '配置', '策略', '主题', '行业精选'
-        ]
+        if not self.tushare_pro:
+            trace('data_fetcher.py:get_lof_funds_list_tushare:no_tushare', 'Tushare未初始化，无法获取基金列表')
+            return []
         
-        # 优先判断指数型（特征更明显）
-        for keyword in index_keywords:
-            if keyword in name_lower or keyword in type_lower:
-                return 'index'
+        lof_funds = [
+            {
+                'code': code,
+                'name': entry['name'],
+                'type': entry['category']  # 'index' 或 'stock'
+            }
+            for code, entry in self._get_tushare_fund_index().items() if entry['is_lof']
+        ]
         
-        # 判断股票型
-        for keyword in stock_keywords:
-            if keyword in name_lower or keyword in type_lower:
-                return 'stock'
+        trace('data_fetcher.py:get_lof_funds_list_tushare:success', '成功获取LOF基金列表', {'lof_funds_count': len(lof_funds)})
         
-        # 默认：如果名称包含"指数"相关词汇，归为指数型，否则归为股票型
-        if any(kw in name_lower for kw in ['指数', 'index', 'etf']):
-            return 'index'
-        else:
-            return 'stock'
+        return lof_funds
+    
+    def _classify_fund_type(self, name: str, fund_type: str = '') -> str:
+        """分类基金类型：指数型或股票型（见 classify_fund_type）"""
+        return classify_fund_type(name, fund_type)
     
     def get_fund_chinese_name(self, fund_code: str) -> Optional[str]:
         """
@@ -432,42 +483,13 @@ class LOFDataFetcher:
         Returns:
             基金中文名称，如果失败返回None
         """
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'D',
-            'location': 'data_fetcher.py:get_fund_chinese_name:entry',
-            'message': '开始获取基金中文名称',
-            'data': {'fund_code': fund_code, 'tushare_available': self.tushare_pro is not None},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('data_fetcher.py:get_fund_chinese_name:entry', '开始获取基金中文名称', {'fund_code': fund_code, 'tushare_available': self.tushare_pro is not None})
         
         # 优先使用Tushare获取（最准确）
         if self.tushare_pro:
             tushare_name = self.get_fund_chinese_name_tushare(fund_code)
             if tushare_name:
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'D',
-                    'location': 'data_fetcher.py:get_fund_chinese_name:tushare_success',
-                    'message': '从Tushare获取中文名称成功',
-                    'data': {'fund_code': fund_code, 'name': tushare_name},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:get_fund_chinese_name:tushare_success', '从Tushare获取中文名称成功', {'fund_code': fund_code, 'name': tushare_name})
                 return tushare_name
         
         # 方法1：从基金基本信息API获取（最可靠）
@@ -491,21 +513,7 @@ class LOFDataFetcher:
                             for field in name_fields:
                                 name = data['Data'].get(field, '')
                                 if name and any('\u4e00' <= char <= '\u9fff' for char in name):
-                                    # #region agent log
-                                    log_data = {
-                                        'sessionId': 'debug-session',
-                                        'runId': 'run1',
-                                        'hypothesisId': 'D',
-                                        'location': 'data_fetcher.py:get_fund_chinese_name:success_api',
-                                        'message': '从API获取中文名称成功',
-                                        'data': {'fund_code': fund_code, 'name': name, 'field': field},
-                                        'timestamp': int(time.time() * 1000)
-                                    }
-                                    try:
-                                        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                    except: pass
-                                    # #endregion
+                                    trace('data_fetcher.py:get_fund_chinese_name:success_api', '从API获取中文名称成功', {'fund_code': fund_code, 'name': name, 'field': field})
                                     return name
             except Exception as e:
                 pass
@@ -523,27 +531,48 @@ class LOFDataFetcher:
                     if name_match:
                         name = name_match.group(1)
                         if any('\u4e00' <= char <= '\u9fff' for char in name):
-                            # #region agent log
-                            log_data = {
-                                'sessionId': 'debug-session',
-                                'runId': 'run1',
-                                'hypothesisId': 'D',
-                                'location': 'data_fetcher.py:get_fund_chinese_name:success_js',
-                                'message': '从JS文件获取中文名称成功',
-                                'data': {'fund_code': fund_code, 'name': name},
-                                'timestamp': int(time.time() * 1000)
-                            }
-                            try:
-                                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                            except: pass
-                            # #endregion
+                            trace('data_fetcher.py:get_fund_chinese_name:success_js', '从JS文件获取中文名称成功', {'fund_code': fund_code, 'name': name})
                             return name
             except Exception as e:
                 pass
         
         return None
     
+    def get_fund_chinese_names(self, fund_codes: List[str]) -> Dict[str, str]:
+        """
+        批量获取基金中文名称（Tushare场内基金索引 + 东方财富全量基金列表，各一次请求）
+        
+        Args:
+            fund_codes: 基金代码列表
+            
+        Returns:
+            {基金代码: 中文名称}，未找到的基金不包含在结果中
+        """
+        def has_chinese(name):
+            return bool(name) and any('\u4e00' <= char <= '\u9fff' for char in name)
+        
+        names = {}
+        index = self._get_tushare_fund_index()
+        for fund_code in fund_codes:
+            entry = index.get(fund_code)
+            if entry is not None and has_chinese(entry['name']):
+                names[fund_code] = entry['name']
+        
+        remaining = set(fund_codes) - set(names)
+        if remaining:
+            try:
+                url = 'http://fund.eastmoney.com/js/fundcode_search.js'
+                with self.session.get(url, timeout=10, stream=True) as response:
+                    if response.status_code == 200:
+                        for code, _, name in self._iter_fundcode_entries(
+                                response.iter_content(chunk_size=65536), 'utf-8'):
+                            if code in remaining and has_chinese(name):
+                                names[code] = name
+            except Exception as e:
+                print(f"批量获取基金名称失败: {e}")
+        
+        return names
+    
     def get_lof_funds_list(self) -> list:
         """
         获取LOF基金列表（优先使用Tushare）
@@ -551,156 +580,151 @@ class LOFDataFetcher:
         Returns:
             基金列表，包含代码和名称
         """
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'data_fetcher.py:get_lof_funds_list:entry',
-            'message': '开始获取LOF基金列表',
-            'data': {'tushare_available': self.tushare_pro is not None},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('data_fetcher.py:get_lof_funds_list:entry', '开始获取LOF基金列表', {'tushare_available': self.tushare_pro is not None})
         
         # 优先使用Tushare获取（更准确，包含中文名称）
         if self.tushare_pro:
             tushare_funds = self.get_lof_funds_list_tushare()
             if tushare_funds:
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'B',
-                    'location': 'data_fetcher.py:get_lof_funds_list:tushare_success',
-                    'message': '从Tushare获取LOF基金列表成功',
-                    'data': {'count': len(tushare_funds), 'sample': tushare_funds[:3]},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:get_lof_funds_list:tushare_success', '从Tushare获取LOF基金列表成功', {'count': len(tushare_funds), 'sample': tushare_funds[:3]})
                 return tushare_funds
         
         # 备用方案：从东方财富获取
+        return self.get_lof_funds_list_eastmoney()
+    
+    def get_lof_funds_list_eastmoney(self) -> List[Dict]:
+        """
+        从东方财富 fundcode_search.js 获取LOF基金列表
+        
+        按块流式解析响应、边下载边筛选，不在内存中保留整个文件和全部匹配结果；
+        使用条件请求（ETag / If-Modified-Since），列表未变化时服务器返回304，直接使用上次的结果
+        
+        Returns:
+            基金列表，包含代码和名称
+        """
+        cache_file = self.data_source_config.get('fund_list_http_cache', 'fund_list_http_cache.json')
+        cached = self._load_fund_list_http_cache(cache_file)
+        
+        headers = {}
+        if cached.get('funds'):
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        
         try:
-            # 从东方财富获取LOF基金列表
             url = 'http://fund.eastmoney.com/js/fundcode_search.js'
-            response = self.session.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                import re
-                # 解析JS文件中的基金数据
-                content = response.text
-                # 提取所有基金数据
-                pattern = r'\["(\d{6})","([^"]+)"[^\]]*\]'
-                matches = re.findall(pattern, content)
+            with self.session.get(url, headers=headers, timeout=10, stream=True) as response:
+                if response.status_code == 304:
+                    trace('data_fetcher.py:get_lof_funds_list:not_modified', '基金列表未变化，使用上次结果', {'count': len(cached['funds'])})
+                    return cached['funds']
+                if response.status_code != 200:
+                    return []
                 
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'B',
-                    'location': 'data_fetcher.py:get_lof_funds_list:after_parse',
-                    'message': '解析基金数据完成',
-                    'data': {'total_matches': len(matches), 'sample_matches': matches[:3]},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                # 未声明字符集时requests会按ISO-8859-1解码，东方财富的JS实际为UTF-8
+                content_type = response.headers.get('Content-Type', '').lower()
+                encoding = response.encoding if 'charset' in content_type and response.encoding else 'utf-8'
                 
+                total = 0
                 lof_funds = []
-                filtered_by_code_16 = 0
-                filtered_by_code_50_51 = 0
-                filtered_by_name_lof = 0
-                filtered_both = 0
-                
-                for code, name in matches:
-                    # 改进的LOF基金筛选逻辑：
-                    # 1. LOF基金代码通常以16开头（深圳）或50/51开头（上海）
-                    # 2. 名称包含LOF、lof、上市型开放式、上市开放式
-                    is_lof_code = (code.startswith('16') or 
-                                  code.startswith('50') or 
-                                  code.startswith('51'))
-                    has_lof_name = ('LOF' in name or 
-                                   'lof' in name.lower() or
-                                   '上市型开放式' in name or
-                                   '上市开放式' in name)
-                    
-                    if code.startswith('16'):
-                        filtered_by_code_16 += 1
-                    if code.startswith('50') or code.startswith('51'):
-                        filtered_by_code_50_51 += 1
-                    if has_lof_name:
-                        filtered_by_name_lof += 1
-                    
-                    # 只要满足代码范围或名称包含LOF即可（放宽条件）
-                    if is_lof_code and has_lof_name:
-                        filtered_both += 1
-                        # 先使用原始名称，中文名称在批量处理时获取（避免太慢）
-                        lof_funds.append({
-                            'code': code,
-                            'name': name
-                        })
+                for code, abbr, name in self._iter_fundcode_entries(
+                        response.iter_content(chunk_size=65536), encoding):
+                    total += 1
+                    if self._is_lof_candidate(code, abbr, name):
+                        # 先使用列表中的名称，中文名称在批量处理时获取（避免太慢）
+                        lof_funds.append({'code': code, 'name': name or abbr})
                 
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'B',
-                    'location': 'data_fetcher.py:get_lof_funds_list:after_filter',
-                    'message': '筛选LOF基金完成',
-                    'data': {
-                        'total_funds': len(matches),
-                        'code_16_count': filtered_by_code_16,
-                        'code_50_51_count': filtered_by_code_50_51,
-                        'name_lof_count': filtered_by_name_lof,
-                        'both_match_count': filtered_both,
-                        'final_lof_count': len(lof_funds),
-                        'sample_lof_funds': lof_funds[:5]
-                    },
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:get_lof_funds_list:after_filter', '筛选LOF基金完成', {
+                    'total_funds': total,
+                    'final_lof_count': len(lof_funds),
+                    'sample_lof_funds': lof_funds[:5]
+                })
                 
+                if lof_funds:
+                    self._save_fund_list_http_cache(cache_file, {
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'funds': lof_funds
+                    })
                 return lof_funds
         except Exception as e:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'data_fetcher.py:get_lof_funds_list:error',
-                'message': '获取LOF基金列表失败',
-                'data': {'error': str(e)},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('data_fetcher.py:get_lof_funds_list:error', '获取LOF基金列表失败', {'error': str(e)}, level='error')
             print(f"获取LOF基金列表失败: {e}")
         
         return []
     
+    @staticmethod
+    def _iter_fundcode_entries(chunks, encoding: str = 'utf-8'):
+        """
+        从 fundcode_search.js 的响应块中逐条解析基金
+        
+        文件格式：var r = [["000001","HXCZHH","华夏成长混合","混合型-灵活","HUAXIACHENGZHANGHUNHE"],...];
+        
+        Args:
+            chunks: 响应内容块（bytes）的迭代器
+            encoding: 响应编码
+            
+        Yields:
+            (基金代码, 拼音简称, 基金名称)
+        """
+        import codecs
+        import re
+        pattern = re.compile(r'\["(\d{6})","([^"]*)"(?:,"([^"]*)")?[^\]]*\]')
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        buffer = ''
+        for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            end = 0
+            for match in pattern.finditer(buffer):
+                end = match.end()
+                yield match.group(1), match.group(2), match.group(3) or ''
+            # 只保留最后一条完整记录之后的部分（可能是被块边界截断的记录）
+            buffer = buffer[end:] if end else buffer[-4096:]
+        buffer += decoder.decode(b'', final=True)
+        for match in pattern.finditer(buffer):
+            yield match.group(1), match.group(2), match.group(3) or ''
+    
+    @staticmethod
+    def _is_lof_candidate(code: str, abbr: str, name: str) -> bool:
+        """
+        LOF基金筛选：代码以16开头（深圳）或50/51开头（上海），
+        且简称或名称包含LOF、上市型开放式、上市开放式
+        """
+        if not code.startswith(('16', '50', '51')):
+            return False
+        for text in (abbr, name):
+            if ('LOF' in text.upper() or
+                    '上市型开放式' in text or
+                    '上市开放式' in text):
+                return True
+        return False
+    
+    @staticmethod
+    def _load_fund_list_http_cache(cache_file: str) -> Dict:
+        """读取上次下载的基金列表及其ETag/Last-Modified"""
+        if not cache_file or not os.path.exists(cache_file):
+            return {}
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"读取基金列表缓存失败: {e}")
+            return {}
+    
+    @staticmethod
+    def _save_fund_list_http_cache(cache_file: str, data: Dict):
+        """保存基金列表及其ETag/Last-Modified"""
+        if not cache_file:
+            return
+        try:
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存基金列表缓存失败: {e}")
+    
     def get_fund_price(self, fund_code: str, market: str = 'auto') -> Optional[Dict]:
         """
-        获取LOF基金场内实时价格（多数据源交叉验证）
+        获取LOF基金场内实时价格（优先使用进程内行情缓存）
         
         Args:
             fund_code: 基金代码（6位数字）
@@ -709,179 +733,157 @@ class LOFDataFetcher:
         Returns:
             包含价格信息的字典，如果失败返回None
         """
-        # 自动判断市场：16开头通常是深圳，50/51开头通常是上海
-        if market == 'auto':
-            if fund_code.startswith('16'):
-                market = 'sz'
-            elif fund_code.startswith('50') or fund_code.startswith('51'):
-                market = 'sh'
-            else:
-                market = 'sz'  # 默认深圳
+        cache_config = self.data_source_config.get('quote_cache', {})
+        if not cache_config.get('enabled', True):
+            return self._fetch_fund_price(fund_code, market)
+        
+        kind = 'price' if market == 'auto' else f'price_{market}'
+        return self.quote_cache.get_or_fetch(
+            (fund_code, kind),
+            cache_config.get('price_ttl', 10),
+            lambda: self._fetch_fund_price(fund_code, market)
+        )
+    
+    @staticmethod
+    def _guess_market(fund_code: str) -> str:
+        """根据基金代码判断交易所：16开头通常是深圳，50/51开头通常是上海，默认深圳"""
+        if fund_code.startswith('50') or fund_code.startswith('51'):
+            return 'sh'
+        return 'sz'
+    
+    def get_fund_prices(self, fund_codes: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取多只基金的场内实时价格
         
-        secid_map = {'sz': '1', 'sh': '0'}
-        secid = secid_map.get(market, '1')
-        market_code = 'sz' if market == 'sz' else 'sh'
+        新浪和腾讯行情接口都支持一次查询多个代码（逗号分隔），按批次合并请求，
+        300只基金每个数据源只需几次请求。优先新浪，新浪缺失的基金再用腾讯补齐。
+        获取到的价格会写入行情缓存，后续 get_fund_price 直接命中。
         
-        prices = []  # 收集多个数据源的价格
+        Args:
+            fund_codes: 基金代码列表
+            
+        Returns:
+            字典，key为基金代码，value为价格信息（获取失败的基金不包含在内）
+        """
+        cache_config = self.data_source_config.get('quote_cache', {})
+        cache_enabled = cache_config.get('enabled', True)
+        price_ttl = cache_config.get('price_ttl', 10)
+        batch_size = self.data_source_config.get('batch_quote_size', 80)
+        
+        results = {}
+        pending = []
+        for fund_code in dict.fromkeys(fund_codes):
+            cached = self.quote_cache.get((fund_code, 'price')) if cache_enabled else None
+            if cached:
+                results[fund_code] = cached
+            else:
+                pending.append(fund_code)
         
-        # 方法1：东方财富股票实时行情API（使用完整字段）
-        if self._is_source_enabled('price_sources', 'eastmoney_stock'):
-            try:
-                url = 'http://push2.eastmoney.com/api/qt/stock/get'
-                params = {
-                    'secid': f'{secid}.{fund_code}',
-                    'fields': 'f57,f58,f107,f137,f46,f44,f45,f47,f48,f60,f170,f43,f49,f50,f51,f52,f53,f54,f55,f56',
-                    'fltt': 2,
-                    'invt': 2
-                }
-                
-                response = self.session.get(url, params=params, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('data'):
-                        price_data = data['data']
-                        # f43是当前价（单位：分），f44是昨收（单位：分）
-                        current_price = price_data.get('f43', 0)
-                        if current_price and current_price > 0:
-                            price = float(current_price) / 100
-                            prev_close = float(price_data.get('f44', current_price)) / 100
-                            change_pct = ((price - prev_close) / prev_close * 100) if prev_close > 0 else 0
-                            
-                            if price > 0:
-                                prices.append({
-                                    'code': fund_code,
-                                    'price': price,
-                                    'change_pct': change_pct / 100,
-                                    'volume': price_data.get('f47', 0),
-                                    'amount': price_data.get('f48', 0),
-                                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                    'source': 'eastmoney_stock'
-                                })
-            except Exception as e:
-                print(f"东方财富股票API获取失败 {fund_code}: {e}")
+        batch_sources = [
+            ('sina', self._get_prices_sina_batch),
+            ('tencent', self._get_prices_tencent_batch),
+        ]
+        for source_name, fetch_batch in batch_sources:
+            if not pending or not self._is_source_enabled('price_sources', source_name):
+                continue
+            for i in range(0, len(pending), batch_size):
+                chunk = pending[i:i + batch_size]
+                for fund_code, price_data in fetch_batch(chunk).items():
+                    if not 0.01 < price_data['price'] < 100:
+                        continue
+                    price_info = {k: v for k, v in price_data.items() if k != 'source'}
+                    results[fund_code] = price_info
+                    if cache_enabled:
+                        self.quote_cache.set((fund_code, 'price'), price_info, price_ttl)
+            pending = [code for code in pending if code not in results]
+        
+        return results
+    
+    def _get_prices_sina_batch(self, fund_codes: List[str]) -> Dict[str, Dict]:
+        """新浪财经批量行情：一次请求多个代码，逐行解析 var hq_str_sz161725="..." """
+        symbols = ','.join(f'{self._guess_market(code)}{code}' for code in fund_codes)
+        try:
+            response = self.session.get(
+                f'http://hq.sinajs.cn/list={symbols}',
+                headers={'Referer': 'http://finance.sina.com.cn', 'User-Agent': 'Mozilla/5.0'},
+                timeout=10
+            )
+            if response.status_code != 200:
+                return {}
+            import re
+            prices = {}
+            for match in re.finditer(r'hq_str_(?:sz|sh)(\d{6})="([^"]*)"', response.text):
+                fund_code, quote = match.group(1), match.group(2)
+                try:
+                    price_data = self._parse_sina_quote(fund_code, quote)
+                except (ValueError, IndexError):
+                    price_data = None
+                if price_data:
+                    prices[fund_code] = price_data
+            return prices
+        except Exception as e:
+            print(f"新浪财经批量行情获取失败（{len(fund_codes)}只基金）: {e}")
+            return {}
+    
+    def _get_prices_tencent_batch(self, fund_codes: List[str]) -> Dict[str, Dict]:
+        """腾讯财经批量行情：一次请求多个代码，逐行解析 v_sz161725="..." """
+        symbols = ','.join(f'{self._guess_market(code)}{code}' for code in fund_codes)
+        try:
+            response = self.session.get(
+                f'http://qt.gtimg.cn/q={symbols}',
+                headers={'Referer': 'http://qq.com', 'User-Agent': 'Mozilla/5.0'},
+                timeout=10
+            )
+            if response.status_code != 200:
+                return {}
+            import re
+            prices = {}
+            for match in re.finditer(r'v_(?:sz|sh)(\d{6})="([^"]*)"', response.text):
+                fund_code, quote = match.group(1), match.group(2)
+                try:
+                    price_data = self._parse_tencent_quote(fund_code, quote)
+                except (ValueError, IndexError):
+                    price_data = None
+                if price_data:
+                    prices[fund_code] = price_data
+            return prices
+        except Exception as e:
+            print(f"腾讯财经批量行情获取失败（{len(fund_codes)}只基金）: {e}")
+            return {}
+    
+    def _fetch_fund_price(self, fund_code: str, market: str = 'auto') -> Optional[Dict]:
+        """
+        从上游获取LOF基金场内实时价格（多数据源并发请求，交叉验证）
         
-        # 方法2：东方财富基金套利API（专门用于套利）
-        if self._is_source_enabled('price_sources', 'eastmoney_arbitrage'):
-            try:
-                url2 = 'https://zqhdplus.eastmoney.com/api/fundArbitrage/getFundArbitrageList'
-                params2 = {
-                    'pageIndex': 1,
-                    'pageSize': 100,
-                    'fundCode': fund_code
-                }
-                response2 = self.session.get(url2, params=params2, timeout=5)
-                if response2.status_code == 200:
-                    data2 = response2.json()
-                    if data2.get('Data') and data2['Data'].get('List'):
-                        for item in data2['Data']['List']:
-                            if item.get('FundCode') == fund_code:
-                                price = float(item.get('MarketPrice', 0))
-                                if price > 0:
-                                    prices.append({
-                                        'code': fund_code,
-                                        'price': price,
-                                        'change_pct': float(item.get('ChangePercent', 0)) / 100,
-                                        'volume': item.get('Volume', 0),
-                                        'amount': item.get('Amount', 0),
-                                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                        'source': 'eastmoney_arbitrage'
-                                    })
-                                break
-            except Exception as e:
-                print(f"东方财富套利API获取失败 {fund_code}: {e}")
+        各数据源同时发起请求，满足法定数量（price_quorum）的数据源价格一致或超过延迟预算后立即返回，
+        未返回的数据源结果直接忽略，单个慢数据源不会拖慢整体。
         
-        # 方法3：新浪财经实时行情（最常用，数据准确）
-        if self._is_source_enabled('price_sources', 'sina'):
-            try:
-                url3 = f'http://hq.sinajs.cn/list={market_code}{fund_code}'
-                headers3 = {
-                    'Referer': 'http://finance.sina.com.cn',
-                    'User-Agent': 'Mozilla/5.0'
-                }
-                response3 = self.session.get(url3, headers=headers3, timeout=5)
-                if response3.status_code == 200:
-                    import re
-                    content = response3.text
-                    # 解析新浪格式：var hq_str_sz161725="招商中证白酒,1.234,1.235,1.236,1.237,1.238,1.239,1.240,1.241,1.242,1.243,2024-01-01,09:30:00,00"
-                    match = re.search(r'="([^"]+)"', content)
-                    if match:
-                        parts = match.group(1).split(',')
-                        if len(parts) >= 3:
-                            price = float(parts[3])  # 当前价（parts[3]是现价，parts[1]是名称）
-                            if price > 0:
-                                prev_close = float(parts[2]) if len(parts) > 2 and parts[2] else price
-                                change_pct = ((price - prev_close) / prev_close) if prev_close > 0 else 0
-                                
-                                prices.append({
-                                    'code': fund_code,
-                                    'price': price,
-                                    'change_pct': change_pct,
-                                    'volume': float(parts[8]) if len(parts) > 8 and parts[8] else 0,
-                                    'amount': float(parts[9]) if len(parts) > 9 and parts[9] else 0,
-                                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                    'source': 'sina'
-                                })
-            except Exception as e:
-                print(f"新浪财经API获取失败 {fund_code}: {e}")
+        Args:
+            fund_code: 基金代码（6位数字）
+            market: 市场代码，'sz'=深圳(1), 'sh'=上海(0), 'auto'=自动判断
+            
+        Returns:
+            包含价格信息的字典，如果失败返回None
+        """
+        if market == 'auto':
+            market = self._guess_market(fund_code)
         
-        # 方法4：腾讯财经实时行情
-        if self._is_source_enabled('price_sources', 'tencent'):
-            try:
-                url4 = f'http://qt.gtimg.cn/q={market_code}{fund_code}'
-                headers4 = {
-                    'Referer': 'http://qq.com',
-                    'User-Agent': 'Mozilla/5.0'
-                }
-                response4 = self.session.get(url4, headers=headers4, timeout=5)
-                if response4.status_code == 200:
-                    import re
-                    content = response4.text
-                    # 解析腾讯格式：v_sz161725="1~招商中证白酒~161725~1.234~1.235~..."
-                    match = re.search(r'="([^"]+)"', content)
-                    if match:
-                        parts = match.group(1).split('~')
-                        if len(parts) >= 5:
-                            price = float(parts[3])  # 当前价
-                            if price > 0:
-                                prev_close = float(parts[4]) if len(parts) > 4 and parts[4] else price
-                                change_pct = ((price - prev_close) / prev_close) if prev_close > 0 else 0
-                                
-                                prices.append({
-                                    'code': fund_code,
-                                    'price': price,
-                                    'change_pct': change_pct,
-                                    'volume': float(parts[6]) if len(parts) > 6 and parts[6] else 0,
-                                    'amount': float(parts[7]) if len(parts) > 7 and parts[7] else 0,
-                                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                    'source': 'tencent'
-                                })
-            except Exception as e:
-                print(f"腾讯财经API获取失败 {fund_code}: {e}")
+        secid_map = {'sz': '1', 'sh': '0'}
+        secid = secid_map.get(market, '1')
+        market_code = 'sz' if market == 'sz' else 'sh'
         
-        # 方法5：网易财经实时行情
-        if self._is_source_enabled('price_sources', 'netease'):
-            try:
-                url5 = f'http://api.money.126.net/data/feed/{market_code}{fund_code}'
-                response5 = self.session.get(url5, timeout=5)
-                if response5.status_code == 200:
-                    import re
-                    content = response5.text
-                    # 解析网易格式：_ntes_quote_callback({"161725":{"name":"...","price":1.234,...}});
-                    match = re.search(r'"price":([\d.]+)', content)
-                    if match:
-                        price = float(match.group(1))
-                        if price > 0:
-                            prices.append({
-                                'code': fund_code,
-                                'price': price,
-                                'change_pct': 0,  # 网易可能不提供涨跌幅
-                                'volume': 0,
-                                'amount': 0,
-                                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'source': 'netease'
-                            })
-            except Exception as e:
-                print(f"网易财经API获取失败 {fund_code}: {e}")
+        source_fetchers = [
+            ('eastmoney_stock', lambda: self._get_price_eastmoney_stock(fund_code, secid)),
+            ('eastmoney_arbitrage', lambda: self._get_price_eastmoney_arbitrage(fund_code)),
+            ('sina', lambda: self._get_price_sina(fund_code, market_code)),
+            ('tencent', lambda: self._get_price_tencent(fund_code, market_code)),
+            ('netease', lambda: self._get_price_netease(fund_code, market_code)),
+        ]
+        source_fetchers = [(name, fetch) for name, fetch in source_fetchers
+                           if self._is_source_enabled('price_sources', name)]
+        
+        # 收集多个数据源的价格
+        prices = self._collect_prices_with_quorum(source_fetchers)
         
         # 数据验证和选择：多数据源交叉验证
         if prices:
@@ -947,9 +949,295 @@ class LOFDataFetcher:
         
         return None
     
+    def _collect_prices_with_quorum(self, source_fetchers: List[tuple]) -> List[Dict]:
+        """
+        并发请求多个价格数据源，按法定数量策略提前返回
+        
+        返回条件（满足任一即返回）：
+        1. 已有 min_agree 个数据源的价格在 tolerance 相对误差内一致
+        2. 超过 latency_budget 秒且至少已有一个有效价格
+        3. 所有数据源都已返回
+        
+        Args:
+            source_fetchers: [(数据源名称, 获取函数), ...]
+            
+        Returns:
+            已返回的有效价格列表（迟到的结果被忽略）
+        """
+        quorum_config = self.data_source_config.get('price_quorum', {})
+        min_agree = quorum_config.get('min_agree', 2)
+        tolerance = quorum_config.get('tolerance', 0.002)
+        latency_budget = quorum_config.get('latency_budget', 2.0)
+        
+        pending = {self._price_source_executor.submit(fetch) for _, fetch in source_fetchers}
+        deadline = time.time() + latency_budget
+        prices = []
+        
+        while pending:
+            timeout = None  # 还没有任何价格时一直等待（各请求自身有超时）
+            if prices:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break  # 超过延迟预算
+            
+            for future in done:
+                try:
+                    price_data = future.result()
+                except Exception:
+                    price_data = None
+                if price_data and 0.01 < price_data['price'] < 100:
+                    prices.append(price_data)
+            
+            if min_agree and self._prices_reach_quorum(prices, min_agree, tolerance):
+                break
+        
+        # 尚未开始的请求直接取消，已在进行中的请求结果忽略
+        for future in pending:
+            future.cancel()
+        
+        return prices
+    
+    @staticmethod
+    def _prices_reach_quorum(prices: List[Dict], min_agree: int, tolerance: float) -> bool:
+        """判断是否已有 min_agree 个数据源的价格在相对误差 tolerance 内一致"""
+        if len(prices) < min_agree:
+            return False
+        values = sorted(p['price'] for p in prices)
+        for i in range(len(values) - min_agree + 1):
+            if values[i + min_agree - 1] - values[i] <= values[i] * tolerance:
+                return True
+        return False
+    
+    def _get_price_eastmoney_stock(self, fund_code: str, secid: str) -> Optional[Dict]:
+        """方法1：东方财富股票实时行情API（使用完整字段）"""
+        try:
+            url = 'http://push2.eastmoney.com/api/qt/stock/get'
+            params = {
+                'secid': f'{secid}.{fund_code}',
+                'fields': 'f57,f58,f107,f137,f46,f44,f45,f47,f48,f60,f170,f43,f49,f50,f51,f52,f53,f54,f55,f56',
+                'fltt': 2,
+                'invt': 2
+            }
+            
+            response = self.session.get(url, params=params, timeout=5)
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('data'):
+                    price_data = data['data']
+                    # f43是当前价（单位：分），f44是昨收（单位：分）
+                    current_price = price_data.get('f43', 0)
+                    if current_price and current_price > 0:
+                        price = float(current_price) / 100
+                        prev_close = float(price_data.get('f44', current_price)) / 100
+                        change_pct = ((price - prev_close) / prev_close * 100) if prev_close > 0 else 0
+                        
+                        if price > 0:
+                            return {
+                                'code': fund_code,
+                                'price': price,
+                                'change_pct': change_pct / 100,
+                                'volume': price_data.get('f47', 0),
+                                'amount': price_data.get('f48', 0),
+                                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                'source': 'eastmoney_stock'
+                            }
+        except Exception as e:
+            print(f"东方财富股票API获取失败 {fund_code}: {e}")
+        return None
+    
+    def _get_price_eastmoney_arbitrage(self, fund_code: str) -> Optional[Dict]:
+        """方法2：东方财富基金套利API（专门用于套利）"""
+        try:
+            url2 = 'https://zqhdplus.eastmoney.com/api/fundArbitrage/getFundArbitrageList'
+            params2 = {
+                'pageIndex': 1,
+                'pageSize': 100,
+                'fundCode': fund_code
+            }
+            response2 = self.session.get(url2, params=params2, timeout=5)
+            if response2.status_code == 200:
+                data2 = response2.json()
+                if data2.get('Data') and data2['Data'].get('List'):
+                    for item in data2['Data']['List']:
+                        if item.get('FundCode') == fund_code:
+                            price = float(item.get('MarketPrice', 0))
+                            if price > 0:
+                                return {
+                                    'code': fund_code,
+                                    'price': price,
+                                    'change_pct': float(item.get('ChangePercent', 0)) / 100,
+                                    'volume': item.get('Volume', 0),
+                                    'amount': item.get('Amount', 0),
+                                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                    'source': 'eastmoney_arbitrage'
+                                }
+                            break
+        except Exception as e:
+            print(f"东方财富套利API获取失败 {fund_code}: {e}")
+        return None
+    
+    def _get_price_sina(self, fund_code: str, market_code: str) -> Optional[Dict]:
+        """方法3：新浪财经实时行情（最常用，数据准确）"""
+        try:
+            url3 = f'http://hq.sinajs.cn/list={market_code}{fund_code}'
+            headers3 = {
+                'Referer': 'http://finance.sina.com.cn',
+                'User-Agent': 'Mozilla/5.0'
+            }
+            response3 = self.session.get(url3, headers=headers3, timeout=5)
+            if response3.status_code == 200:
+                import re
+                content = response3.text
+                # 解析新浪格式：var hq_str_sz161725="招商中证白酒,1.234,1.235,1.236,1.237,1.238,1.239,1.240,1.241,1.242,1.243,2024-01-01,09:30:00,00"
+                match = re.search(r'="([^"]+)"', content)
+                if match:
+                    return self._parse_sina_quote(fund_code, match.group(1))
+        except Exception as e:
+            print(f"新浪财经API获取失败 {fund_code}: {e}")
+        return None
+    
+    @staticmethod
+    def _parse_sina_quote(fund_code: str, quote: str) -> Optional[Dict]:
+        """解析新浪行情字段串（引号内部分），无有效价格返回None"""
+        parts = quote.split(',')
+        if len(parts) < 4:
+            return None
+        price = float(parts[3])  # 当前价（parts[3]是现价，parts[0]是名称）
+        if price <= 0:
+            return None
+        prev_close = float(parts[2]) if parts[2] else price
+        change_pct = ((price - prev_close) / prev_close) if prev_close > 0 else 0
+        
+        return {
+            'code': fund_code,
+            'price': price,
+            'change_pct': change_pct,
+            'volume': float(parts[8]) if len(parts) > 8 and parts[8] else 0,
+            'amount': float(parts[9]) if len(parts) > 9 and parts[9] else 0,
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'source': 'sina'
+        }
+    
+    def _get_price_tencent(self, fund_code: str, market_code: str) -> Optional[Dict]:
+        """方法4：腾讯财经实时行情"""
+        try:
+            url4 = f'http://qt.gtimg.cn/q={market_code}{fund_code}'
+            headers4 = {
+                'Referer': 'http://qq.com',
+                'User-Agent': 'Mozilla/5.0'
+            }
+            response4 = self.session.get(url4, headers=headers4, timeout=5)
+            if response4.status_code == 200:
+                import re
+                content = response4.text
+                # 解析腾讯格式：v_sz161725="1~招商中证白酒~161725~1.234~1.235~..."
+                match = re.search(r'="([^"]+)"', content)
+                if match:
+                    return self._parse_tencent_quote(fund_code, match.group(1))
+        except Exception as e:
+            print(f"腾讯财经API获取失败 {fund_code}: {e}")
+        return None
+    
+    @staticmethod
+    def _parse_tencent_quote(fund_code: str, quote: str) -> Optional[Dict]:
+        """解析腾讯行情字段串（引号内部分），无有效价格返回None"""
+        parts = quote.split('~')
+        if len(parts) < 5:
+            return None
+        price = float(parts[3])  # 当前价
+        if price <= 0:
+            return None
+        prev_close = float(parts[4]) if parts[4] else price
+        change_pct = ((price - prev_close) / prev_close) if prev_close > 0 else 0
+        
+        return {
+            'code': fund_code,
+            'price': price,
+            'change_pct': change_pct,
+            'volume': float(parts[6]) if len(parts) > 6 and parts[6] else 0,
+            'amount': float(parts[7]) if len(parts) > 7 and parts[7] else 0,
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'source': 'tencent'
+        }
+    
+    def _get_price_netease(self, fund_code: str, market_code: str) -> Optional[Dict]:
+        """方法5：网易财经实时行情"""
+        try:
+            url5 = f'http://api.money.126.net/data/feed/{market_code}{fund_code}'
+            response5 = self.session.get(url5, timeout=5)
+            if response5.status_code == 200:
+                import re
+                content = response5.text
+                # 解析网易格式：_ntes_quote_callback({"161725":{"name":"...","price":1.234,...}});
+                match = re.search(r'"price":([\d.]+)', content)
+                if match:
+                    price = float(match.group(1))
+                    if price > 0:
+                        return {
+                            'code': fund_code,
+                            'price': price,
+                            'change_pct': 0,  # 网易可能不提供涨跌幅
+                            'volume': 0,
+                            'amount': 0,
+                            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                            'source': 'netease'
+                        }
+        except Exception as e:
+            print(f"网易财经API获取失败 {fund_code}: {e}")
+        return None
+    
     def get_fund_nav(self, fund_code: str) -> Optional[Dict]:
         """
-        获取LOF基金场外净值（多数据源）
+        获取LOF基金场外净值（优先使用进程内行情缓存）
+        
+        Args:
+            fund_code: 基金代码（6位数字）
+            
+        Returns:
+            包含净值信息的字典，如果失败返回None
+        """
+        cache_config = self.data_source_config.get('quote_cache', {})
+        if not cache_config.get('enabled', True):
+            return self._load_fund_nav(fund_code)
+        
+        # 净值每天只在净值日期（FSRQ）之后更新一次，缓存时间可以较长
+        return self.quote_cache.get_or_fetch(
+            (fund_code, 'nav'),
+            cache_config.get('nav_ttl', 4 * 3600),
+            lambda: self._load_fund_nav(fund_code)
+        )
+    
+    def _load_fund_nav(self, fund_code: str) -> Optional[Dict]:
+        """
+        获取净值：先查本地净值存储，只有预期公布日期的净值尚未入库时才请求上游
+        
+        Args:
+            fund_code: 基金代码（6位数字）
+            
+        Returns:
+            包含净值信息的字典，上游获取失败时返回已存的旧净值，都没有返回None
+        """
+        if self.nav_store is None:
+            return self._fetch_fund_nav(fund_code)
+        
+        stored = self.nav_store.get_latest(fund_code)
+        if not self.nav_store.needs_refresh(fund_code, stored):
+            return stored
+        
+        nav_info = self._fetch_fund_nav(fund_code)
+        if nav_info:
+            self.nav_store.save(nav_info)
+            return nav_info
+        
+        self.nav_store.mark_checked(fund_code)
+        return stored
+    
+    def _fetch_fund_nav(self, fund_code: str) -> Optional[Dict]:
+        """
+        从上游获取LOF基金场外净值（多数据源）
         
         Args:
             fund_code: 基金代码（6位数字）
@@ -974,22 +1262,9 @@ class LOFDataFetcher:
                 }
                 response = self.session.get(url, params=params, timeout=5)
                 if response.status_code == 200:
-                    import re
-                    content = response.text
-                    json_match = re.search(r'jQuery\((.+)\)', content)
-                    if json_match:
-                        data = json.loads(json_match.group(1))
-                        if data.get('Data') and data['Data'].get('LSJZList'):
-                            lsjz = data['Data']['LSJZList'][0]
-                            nav = float(lsjz.get('DWJZ', 0))
-                            if nav > 0:
-                                navs.append({
-                                    'code': fund_code,
-                                    'nav': nav,
-                                    'date': lsjz.get('FSRQ', ''),
-                                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                    'source': 'eastmoney_api'
-                                })
+                    nav_data = self._parse_lsjz_nav(fund_code, response.text)
+                    if nav_data:
+                        navs.append(nav_data)
             except Exception as e:
                 print(f"东方财富净值API获取失败 {fund_code}: {e}")
         
@@ -1051,21 +1326,9 @@ class LOFDataFetcher:
                 url4 = f'http://fundgz.1234567.com.cn/js/{fund_code}.js'
                 response4 = self.session.get(url4, timeout=5)
                 if response4.status_code == 200:
-                    import re
-                    content = response4.text
-                    # 提取净值
-                    nav_match = re.search(r'"dwjz":"([\d.]+)"', content)
-                    date_match = re.search(r'"jzrq":"(\d{4}-\d{2}-\d{2})"', content)
-                    if nav_match and date_match:
-                        nav = float(nav_match.group(1))
-                        if nav > 0:
-                            navs.append({
-                                'code': fund_code,
-                                'nav': nav,
-                                'date': date_match.group(1),
-                                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'source': '1234567'
-                            })
+                    nav_data = self._parse_fundgz_nav(fund_code, response4.text)
+                    if nav_data:
+                        navs.append(nav_data)
             except Exception as e:
                 print(f"天天基金API获取失败 {fund_code}: {e}")
         
@@ -1077,91 +1340,84 @@ class LOFDataFetcher:
         
         return None
     
-    def get_fund_info(self, fund_code: str) -> Optional[Dict]:
+    @staticmethod
+    def _parse_lsjz_nav(fund_code: str, content: str) -> Optional[Dict]:
+        """解析东方财富历史净值API（jQuery回调格式）的最新一条净值"""
+        import re
+        json_match = re.search(r'jQuery\((.+)\)', content)
+        if json_match:
+            data = json.loads(json_match.group(1))
+            if data.get('Data') and data['Data'].get('LSJZList'):
+                lsjz = data['Data']['LSJZList'][0]
+                nav = float(lsjz.get('DWJZ', 0) or 0)
+                if nav > 0:
+                    return {
+                        'code': fund_code,
+                        'nav': nav,
+                        'date': lsjz.get('FSRQ', ''),
+                        'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        'source': 'eastmoney_api'
+                    }
+        return None
+    
+    @staticmethod
+    def _parse_fundgz_nav(fund_code: str, content: str) -> Optional[Dict]:
+        """解析天天基金估值接口（jsonpgz格式）中的单位净值"""
+        import re
+        nav_match = re.search(r'"dwjz":"([\d.]+)"', content)
+        date_match = re.search(r'"jzrq":"(\d{4}-\d{2}-\d{2})"', content)
+        if nav_match and date_match:
+            nav = float(nav_match.group(1))
+            if nav > 0:
+                return {
+                    'code': fund_code,
+                    'nav': nav,
+                    'date': date_match.group(1),
+                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'source': '1234567'
+                }
+        return None
+    
+    def get_fund_info(self, fund_code: str, snapshot: Optional[Dict[str, Dict]] = None,
+                      quotes: Optional[Dict[str, Optional[Dict]]] = None) -> Optional[Dict]:
         """
         获取基金完整信息（价格+净值），优先使用套利API，带数据验证
         
         Args:
             fund_code: 基金代码
+            snapshot: 全市场套利快照（get_market_snapshot的返回值）。传入时直接从快照取数，
+                      快照中缺失的基金跳过套利API，直接回退到分别获取价格和净值
+            quotes: 已预先获取的价格和净值 {'price': ..., 'nav': ...}（如异步抓取引擎），
+                    传入时回退方案直接使用，不再发起请求
             
         Returns:
             包含价格和净值的完整信息
         """
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'data_fetcher.py:get_fund_info:entry',
-            'message': '开始获取基金信息',
-            'data': {'fund_code': fund_code},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
-        
-        # 优先使用套利API（最准确）
-        arbitrage_data = self.get_fund_arbitrage_data(fund_code)
-        
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'data_fetcher.py:get_fund_info:after_arbitrage_api',
-            'message': '套利API结果',
-            'data': {'fund_code': fund_code, 'has_arbitrage_data': arbitrage_data is not None, 'price': arbitrage_data.get('price', 0) if arbitrage_data else 0, 'nav': arbitrage_data.get('nav', 0) if arbitrage_data else 0},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('data_fetcher.py:get_fund_info:entry', '开始获取基金信息', {'fund_code': fund_code})
+        
+        # 优先使用套利API（最准确）；有快照时直接查快照，不再逐个请求
+        if snapshot is not None:
+            arbitrage_data = snapshot.get(fund_code)
+        else:
+            arbitrage_data = self.get_fund_arbitrage_data(fund_code)
+        
+        price_info = None
+        nav_info = None
+        fallback_fetched = False
+        
+        trace('data_fetcher.py:get_fund_info:after_arbitrage_api', '套利API结果', {'fund_code': fund_code, 'has_arbitrage_data': arbitrage_data is not None, 'price': arbitrage_data.get('price', 0) if arbitrage_data else 0, 'nav': arbitrage_data.get('nav', 0) if arbitrage_data else 0})
         
         # 如果套利API返回None，说明基金可能已清盘/退市（套利API只包含正常交易的基金）
         if arbitrage_data is None:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'LIQUIDATED',
-                'location': 'data_fetcher.py:get_fund_info:arbitrage_api_none',
-                'message': '套利API返回None，基金可能已清盘',
-                'data': {'fund_code': fund_code},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('data_fetcher.py:get_fund_info:arbitrage_api_none', '套利API返回None，基金可能已清盘', {'fund_code': fund_code})
             
             # 尝试获取价格和净值，用于进一步验证
-            price_info = self.get_fund_price(fund_code)
-            nav_info = self.get_fund_nav(fund_code)
+            price_info, nav_info = self._get_fallback_quotes(fund_code, quotes)
+            fallback_fetched = True
             
             # 如果既没有价格也没有净值，判定为已清盘
             if not price_info and not nav_info:
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'LIQUIDATED',
-                    'location': 'data_fetcher.py:get_fund_info:no_price_no_nav',
-                    'message': '无价格和净值数据，判定为已清盘',
-                    'data': {'fund_code': fund_code},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:get_fund_info:no_price_no_nav', '无价格和净值数据，判定为已清盘', {'fund_code': fund_code})
                 return None
             
             # 如果同时有价格和净值，检查价差是否异常（超过50%），如果异常则判定为已清盘
@@ -1174,21 +1430,7 @@ class LOFDataFetcher:
                     diff_pct = abs(price - nav) / nav
                     # 如果价差超过50%，且套利API返回None，判定为已清盘
                     if diff_pct > 0.5:
-                        # #region agent log
-                        log_data = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'LIQUIDATED',
-                            'location': 'data_fetcher.py:get_fund_info:arbitrage_none_large_diff',
-                            'message': '套利API返回None且价差异常，判定为已清盘',
-                            'data': {'fund_code': fund_code, 'diff_pct': diff_pct*100, 'price': price, 'nav': nav, 'nav_date': nav_date_str},
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        try:
-                            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                        except: pass
-                        # #endregion
+                        trace('data_fetcher.py:get_fund_info:arbitrage_none_large_diff', '套利API返回None且价差异常，判定为已清盘', {'fund_code': fund_code, 'diff_pct': diff_pct*100, 'price': price, 'nav': nav, 'nav_date': nav_date_str})
                         return None
             
             # 如果有净值但没有价格，且净值日期过旧（超过30天）或未来日期，判定为已清盘
@@ -1200,21 +1442,7 @@ class LOFDataFetcher:
                         days_old = (datetime.now() - nav_date).days
                         # 如果净值日期过旧（超过30天）或者是未来日期（数据异常），判定为已清盘
                         if days_old > 30 or days_old < 0:
-                            # #region agent log
-                            log_data = {
-                                'sessionId': 'debug-session',
-                                'runId': 'run1',
-                                'hypothesisId': 'LIQUIDATED',
-                                'location': 'data_fetcher.py:get_fund_info:nav_too_old',
-                                'message': '净值日期异常且无价格数据，判定为已清盘',
-                                'data': {'fund_code': fund_code, 'nav_date': nav_date_str, 'days_old': days_old},
-                                'timestamp': int(time.time() * 1000)
-                            }
-                            try:
-                                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                            except: pass
-                            # #endregion
+                            trace('data_fetcher.py:get_fund_info:nav_too_old', '净值日期异常且无价格数据，判定为已清盘', {'fund_code': fund_code, 'nav_date': nav_date_str, 'days_old': days_old})
                             return None
                     except:
                         pass
@@ -1242,31 +1470,16 @@ class LOFDataFetcher:
                     'update_time': arbitrage_data.get('update_time', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
                 }
                 
-                # 暂时跳过限购信息获取，避免阻塞批量请求（限购信息可以在后续异步获取）
-                # 限购信息获取较慢，会在批量请求时导致超时
-                result['purchase_limit'] = {'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购'}
+                # 限购信息直接查申购信息索引，不逐个请求
+                result['purchase_limit'] = self._get_indexed_purchase_limit(fund_code)
                 
                 return result
         
-        # 备用方案：分别获取价格和净值
-        price_info = self.get_fund_price(fund_code)
-        nav_info = self.get_fund_nav(fund_code)
+        # 备用方案：分别获取价格和净值（上面已获取过则直接复用）
+        if not fallback_fetched:
+            price_info, nav_info = self._get_fallback_quotes(fund_code, quotes)
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'data_fetcher.py:get_fund_info:after_fallback',
-            'message': '备用方案结果',
-            'data': {'fund_code': fund_code, 'has_price_info': price_info is not None, 'has_nav_info': nav_info is not None, 'price': price_info.get('price', 0) if price_info else 0, 'nav': nav_info.get('nav', 0) if nav_info else 0},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('data_fetcher.py:get_fund_info:after_fallback', '备用方案结果', {'fund_code': fund_code, 'has_price_info': price_info is not None, 'has_nav_info': nav_info is not None, 'price': price_info.get('price', 0) if price_info else 0, 'nav': nav_info.get('nav', 0) if nav_info else 0})
         
         if price_info and nav_info:
             # 数据合理性验证
@@ -1283,21 +1496,7 @@ class LOFDataFetcher:
                     # 如果净值日期过旧（超过30天）或者是未来日期（数据异常），标记为已清盘
                     if days_old > 30 or days_old < 0:
                         nav_date_too_old = True
-                        # #region agent log
-                        log_data = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'LIQUIDATED',
-                            'location': 'data_fetcher.py:get_fund_info:nav_date_old',
-                            'message': '净值日期异常',
-                            'data': {'fund_code': fund_code, 'nav_date': nav_date_str, 'days_old': days_old},
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        try:
-                            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                        except: pass
-                        # #endregion
+                        trace('data_fetcher.py:get_fund_info:nav_date_old', '净值日期异常', {'fund_code': fund_code, 'nav_date': nav_date_str, 'days_old': days_old})
                 except:
                     pass
             
@@ -1307,21 +1506,7 @@ class LOFDataFetcher:
                 
                 # 如果价差超过50%且净值日期过旧，判定为已清盘
                 if diff_pct > 0.5 and nav_date_too_old:
-                    # #region agent log
-                    log_data = {
-                        'sessionId': 'debug-session',
-                        'runId': 'run1',
-                        'hypothesisId': 'LIQUIDATED',
-                        'location': 'data_fetcher.py:get_fund_info:large_diff_old_nav',
-                        'message': '价差异常且净值日期过旧，判定为已清盘',
-                        'data': {'fund_code': fund_code, 'diff_pct': diff_pct*100, 'nav_date': nav_date_str},
-                        'timestamp': int(time.time() * 1000)
-                    }
-                    try:
-                        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                    except: pass
-                    # #endregion
+                    trace('data_fetcher.py:get_fund_info:large_diff_old_nav', '价差异常且净值日期过旧，判定为已清盘', {'fund_code': fund_code, 'diff_pct': diff_pct*100, 'nav_date': nav_date_str})
                     return None
                 
                 if diff_pct > 0.5:  # 价差超过50%可能数据有误
@@ -1334,8 +1519,8 @@ class LOFDataFetcher:
                         'data_warning': True,
                         'price_diff_pct': diff_pct * 100
                     }
-                    # 暂时跳过限购信息获取，避免阻塞批量请求（限购信息可以在后续异步获取）
-                    result['purchase_limit'] = {'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购'}
+                    # 限购信息直接查申购信息索引，不逐个请求
+                    result['purchase_limit'] = self._get_indexed_purchase_limit(fund_code)
                     return result
             
             result = {
@@ -1343,8 +1528,8 @@ class LOFDataFetcher:
                 'nav': nav_info['nav'],
                 'nav_date': nav_info['date']
             }
-            # 暂时跳过限购信息获取，避免阻塞批量请求（限购信息可以在后续异步获取）
-            result['purchase_limit'] = {'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购'}
+            # 限购信息直接查申购信息索引，不逐个请求
+            result['purchase_limit'] = self._get_indexed_purchase_limit(fund_code)
             return result
         
         # 如果只有价格或只有净值，检查是否可能是已清盘基金
@@ -1353,21 +1538,7 @@ class LOFDataFetcher:
             # 检查价格数据是否可信（如果价格数据源数量少，可能不可信）
             price_confidence = price_info.get('price_confidence', 'unknown')
             if price_confidence == 'low':
-                # #region agent log
-                log_data = {
-                    'sessionId': 'debug-session',
-                    'runId': 'run1',
-                    'hypothesisId': 'LIQUIDATED',
-                    'location': 'data_fetcher.py:get_fund_info:price_only_low_confidence',
-                    'message': '只有价格数据且置信度低，可能已清盘',
-                    'data': {'fund_code': fund_code, 'price': price_info.get('price', 0)},
-                    'timestamp': int(time.time() * 1000)
-                }
-                try:
-                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                except: pass
-                # #endregion
+                trace('data_fetcher.py:get_fund_info:price_only_low_confidence', '只有价格数据且置信度低，可能已清盘', {'fund_code': fund_code, 'price': price_info.get('price', 0)})
                 return None
         
         if nav_info and not price_info:
@@ -1379,47 +1550,101 @@ class LOFDataFetcher:
                     days_old = (datetime.now() - nav_date).days
                     # 如果净值日期过旧（超过30天）或者是未来日期（数据异常），判定为已清盘
                     if days_old > 30 or days_old < 0:
-                        # #region agent log
-                        log_data = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'LIQUIDATED',
-                            'location': 'data_fetcher.py:get_fund_info:nav_only_old',
-                            'message': '只有净值数据且日期异常，判定为已清盘',
-                            'data': {'fund_code': fund_code, 'nav_date': nav_date_str, 'days_old': days_old},
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        try:
-                            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                        except: pass
-                        # #endregion
+                        trace('data_fetcher.py:get_fund_info:nav_only_old', '只有净值数据且日期异常，判定为已清盘', {'fund_code': fund_code, 'nav_date': nav_date_str, 'days_old': days_old})
                         return None
                 except:
                     pass
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'data_fetcher.py:get_fund_info:returning_none',
-            'message': 'get_fund_info返回None',
-            'data': {'fund_code': fund_code, 'price_info_exists': price_info is not None, 'nav_info_exists': nav_info is not None},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('data_fetcher.py:get_fund_info:returning_none', 'get_fund_info返回None', {'fund_code': fund_code, 'price_info_exists': price_info is not None, 'nav_info_exists': nav_info is not None})
         
         return None
     
+    def _get_indexed_purchase_limit(self, fund_code: str) -> Dict:
+        """从申购信息索引查限购信息，索引不可用时返回不限购（limit_as_of为None）"""
+        limits = self.get_fund_purchase_limits([fund_code], fallback=False)
+        return limits.get(fund_code) or {
+            'is_limited': False, 'limit_amount': None, 'limit_desc': '不限购', 'limit_as_of': None
+        }
+    
+    def _get_fallback_quotes(self, fund_code: str, quotes: Optional[Dict[str, Optional[Dict]]]) -> tuple:
+        """返回 (价格信息, 净值信息)，优先使用预先获取的数据"""
+        if quotes is not None:
+            return quotes.get('price'), quotes.get('nav')
+        return self.get_fund_price(fund_code), self.get_fund_nav(fund_code)
+    
+    def _parse_arbitrage_item(self, item: Dict) -> Optional[Dict]:
+        """
+        解析套利API返回的单条基金数据
+        
+        Args:
+            item: 套利API列表中的一条记录
+            
+        Returns:
+            套利数据字典，价格或净值无效时返回None
+        """
+        fund_code = item.get('FundCode', '')
+        if not fund_code:
+            return None
+        
+        market_price = float(item.get('MarketPrice', 0) or 0)
+        net_value = float(item.get('NetValue', 0) or 0)
+        if market_price <= 0 or net_value <= 0:
+            return None
+        
+        return {
+            'code': fund_code,
+            'price': market_price,
+            'nav': net_value,
+            'premium_rate': float(item.get('PremiumRate', 0) or 0),  # 溢价率
+            'change_pct': float(item.get('ChangePercent', 0) or 0) / 100,
+            'volume': item.get('Volume', 0),
+            'amount': item.get('Amount', 0),
+            'nav_date': item.get('NetValueDate', ''),
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'source': 'arbitrage_api'
+        }
+    
+    def _iter_arbitrage_list(self, page_size: int = 500, max_pages: int = 20):
+        """
+        分页遍历东方财富套利API的全量基金列表（不传fundCode）
+        
+        Args:
+            page_size: 每页条数
+            max_pages: 最多请求的页数（防止接口异常时无限翻页）
+            
+        Yields:
+            套利API列表中的原始记录
+        
+        Raises:
+            RuntimeError: 某一页请求失败，或翻到 max_pages 仍未取完（调用方不应把已取到的部分当作全量）
+        """
+        url = 'https://zqhdplus.eastmoney.com/api/fundArbitrage/getFundArbitrageList'
+        fetched = 0
+        for page_index in range(1, max_pages + 1):
+            params = {
+                'pageIndex': page_index,
+                'pageSize': page_size,
+            }
+            response = self.session.get(url, params=params, timeout=10)
+            if response.status_code != 200:
+                raise RuntimeError(f"套利API第 {page_index} 页返回状态码 {response.status_code}")
+            
+            data = response.json().get('Data') or {}
+            items = data.get('List') or []
+            for item in items:
+                yield item
+            
+            fetched += len(items)
+            total_count = data.get('TotalCount') or data.get('Total')
+            # 最后一页：返回条数不足一页，或已达到接口声明的总数
+            if len(items) < page_size or (total_count and fetched >= int(total_count)):
+                return
+        raise RuntimeError(f"套利API翻到第 {max_pages} 页仍未取完（已取 {fetched} 条）")
+    
     def get_all_funds_arbitrage_data(self, fund_codes: List[str] = None) -> Dict[str, Dict]:
         """
         批量获取所有LOF基金的套利数据（价格+净值+溢价率）
-        一次性获取所有基金数据，避免逐个请求
+        一次性获取所有基金数据（自动分页），避免逐个请求
         
         Args:
             fund_codes: 基金代码列表，如果为None则获取所有基金
@@ -1429,65 +1654,73 @@ class LOFDataFetcher:
         """
         result = {}
         try:
-            url = 'https://zqhdplus.eastmoney.com/api/fundArbitrage/getFundArbitrageList'
-            # 尝试不传fundCode，获取所有基金数据
-            params = {
-                'pageIndex': 1,
-                'pageSize': 500,  # 增大pageSize，尝试获取更多数据
-            }
+            fund_set = set(fund_codes) if fund_codes else None
             
-            # 如果指定了基金代码，只请求一次，然后过滤
-            # 否则请求所有数据
-            response = self.session.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('Data') and data['Data'].get('List'):
-                    fund_set = set(fund_codes) if fund_codes else None
-                    
-                    for item in data['Data']['List']:
-                        fund_code = item.get('FundCode', '')
-                        if not fund_code:
-                            continue
-                            
-                        # 如果指定了基金代码列表，只处理列表中的基金
-                        if fund_set and fund_code not in fund_set:
+            for item in self._iter_arbitrage_list():
+                fund_code = item.get('FundCode', '')
+                # 如果指定了基金代码列表，只处理列表中的基金
+                if fund_set and fund_code not in fund_set:
+                    continue
+                
+                fund_data = self._parse_arbitrage_item(item)
+                if not fund_data:
+                    continue
+                
+                # 检查净值日期是否过旧（超过30天没有更新，可能已清盘）或未来日期（数据异常）
+                nav_date_str = fund_data['nav_date']
+                if nav_date_str:
+                    try:
+                        nav_date = datetime.strptime(nav_date_str, '%Y-%m-%d')
+                        days_old = (datetime.now() - nav_date).days
+                        if days_old > 30 or days_old < 0:
                             continue
-                            
-                        market_price = float(item.get('MarketPrice', 0))
-                        net_value = float(item.get('NetValue', 0))
-                        nav_date_str = item.get('NetValueDate', '')
-                        
-                        # 检查净值日期是否过旧（超过30天没有更新，可能已清盘）或未来日期（数据异常）
-                        nav_date_too_old = False
-                        if nav_date_str:
-                            try:
-                                nav_date = datetime.strptime(nav_date_str, '%Y-%m-%d')
-                                days_old = (datetime.now() - nav_date).days
-                                # 如果净值日期过旧（超过30天）或者是未来日期（数据异常），标记为已清盘
-                                if days_old > 30 or days_old < 0:
-                                    nav_date_too_old = True
-                            except:
-                                pass
-                        
-                        # 只处理价格和净值都有效，且净值日期不过旧的基金
-                        if market_price > 0 and net_value > 0 and not nav_date_too_old:
-                            result[fund_code] = {
-                                'code': fund_code,
-                                'price': market_price,
-                                'nav': net_value,
-                                'premium_rate': float(item.get('PremiumRate', 0)),
-                                'change_pct': float(item.get('ChangePercent', 0)) / 100,
-                                'volume': item.get('Volume', 0),
-                                'amount': item.get('Amount', 0),
-                                'nav_date': nav_date_str,
-                                'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'source': 'arbitrage_api'
-                            }
+                    except:
+                        pass
+                
+                result[fund_code] = fund_data
         except Exception as e:
             print(f"批量套利API获取失败: {e}")
         
         return result
     
+    def get_market_snapshot(self, force_refresh: bool = False) -> Dict[str, Dict]:
+        """
+        获取全市场套利数据快照（一次分页批量拉取，带短期缓存）
+        
+        同一刷新周期内的多个批量请求（前端按50只分批）共用一份快照，
+        只有快照中缺失的基金才需要逐个请求价格和净值。
+        
+        Args:
+            force_refresh: 是否忽略缓存强制重新拉取
+            
+        Returns:
+            字典，key为基金代码，value为与get_fund_arbitrage_data相同格式的数据；
+            拉取失败时返回空字典
+        """
+        ttl = self.data_source_config.get('snapshot_ttl', 30)
+        with self._market_snapshot_lock:
+            current_time = time.time()
+            if (not force_refresh and
+                self._market_snapshot_time is not None and
+                current_time - self._market_snapshot_time < ttl):
+                return self._market_snapshot
+            
+            snapshot = {}
+            try:
+                for item in self._iter_arbitrage_list():
+                    fund_data = self._parse_arbitrage_item(item)
+                    if fund_data:
+                        snapshot[fund_data['code']] = fund_data
+            except Exception as e:
+                print(f"全市场套利快照获取失败: {e}")
+                # 只取到部分页时不缓存（缺失页上的基金会被误当作不在快照中）：
+                # 保留上一份完整快照，避免整批退化为逐个请求；没有时返回空字典，下次调用重试
+                return self._market_snapshot
+            
+            self._market_snapshot = snapshot
+            self._market_snapshot_time = current_time
+            return snapshot
+    
     def get_fund_arbitrage_data(self, fund_code: str) -> Optional[Dict]:
         """
         从东方财富套利API获取完整的套利数据（价格+净值+溢价率）
@@ -1511,23 +1744,7 @@ class LOFDataFetcher:
                 if data.get('Data') and data['Data'].get('List'):
                     for item in data['Data']['List']:
                         if item.get('FundCode') == fund_code:
-                            market_price = float(item.get('MarketPrice', 0))
-                            net_value = float(item.get('NetValue', 0))
-                            premium_rate = float(item.get('PremiumRate', 0))  # 溢价率
-                            
-                            if market_price > 0 and net_value > 0:
-                                return {
-                                    'code': fund_code,
-                                    'price': market_price,
-                                    'nav': net_value,
-                                    'premium_rate': premium_rate,
-                                    'change_pct': float(item.get('ChangePercent', 0)) / 100,
-                                    'volume': item.get('Volume', 0),
-                                    'amount': item.get('Amount', 0),
-                                    'nav_date': item.get('NetValueDate', ''),
-                                    'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                    'source': 'arbitrage_api'
-                                }
+                            return self._parse_arbitrage_item(item)
         except Exception as e:
             print(f"套利API获取失败 {fund_code}: {e}")
         
@@ -1543,320 +1760,13 @@ class LOFDataFetcher:
         Returns:
             包含限购信息的字典: {'is_limited': bool, 'limit_amount': float, 'limit_unit': str, 'limit_desc': str}
         """
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'E',
-            'location': 'data_fetcher.py:get_fund_purchase_limit:entry',
-            'message': '开始获取限购信息',
-            'data': {'fund_code': fund_code},
-            'timestamp': int(time.time() * 1000)
-        }
-        try:
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('data_fetcher.py:get_fund_purchase_limit:entry', '开始获取限购信息', {'fund_code': fund_code})
         
         try:
-            # 方法1：尝试使用akshare获取基金限购信息
-            if AKSHARE_AVAILABLE:
-                try:
-                    # #region agent log
-                    log_data = {
-                        'sessionId': 'debug-session',
-                        'runId': 'run1',
-                        'hypothesisId': 'F',
-                        'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_try',
-                        'message': '尝试使用akshare获取限购信息',
-                        'data': {'fund_code': fund_code},
-                        'timestamp': int(time.time() * 1000)
-                    }
-                    try:
-                        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                    except: pass
-                    # #endregion
-                    
-                    # 尝试使用akshare的基金基本信息接口
-                    # 注意：基金代码可能需要添加后缀，如 'of' (场外) 或 'sh'/'sz' (场内)
-                    fund_code_full = f"{fund_code}.OF"  # 场外基金
-                    
-                    # 尝试使用akshare的基金申购赎回信息（包含限购信息）
-                    try:
-                        # #region agent log
-                        log_data = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'F',
-                            'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_purchase_start',
-                            'message': '开始使用akshare获取申购信息',
-                            'data': {'fund_code': fund_code},
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        try:
-                            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                        except: pass
-                        # #endregion
-                        
-                        # fund_purchase_em()不接受参数，返回所有基金的申购状态
-                        # 使用缓存，避免重复下载（缓存5分钟）
-                        import time as time_module
-                        current_time = time_module.time()
-                        if (self._akshare_purchase_cache is None or 
-                            self._akshare_purchase_cache_time is None or 
-                            current_time - self._akshare_purchase_cache_time > 300):  # 5分钟缓存
-                            # #region agent log
-                            log_data = {
-                                'sessionId': 'debug-session',
-                                'runId': 'run1',
-                                'hypothesisId': 'F',
-                                'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_cache_miss',
-                                'message': 'akshare缓存未命中，开始下载数据',
-                                'data': {'fund_code': fund_code, 'cache_exists': self._akshare_purchase_cache is not None},
-                                'timestamp': int(time.time() * 1000)
-                            }
-                            try:
-                                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                            except: pass
-                            # #endregion
-                            
-                            try:
-                                print(f"正在从akshare下载基金申购数据...")
-                                self._akshare_purchase_cache = ak.fund_purchase_em()
-                                self._akshare_purchase_cache_time = current_time
-                                
-                                # #region agent log
-                                log_data = {
-                                    'sessionId': 'debug-session',
-                                    'runId': 'run1',
-                                    'hypothesisId': 'F',
-                                    'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_cache_loaded',
-                                    'message': 'akshare数据下载完成',
-                                    'data': {'fund_code': fund_code, 'rows': len(self._akshare_purchase_cache) if self._akshare_purchase_cache is not None else 0, 'columns': list(self._akshare_purchase_cache.columns) if self._akshare_purchase_cache is not None and hasattr(self._akshare_purchase_cache, 'columns') else []},
-                                    'timestamp': int(time.time() * 1000)
-                                }
-                                try:
-                                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                except: pass
-                                # #endregion
-                                print(f"akshare数据下载完成，共 {len(self._akshare_purchase_cache)} 条记录")
-                            except Exception as e:
-                                # #region agent log
-                                log_data = {
-                                    'sessionId': 'debug-session',
-                                    'runId': 'run1',
-                                    'hypothesisId': 'F',
-                                    'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_download_error',
-                                    'message': 'akshare数据下载失败',
-                                    'data': {'fund_code': fund_code, 'error': str(e)[:500], 'error_type': type(e).__name__},
-                                    'timestamp': int(time.time() * 1000)
-                                }
-                                try:
-                                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                except: pass
-                                # #endregion
-                                print(f"akshare数据下载失败: {e}")
-                                # 如果下载失败，缓存设为空，跳过akshare方法
-                                self._akshare_purchase_cache = None
-                                raise  # 继续使用其他方法获取限购信息
-                        else:
-                            # #region agent log
-                            log_data = {
-                                'sessionId': 'debug-session',
-                                'runId': 'run1',
-                                'hypothesisId': 'F',
-                                'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_cache_hit',
-                                'message': 'akshare使用缓存数据',
-                                'data': {'fund_code': fund_code, 'cache_age_seconds': int(current_time - self._akshare_purchase_cache_time)},
-                                'timestamp': int(time.time() * 1000)
-                            }
-                            try:
-                                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                            except: pass
-                            # #endregion
-                        
-                        all_funds_df = self._akshare_purchase_cache
-                        if all_funds_df is not None and not all_funds_df.empty:
-                            # 从所有基金中筛选出指定基金
-                            # 基金代码通常在第二列（索引1）
-                            cols = list(all_funds_df.columns)
-                            fund_code_col = cols[1]  # 基金代码列
-                            fund_record = all_funds_df[all_funds_df[fund_code_col].astype(str).str.contains(fund_code)]
-                            
-                            if not fund_record.empty:
-                                fund_row = fund_record.iloc[0]
-                                
-                                # #region agent log
-                                log_data = {
-                                    'sessionId': 'debug-session',
-                                    'runId': 'run1',
-                                    'hypothesisId': 'F',
-                                    'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_purchase_success',
-                                    'message': 'akshare申购信息获取到数据',
-                                    'data': {
-                                        'fund_code': fund_code, 
-                                        'columns': cols,
-                                        'found': True,
-                                        'fund_row': fund_row.to_dict()
-                                    },
-                                    'timestamp': int(time.time() * 1000)
-                                }
-                                try:
-                                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                except: pass
-                                # #endregion
-                                
-                                # 查找限购相关列（akshare返回的列名可能是中文）
-                                # 通常"单日累计限额（元）"在倒数第二列
-                                cols = list(fund_record.columns)
-                                
-                                # 方法1：直接查找"单日累计限额"相关列
-                                limit_keywords = ['限额', '限购', '单日累计', '单笔限额', '最大申购', 'purchase_limit', 'limit', 'maximum']
-                                for col in cols:
-                                    col_str = str(col)
-                                    # 检查列名中是否包含限购关键词
-                                    if any(keyword in col_str for keyword in limit_keywords):
-                                        limit_value = fund_row[col]
-                                        if limit_value is not None and str(limit_value) != 'nan' and str(limit_value) != '' and str(limit_value) != 'None':
-                                            try:
-                                                limit_amount = float(limit_value)
-                                                if limit_amount > 0:
-                                                    # #region agent log
-                                                    log_data = {
-                                                        'sessionId': 'debug-session',
-                                                        'runId': 'run1',
-                                                        'hypothesisId': 'F',
-                                                        'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_found_limit',
-                                                        'message': 'akshare找到限购字段',
-                                                        'data': {'fund_code': fund_code, 'column': col, 'value': limit_amount},
-                                                        'timestamp': int(time.time() * 1000)
-                                                    }
-                                                    try:
-                                                        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                                            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                                    except: pass
-                                                    # #endregion
-                                                    
-                                                    return {
-                                                        'is_limited': True,
-                                                        'limit_amount': limit_amount,
-                                                        'limit_unit': '元',
-                                                        'limit_desc': f'限购 {limit_amount:.0f} 元' if limit_amount >= 1 else f'限购 {limit_amount:.2f} 元'
-                                                    }
-                                            except (ValueError, TypeError):
-                                                pass
-                                
-                                # 方法2：如果列名无法识别，尝试倒数第二列（通常是"单日累计限额（元）"）
-                                if len(cols) >= 2:
-                                    limit_col = cols[-2]  # 倒数第二列
-                                    try:
-                                        limit_value = fund_row[limit_col]
-                                        if limit_value is not None:
-                                            limit_amount = float(limit_value)
-                                            if limit_amount > 0:
-                                                # #region agent log
-                                                log_data = {
-                                                    'sessionId': 'debug-session',
-                                                    'runId': 'run1',
-                                                    'hypothesisId': 'F',
-                                                    'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_found_limit_col',
-                                                    'message': 'akshare从倒数第二列找到限购信息',
-                                                    'data': {'fund_code': fund_code, 'column': limit_col, 'value': limit_amount},
-                                                    'timestamp': int(time.time() * 1000)
-                                                }
-                                                try:
-                                                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                                except: pass
-                                                # #endregion
-                                                
-                                                return {
-                                                    'is_limited': True,
-                                                    'limit_amount': limit_amount,
-                                                    'limit_unit': '元',
-                                                    'limit_desc': f'限购 {limit_amount:.0f} 元' if limit_amount >= 1 else f'限购 {limit_amount:.2f} 元'
-                                                }
-                                    except (ValueError, TypeError, KeyError):
-                                        pass
-                                
-                                # 方法3：遍历所有列的值，查找包含数字的限购信息
-                                for col in cols:
-                                    cell_value = fund_row[col]
-                                    if cell_value is not None:
-                                        try:
-                                            limit_amount = float(cell_value)
-                                            # 如果金额在合理范围内（1到1000万之间），可能是限购金额
-                                            if 1 <= limit_amount <= 10000000:
-                                                # 检查列名是否与限购相关
-                                                col_str = str(col).lower()
-                                                if any(keyword in col_str for keyword in ['限额', '限购', '额', 'limit']):
-                                                    # #region agent log
-                                                    log_data = {
-                                                        'sessionId': 'debug-session',
-                                                        'runId': 'run1',
-                                                        'hypothesisId': 'F',
-                                                        'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_inferred',
-                                                        'message': 'akshare推断限购信息',
-                                                        'data': {'fund_code': fund_code, 'column': col, 'value': limit_amount},
-                                                        'timestamp': int(time.time() * 1000)
-                                                    }
-                                                    try:
-                                                        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                                            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                                    except: pass
-                                                    # #endregion
-                                                    
-                                                    return {
-                                                        'is_limited': True,
-                                                        'limit_amount': limit_amount,
-                                                        'limit_unit': '元',
-                                                        'limit_desc': f'限购 {limit_amount:.0f} 元' if limit_amount >= 1 else f'限购 {limit_amount:.2f} 元'
-                                                    }
-                                        except (ValueError, TypeError):
-                                            pass
-                            else:
-                                # #region agent log
-                                log_data = {
-                                    'sessionId': 'debug-session',
-                                    'runId': 'run1',
-                                    'hypothesisId': 'F',
-                                    'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_not_found',
-                                    'message': 'akshare未找到指定基金',
-                                    'data': {'fund_code': fund_code, 'total_funds': len(all_funds_df)},
-                                    'timestamp': int(time.time() * 1000)
-                                }
-                                try:
-                                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                except: pass
-                                # #endregion
-                    except Exception as e:
-                        # #region agent log
-                        log_data = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'F',
-                            'location': 'data_fetcher.py:get_fund_purchase_limit:akshare_purchase_error',
-                            'message': 'akshare申购信息获取失败',
-                            'data': {'fund_code': fund_code, 'error': str(e), 'error_type': type(e).__name__},
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        try:
-                            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                        except: pass
-                        # #endregion
-                        pass
-                except Exception as e:
-                    print(f"akshare获取限购信息失败 {fund_code}: {e}")
+            # 方法1：akshare全量申购信息索引（O(1)查找，过期后后台刷新）
+            purchase_limit = self._get_purchase_limit_index().get(fund_code)
+            if purchase_limit:
+                return dict(purchase_limit)
             
             # 方法2：尝试使用baostock获取（但baostock主要针对股票，可能不支持基金）
             # 暂时跳过，因为baostock主要用于股票数据
@@ -1875,21 +1785,7 @@ class LOFDataFetcher:
                 if json_match:
                     data = json.loads(json_match.group(1))
                     
-                    # #region agent log
-                    log_data = {
-                        'sessionId': 'debug-session',
-                        'runId': 'run1',
-                        'hypothesisId': 'E',
-                        'location': 'data_fetcher.py:get_fund_purchase_limit:api_response',
-                        'message': 'API响应数据',
-                        'data': {'fund_code': fund_code, 'data_keys': list(data.keys()) if isinstance(data, dict) else 'not_dict', 'has_data': 'Data' in data if isinstance(data, dict) else False},
-                        'timestamp': int(time.time() * 1000)
-                    }
-                    try:
-                        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                            f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                    except: pass
-                    # #endregion
+                    trace('data_fetcher.py:get_fund_purchase_limit:api_response', 'API响应数据', {'fund_code': fund_code, 'data_keys': list(data.keys()) if isinstance(data, dict) else 'not_dict', 'has_data': 'Data' in data if isinstance(data, dict) else False})
                     
                     if data.get('Data'):
                         data_obj = data['Data']
@@ -1900,39 +1796,11 @@ class LOFDataFetcher:
                         for field in limit_fields:
                             limit_value = data_obj.get(field)
                             if limit_value is not None and limit_value != '':
-                                # #region agent log
-                                log_data = {
-                                    'sessionId': 'debug-session',
-                                    'runId': 'run1',
-                                    'hypothesisId': 'E',
-                                    'location': 'data_fetcher.py:get_fund_purchase_limit:found_field',
-                                    'message': '找到限购字段',
-                                    'data': {'fund_code': fund_code, 'field': field, 'value': limit_value},
-                                    'timestamp': int(time.time() * 1000)
-                                }
-                                try:
-                                    with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                        f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                                except: pass
-                                # #endregion
+                                trace('data_fetcher.py:get_fund_purchase_limit:found_field', '找到限购字段', {'fund_code': fund_code, 'field': field, 'value': limit_value})
                                 return self._parse_purchase_limit(limit_value, field)
                         
                         # 如果没有找到，记录所有可用字段
-                        # #region agent log
-                        log_data = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'E',
-                            'location': 'data_fetcher.py:get_fund_purchase_limit:no_limit_field',
-                            'message': '未找到限购字段，记录所有字段',
-                            'data': {'fund_code': fund_code, 'all_fields': list(data_obj.keys())},
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        try:
-                            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                        except: pass
-                        # #endregion
+                        trace('data_fetcher.py:get_fund_purchase_limit:no_limit_field', '未找到限购字段，记录所有字段', {'fund_code': fund_code, 'all_fields': list(data_obj.keys())})
             
             # 方法4：尝试从基金详情页面获取
             url2 = f'http://fund.eastmoney.com/{fund_code}.html'
@@ -1955,21 +1823,7 @@ class LOFDataFetcher:
                         unit = match.group(2) if len(match.groups()) > 1 else '元'
                         try:
                             amount = float(amount_str)
-                            # #region agent log
-                            log_data = {
-                                'sessionId': 'debug-session',
-                                'runId': 'run1',
-                                'hypothesisId': 'E',
-                                'location': 'data_fetcher.py:get_fund_purchase_limit:found_in_page',
-                                'message': '从页面提取限购信息',
-                                'data': {'fund_code': fund_code, 'amount': amount, 'unit': unit, 'pattern': pattern},
-                                'timestamp': int(time.time() * 1000)
-                            }
-                            try:
-                                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                            except: pass
-                            # #endregion
+                            trace('data_fetcher.py:get_fund_purchase_limit:found_in_page', '从页面提取限购信息', {'fund_code': fund_code, 'amount': amount, 'unit': unit, 'pattern': pattern})
                             return self._parse_purchase_limit_from_text(amount, unit)
                         except ValueError:
                             continue
@@ -1989,40 +1843,12 @@ class LOFDataFetcher:
                     try:
                         data = json.loads(json_match.group(1))
                         # 记录响应结构
-                        # #region agent log
-                        log_data = {
-                            'sessionId': 'debug-session',
-                            'runId': 'run1',
-                            'hypothesisId': 'E',
-                            'location': 'data_fetcher.py:get_fund_purchase_limit:trade_info',
-                            'message': '申购赎回费率API响应',
-                            'data': {'fund_code': fund_code, 'data_keys': list(data.keys()) if isinstance(data, dict) else 'not_dict'},
-                            'timestamp': int(time.time() * 1000)
-                        }
-                        try:
-                            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-                        except: pass
-                        # #endregion
+                        trace('data_fetcher.py:get_fund_purchase_limit:trade_info', '申购赎回费率API响应', {'fund_code': fund_code, 'data_keys': list(data.keys()) if isinstance(data, dict) else 'not_dict'})
                     except:
                         pass
                         
         except Exception as e:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'E',
-                'location': 'data_fetcher.py:get_fund_purchase_limit:error',
-                'message': '获取限购信息失败',
-                'data': {'fund_code': fund_code, 'error': str(e)},
-                'timestamp': int(time.time() * 1000)
-            }
-            try:
-                with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('data_fetcher.py:get_fund_purchase_limit:error', '获取限购信息失败', {'fund_code': fund_code, 'error': str(e)}, level='error')
             print(f"获取限购信息失败 {fund_code}: {e}")
         
         # 默认返回不限购
@@ -2033,6 +1859,145 @@ class LOFDataFetcher:
             'limit_desc': '不限购'
         }
     
+    def get_fund_purchase_limits(self, fund_codes: List[str], fallback: bool = True) -> Dict[str, Dict]:
+        """
+        批量获取基金限购信息（直接查akshare申购信息索引，不逐个请求）
+        
+        Args:
+            fund_codes: 基金代码列表
+            fallback: 索引不可用（akshare未安装或下载失败）时是否回退为逐个获取；
+                      批量扫描传False，避免逐个请求拖慢刷新
+            
+        Returns:
+            字典，key为基金代码，value为限购信息；每条附带 limit_as_of（数据下载时间）。
+            索引不可用且不回退时返回空字典
+        """
+        index = self._get_purchase_limit_index()
+        if not index:
+            if not fallback:
+                return {}
+            return {fund_code: self.get_fund_purchase_limit(fund_code) for fund_code in fund_codes}
+        
+        not_limited = {'is_limited': False, 'limit_amount': None, 'limit_unit': None, 'limit_desc': '不限购'}
+        downloaded_at = self._purchase_limit_downloaded_at
+        limit_as_of = datetime.fromtimestamp(downloaded_at).strftime('%Y-%m-%d %H:%M:%S') if downloaded_at else None
+        limits = {}
+        for fund_code in fund_codes:
+            limits[fund_code] = {**index.get(fund_code, not_limited), 'limit_as_of': limit_as_of}
+        return limits
+    
+    def _get_purchase_limit_index(self) -> Dict[str, Dict]:
+        """
+        获取akshare申购信息索引
+        
+        首次调用时同步下载并建索引；超过缓存时间（5分钟）后立即返回旧索引，同时在后台线程刷新
+        
+        Returns:
+            基金代码 -> 限购信息，akshare不可用时返回空字典
+        """
+        if not AKSHARE_AVAILABLE or not self._is_source_enabled('purchase_limit_sources', 'akshare'):
+            return {}
+        
+        ttl = self.data_source_config.get('purchase_limit_ttl', 300)
+        with self._purchase_limit_index_lock:
+            index_time = self._purchase_limit_index_time
+            if index_time is not None:
+                if time.time() - index_time > ttl and not self._purchase_limit_refreshing:
+                    self._purchase_limit_refreshing = True
+                    threading.Thread(target=self._refresh_purchase_limit_index,
+                                     name='purchase-limit-refresh', daemon=True).start()
+                return self._purchase_limit_index
+        
+        # 首次加载：同步下载（多个线程同时首次调用时只下载一次）
+        with self._purchase_limit_index_lock:
+            if self._purchase_limit_index_time is None:
+                self._purchase_limit_refreshing = True
+                self._refresh_purchase_limit_index(locked=True)
+            return self._purchase_limit_index
+    
+    def _refresh_purchase_limit_index(self, locked: bool = False):
+        """下载akshare全量申购信息并重建索引（失败时保留旧索引）"""
+        try:
+            print("正在从akshare下载基金申购数据...")
+            index = self._build_purchase_limit_index(ak.fund_purchase_em())
+            print(f"akshare数据下载完成，共 {len(index)} 只基金")
+        except Exception as e:
+            print(f"akshare数据下载失败: {e}")
+            index = None
+        
+        def commit():
+            now = time.time()
+            if index is not None:
+                self._purchase_limit_index = index
+                self._purchase_limit_downloaded_at = now
+            # 失败时也更新尝试时间，避免每次查询都重新下载（limit_as_of 仍是上次成功下载的时间）
+            self._purchase_limit_index_time = now
+            self._purchase_limit_refreshing = False
+        
+        if locked:
+            commit()
+        else:
+            with self._purchase_limit_index_lock:
+                commit()
+    
+    def _build_purchase_limit_index(self, all_funds_df) -> Dict[str, Dict]:
+        """
+        将 ak.fund_purchase_em() 的全量表解析为 基金代码 -> 限购信息 的索引
+        
+        Args:
+            all_funds_df: akshare返回的DataFrame（序号、基金代码、基金简称、...、申购状态、...、日累计限定金额、手续费）
+            
+        Returns:
+            基金代码 -> 限购信息
+        """
+        if all_funds_df is None or all_funds_df.empty:
+            return {}
+        
+        cols = list(all_funds_df.columns)
+        # 基金代码列（通常是第二列）
+        code_col = '基金代码' if '基金代码' in cols else cols[1]
+        # 限购金额列：优先按列名关键词查找，否则取倒数第二列（通常是"日累计限定金额"）
+        limit_keywords = ['限定金额', '限额', '限购', '单日累计', '单笔限额', '最大申购', 'purchase_limit', 'limit', 'maximum']
+        limit_col = next((col for col in cols if any(keyword in str(col) for keyword in limit_keywords)),
+                         cols[-2] if len(cols) >= 2 else None)
+        status_col = '申购状态' if '申购状态' in cols else None
+        
+        codes = all_funds_df[code_col].astype(str).str.zfill(6).tolist()
+        limit_values = all_funds_df[limit_col].tolist() if limit_col is not None else [None] * len(codes)
+        statuses = all_funds_df[status_col].astype(str).tolist() if status_col else [''] * len(codes)
+        
+        index = {}
+        for fund_code, limit_value, status in zip(codes, limit_values, statuses):
+            if '暂停申购' in status:
+                index[fund_code] = {
+                    'is_limited': True,
+                    'limit_amount': 0,
+                    'limit_unit': '元',
+                    'limit_desc': '暂停申购'
+                }
+                continue
+            
+            try:
+                limit_amount = float(limit_value)
+            except (ValueError, TypeError):
+                limit_amount = 0
+            # 不限购的基金该列通常是一个极大值（如1000亿）
+            if limit_amount != limit_amount or limit_amount <= 0 or limit_amount >= 1e10:
+                index[fund_code] = {
+                    'is_limited': False,
+                    'limit_amount': None,
+                    'limit_unit': None,
+                    'limit_desc': '不限购'
+                }
+            else:
+                index[fund_code] = {
+                    'is_limited': True,
+                    'limit_amount': limit_amount,
+                    'limit_unit': '元',
+                    'limit_desc': f'限购 {limit_amount:.0f} 元' if limit_amount >= 1 else f'限购 {limit_amount:.2f} 元'
+                }
+        return index
+    
     def _parse_purchase_limit(self, limit_value, field_name: str) -> Dict:
         """解析限购信息"""
         try:
@@ -2148,7 +2113,26 @@ class MockDataFetcher:
             'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
     
-    def get_fund_info(self, fund_code: str) -> Optional[Dict]:
+    def get_fund_prices(self, fund_codes: List[str]) -> Dict[str, Dict]:
+        """模拟批量价格数据"""
+        return {fund_code: self.get_fund_price(fund_code) for fund_code in fund_codes}
+    
+    def get_market_snapshot(self, force_refresh: bool = False) -> Dict[str, Dict]:
+        """模拟数据没有全市场快照"""
+        return {}
+    
+    def get_fund_purchase_limit(self, fund_code: str) -> Optional[Dict]:
+        """模拟限购信息（均不限购）"""
+        return {'is_limited': False, 'limit_amount': None, 'limit_unit': None, 'limit_desc': '不限购'}
+    
+    def get_fund_purchase_limits(self, fund_codes: List[str], fallback: bool = True) -> Dict[str, Dict]:
+        """模拟批量限购信息"""
+        limit_as_of = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return {fund_code: {**self.get_fund_purchase_limit(fund_code), 'limit_as_of': limit_as_of}
+                for fund_code in fund_codes}
+    
+    def get_fund_info(self, fund_code: str, snapshot: Optional[Dict[str, Dict]] = None,
+                      quotes: Optional[Dict[str, Optional[Dict]]] = None) -> Optional[Dict]:
         price_info = self.get_fund_price(fund_code)
         nav_info = self.get_fund_nav(fund_code)
         
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+基金中文名称解析模块
+基金代码 -> 中文名称的字典保存在本地文件中，接口只查字典，不发请求；
+缺少中文名称的基金由后台线程补全：先批量解析（一次请求覆盖多只基金），
+剩余的再逐个解析，逐个解析受每分钟请求数限制
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def has_chinese_name(name: Optional[str]) -> bool:
+    """名称是否包含中文（拼音简称、基金代码等不算有效的中文名称）"""
+    return bool(name) and any('\u4e00' <= char <= '\u9fff' for char in name)
+
+
+class FundNameResolver:
+    """基金中文名称字典（本地持久化 + 后台限速补全）"""
+    
+    def __init__(self, resolve_func: Callable[[str], Optional[str]],
+                 bulk_resolve_func: Callable[[List[str]], Dict[str, str]] = None,
+                 names_file: str = 'fund_names.json', rate_per_minute: int = 30,
+                 retry_interval: int = 86400):
+        """
+        初始化名称解析器
+        
+        Args:
+            resolve_func: 逐个解析函数，传入基金代码返回中文名称或None
+            bulk_resolve_func: 批量解析函数，传入基金代码列表返回 {基金代码: 中文名称}
+            names_file: 名称字典文件路径
+            rate_per_minute: 逐个解析每分钟最多请求数
+            retry_interval: 解析失败的基金多久后再试（秒）
+        """
+        self.resolve_func = resolve_func
+        self.bulk_resolve_func = bulk_resolve_func
+        self.names_file = names_file
+        self.rate_per_minute = rate_per_minute
+        self.retry_interval = retry_interval
+        
+        self._names: Dict[str, str] = {}
+        # 待补全的基金代码（有序去重）
+        self._pending: 'OrderedDict[str, None]' = OrderedDict()
+        # 后台线程正在处理的基金代码
+        self._in_progress = set()
+        # 基金代码 -> 最近一次解析失败的时间
+        self._failed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.load()
+    
+    def load(self):
+        """从本地文件加载名称字典"""
+        if not self.names_file or not os.path.exists(self.names_file):
+            return
+        try:
+            with open(self.names_file, 'r', encoding='utf-8') as f:
+                names = json.load(f)
+            with self._lock:
+                self._names.update({code: name for code, name in names.items() if has_chinese_name(name)})
+        except Exception as e:
+            print(f"加载基金名称字典失败: {e}")
+    
+    def save(self):
+        """保存名称字典（先写临时文件再替换）"""
+        if not self.names_file:
+            return
+        with self._lock:
+            names = dict(self._names)
+        tmp_file = self.names_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(names, f, ensure_ascii=False)
+            os.replace(tmp_file, self.names_file)
+        except Exception as e:
+            print(f"保存基金名称字典失败: {e}")
+    
+    def get(self, fund_code: str) -> Optional[str]:
+        """查询基金中文名称（只查字典）"""
+        return self._names.get(fund_code)
+    
+    def update(self, names: Dict[str, str]) -> int:
+        """
+        合并一批名称（只接受中文名称）
+        
+        Returns:
+            新增或变化的条数
+        """
+        changed = 0
+        with self._lock:
+            for fund_code, name in names.items():
+                if has_chinese_name(name) and self._names.get(fund_code) != name:
+                    self._names[fund_code] = name
+                    self._failed.pop(fund_code, None)
+                    changed += 1
+        return changed
+    
+    def request(self, fund_codes: Iterable[str]):
+        """
+        登记需要补全名称的基金（已有中文名称或近期解析失败的会被忽略），由后台线程处理
+        """
+        now = time.time()
+        added = False
+        with self._lock:
+            for fund_code in fund_codes:
+                if fund_code in self._names or fund_code in self._pending or fund_code in self._in_progress:
+                    continue
+                failed_at = self._failed.get(fund_code)
+                if failed_at is not None and now - failed_at < self.retry_interval:
+                    continue
+                self._pending[fund_code] = None
+                added = True
+        if added:
+            self._ensure_worker()
+            self._wake.set()
+    
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='fund-name-resolver', daemon=True)
+            self._thread.start()
+    
+    def _take_pending(self) -> List[str]:
+        with self._lock:
+            codes = list(self._pending)
+            self._pending.clear()
+            self._in_progress = set(codes)
+            return codes
+    
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            codes = self._take_pending()
+            if not codes:
+                continue
+            
+            # 1. 批量解析：一次请求覆盖全部待补全的基金
+            if self.bulk_resolve_func is not None:
+                try:
+                    if self.update(self.bulk_resolve_func(codes)):
+                        self.save()
+                except Exception as e:
+                    print(f"批量解析基金名称失败: {e}")
+                codes = [code for code in codes if code not in self._names]
+            
+            # 2. 逐个解析剩余的基金，按每分钟请求数限速
+            interval = 60.0 / max(1, self.rate_per_minute)
+            resolved = 0
+            for fund_code in codes:
+                started = time.time()
+                try:
+                    name = self.resolve_func(fund_code)
+                except Exception as e:
+                    name = None
+                    print(f"解析基金名称失败 {fund_code}: {e}")
+                if name and self.update({fund_code: name}):
+                    resolved += 1
+                    # 每补全一批保存一次，避免中途退出时丢失
+                    if resolved % 20 == 0:
+                        self.save()
+                elif fund_code not in self._names:
+                    with self._lock:
+                        self._failed[fund_code] = time.time()
+                time.sleep(max(0.0, interval - (time.time() - started)))
+            with self._lock:
+                self._in_progress = set()
+            if resolved:
+                self.save()
+                print(f"后台补全 {resolved} 只基金的中文名称")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+基金列表本地缓存模块
+自动发现的LOF基金列表保存到本地文件，启动时直接加载；
+后台线程在缓存过期后（默认每天一次）重新发现，上游不可用时继续使用旧列表
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class FundUniverse:
+    """LOF基金列表缓存（基金代码 -> 名称）"""
+    
+    def __init__(self, cache_file: str = 'fund_universe.json', max_age: int = 86400,
+                 retry_interval: int = 3600):
+        """
+        初始化基金列表缓存
+        
+        Args:
+            cache_file: 缓存文件路径
+            max_age: 缓存有效期（秒），过期后后台重新发现
+            retry_interval: 重新发现失败后的重试间隔（秒）
+        """
+        self.cache_file = cache_file
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self.updated_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def load(self) -> Dict[str, str]:
+        """
+        加载缓存的基金列表
+        
+        Returns:
+            {基金代码: 名称}，没有缓存或读取失败返回空字典
+        """
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.updated_at = data.get('updated_at')
+            return data.get('funds', {})
+        except Exception as e:
+            print(f"加载基金列表缓存失败: {e}")
+            return {}
+    
+    def save(self, funds: Dict[str, str]):
+        """保存基金列表（先写临时文件再替换，避免写到一半时被读取）"""
+        with self._lock:
+            self.updated_at = time.time()
+            data = {'updated_at': self.updated_at, 'funds': funds}
+            tmp_file = self.cache_file + '.tmp'
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_file, self.cache_file)
+            except Exception as e:
+                print(f"保存基金列表缓存失败: {e}")
+    
+    def is_stale(self) -> bool:
+        """缓存是否已过期（没有缓存也视为过期）"""
+        return self.updated_at is None or time.time() - self.updated_at >= self.max_age
+    
+    def start_refresher(self, discover_func: Callable[[], List[Dict]],
+                        on_update: Callable[[Dict[str, str]], None]):
+        """
+        启动后台刷新线程（重复调用无副作用）
+        
+        Args:
+            discover_func: 发现函数，返回 [{'code': ..., 'name': ...}, ...]
+            on_update: 发现成功后的回调，传入 {基金代码: 名称}
+        """
+        with self._lock:
+            if self.is_running:
+                return
+            self._thread = threading.Thread(target=self._run, args=(discover_func, on_update),
+                                            name='fund-universe', daemon=True)
+            self._thread.start()
+    
+    def _run(self, discover_func, on_update):
+        while True:
+            if self.is_stale():
+                try:
+                    funds_list = discover_func()
+                except Exception as e:
+                    funds_list = None
+                    print(f"后台发现LOF基金失败: {e}")
+                if funds_list:
+                    funds = {fund['code']: fund['name'] for fund in funds_list}
+                    on_update(funds)
+                    self.save(funds)
+                    print(f"后台发现 {len(funds)} 只LOF基金，已更新本地缓存")
+                    wait = self.max_age
+                else:
+                    wait = self.retry_interval
+            else:
+                wait = self.max_age - (time.time() - self.updated_at)
+            time.sleep(max(1, wait))
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP连接池配置模块
+为每个上游主机单独挂载连接池（池大小、重试策略可配置），并统计连接池等待时间
+"""
+
+import threading
+import time
+from typing import Dict
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+# 默认的上游主机连接池配置（DATA_SOURCE['http_pools'] 未配置时使用）
+DEFAULT_HOST_POOLS = {
+    'push2.eastmoney.com': {'pool_maxsize': 50, 'retries': 2, 'backoff_factor': 0.2},
+    'zqhdplus.eastmoney.com': {'pool_maxsize': 20, 'retries': 2, 'backoff_factor': 0.5},
+    'hq.sinajs.cn': {'pool_maxsize': 50, 'retries': 1, 'backoff_factor': 0.2},
+    'qt.gtimg.cn': {'pool_maxsize': 50, 'retries': 1, 'backoff_factor': 0.2},
+    'api.fund.eastmoney.com': {'pool_maxsize': 50, 'retries': 2, 'backoff_factor': 0.3},
+}
+
+
+class PoolStats:
+    """连接池统计（按主机汇总，线程安全）"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict] = {}
+    
+    def _host_stats(self, host: str) -> Dict:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = {
+                'checkouts': 0,         # 取连接次数
+                'waited': 0,            # 需要等待空闲连接的次数（等待超过1毫秒）
+                'wait_total_ms': 0.0,   # 累计等待时间
+                'wait_max_ms': 0.0,     # 最长等待时间
+                'discarded': 0,         # 归还时连接池已满而被丢弃的连接数
+            }
+            self._hosts[host] = stats
+        return stats
+    
+    def record_checkout(self, host: str, wait_seconds: float):
+        wait_ms = wait_seconds * 1000
+        with self._lock:
+            stats = self._host_stats(host)
+            stats['checkouts'] += 1
+            stats['wait_total_ms'] += wait_ms
+            if wait_ms > 1:
+                stats['waited'] += 1
+            if wait_ms > stats['wait_max_ms']:
+                stats['wait_max_ms'] = wait_ms
+    
+    def record_discard(self, host: str):
+        with self._lock:
+            self._host_stats(host)['discarded'] += 1
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """返回各主机统计的副本（附带平均等待时间）"""
+        with self._lock:
+            result = {}
+            for host, stats in self._hosts.items():
+                item = dict(stats)
+                item['wait_avg_ms'] = round(stats['wait_total_ms'] / stats['checkouts'], 3) if stats['checkouts'] else 0
+                item['wait_total_ms'] = round(stats['wait_total_ms'], 3)
+                item['wait_max_ms'] = round(stats['wait_max_ms'], 3)
+                result[host] = item
+            return result
+    
+    def reset(self):
+        with self._lock:
+            self._hosts = {}
+
+
+# 全局连接池统计（所有会话共享）
+pool_stats = PoolStats()
+
+
+class _TimedPoolMixin:
+    """记录取连接等待时间和连接丢弃次数"""
+    
+    def _get_conn(self, timeout=None):
+        started = time.perf_counter()
+        try:
+            return super()._get_conn(timeout)
+        finally:
+            pool_stats.record_checkout(self.host, time.perf_counter() - started)
+    
+    def _put_conn(self, conn):
+        if conn is not None and self.pool is not None and self.pool.full():
+            pool_stats.record_discard(self.host)
+        super()._put_conn(conn)
+
+
+class TimedHTTPConnectionPool(_TimedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class TimedHTTPSConnectionPool(_TimedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """使用带统计功能连接池的HTTPAdapter"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+def _build_adapter(pool_config: Dict, pool_block: bool) -> TimedHTTPAdapter:
+    """根据单个主机的配置创建Adapter"""
+    retries = Retry(
+        total=pool_config.get('retries', 1),
+        backoff_factor=pool_config.get('backoff_factor', 0.3),
+        status_forcelist=pool_config.get('status_forcelist', [429, 500, 502, 503, 504]),
+        allowed_methods=['GET', 'HEAD'],
+        raise_on_status=False
+    )
+    return TimedHTTPAdapter(
+        pool_connections=pool_config.get('pool_connections', 4),
+        pool_maxsize=pool_config.get('pool_maxsize', 20),
+        max_retries=retries,
+        pool_block=pool_block
+    )
+
+
+def mount_host_pools(session, pools_config: Dict = None):
+    """
+    为会话挂载按主机划分的连接池
+    
+    Args:
+        session: requests.Session
+        pools_config: DATA_SOURCE['http_pools'] 配置，格式：
+            {
+                'pool_block': True,   # 连接池耗尽时等待空闲连接（而不是新建后丢弃）
+                'default': {'pool_maxsize': 20, 'retries': 1, 'backoff_factor': 0.3},
+                'hosts': {'hq.sinajs.cn': {'pool_maxsize': 50, 'retries': 1, 'backoff_factor': 0.2}, ...}
+            }
+    """
+    pools_config = pools_config or {}
+    pool_block = pools_config.get('pool_block', True)
+    
+    default_adapter = _build_adapter(pools_config.get('default', {}), pool_block)
+    session.mount('http://', default_adapter)
+    session.mount('https://', default_adapter)
+    
+    host_pools = pools_config.get('hosts', DEFAULT_HOST_POOLS)
+    for host, pool_config in host_pools.items():
+        adapter = _build_adapter(pool_config, pool_block)
+        session.mount(f'http://{host}', adapter)
+        session.mount(f'https://{host}', adapter)
@@ -5,9 +5,12 @@ LOF基金套利工具主程序
 
 import time
 import sys
+from datetime import datetime, timedelta
 from typing import List, Dict
 from data_fetcher import LOFDataFetcher, MockDataFetcher
+from async_data_fetcher import AsyncLOFDataFetcher, AIOHTTP_AVAILABLE
 from arbitrage_calculator import ArbitrageCalculator
+from trading_calendar import create_scheduler
 from config import LOF_FUNDS, DATA_SOURCE
 
 
@@ -72,12 +75,32 @@ class LOFArbitrageTool:
         print(f"监控 {len(fund_codes)} 只LOF基金")
         print(f"{'='*60}\n")
         
+        # 异步抓取引擎：一次并发获取全部基金，无需逐个请求和等待
+        fund_infos = None
+        snapshot = None
+        if (DATA_SOURCE.get('fetch_engine') == 'async' and AIOHTTP_AVAILABLE and
+                isinstance(self.data_fetcher, LOFDataFetcher)):
+            fund_infos = AsyncLOFDataFetcher(self.data_fetcher).scan(
+                fund_codes, use_snapshot=DATA_SOURCE.get('use_market_snapshot', True))
+        elif DATA_SOURCE.get('use_market_snapshot', True):
+            # 市场快照模式：一次批量拉取全市场套利数据，快照中缺失的基金再逐个获取
+            snapshot = self.data_fetcher.get_market_snapshot() or None
+        
+        # 快照中缺失的基金先批量取价（多代码合并请求），写入行情缓存
+        if fund_infos is None:
+            missing_codes = [code for code in fund_codes if snapshot is None or code not in snapshot]
+            if missing_codes:
+                self.data_fetcher.get_fund_prices(missing_codes)
+        
         results = []
         for fund_code in fund_codes:
             fund_name = self.funds.get(fund_code, '')
             print(f"正在获取 {fund_code} {fund_name}...", end=' ')
             
-            fund_info = self.data_fetcher.get_fund_info(fund_code)
+            if fund_infos is not None:
+                fund_info = fund_infos.get(fund_code)
+            else:
+                fund_info = self.data_fetcher.get_fund_info(fund_code, snapshot=snapshot)
             if fund_info:
                 result = self.calculator.calculate_arbitrage(fund_info)
                 if result:
@@ -86,7 +109,8 @@ class LOFArbitrageTool:
             else:
                 print("✗")
             
-            time.sleep(0.5)  # 避免请求过快
+            if fund_infos is None and (snapshot is None or fund_code not in snapshot):
+                time.sleep(0.5)  # 避免请求过快（快照命中的基金没有发起请求，无需等待）
         
         if results:
             print(f"\n{'='*60}")
@@ -144,7 +168,8 @@ class LOFArbitrageTool:
         
         Args:
             fund_codes: 基金代码列表
-            interval: 监控间隔（秒），如果为None则使用配置中的值
+            interval: 盘中监控间隔（秒），如果为None则使用配置中的值；
+                      休市时间按交易日历空闲（见配置 trading_schedule）
         """
         if interval is None:
             interval = DATA_SOURCE['update_interval']
@@ -158,11 +183,18 @@ class LOFArbitrageTool:
         print(f"按 Ctrl+C 停止监控")
         print(f"{'='*60}\n")
         
+        scheduler = create_scheduler()
         try:
             while True:
+                started = datetime.now()
                 self.monitor_multiple_funds(fund_codes)
-                print(f"\n⏰ 等待 {interval} 秒后更新...")
-                time.sleep(interval)
+                delay = scheduler.next_delay(interval, started=started)
+                if delay > interval:
+                    next_run = datetime.now() + timedelta(seconds=delay)
+                    print(f"\n💤 休市中，下次更新时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+                else:
+                    print(f"\n⏰ 等待 {delay:.0f} 秒后更新...")
+                time.sleep(delay)
         except KeyboardInterrupt:
             print("\n\n监控已停止")
 
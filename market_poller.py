@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+后台行情轮询模块
+按固定间隔为所有基金预先计算套利结果，所有用户共享同一份结果表
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# 判断一行结果是否变化时比较的字段（推送增量时发送整行）；
+# 名称由后台补全，价格净值不变时也需要推送
+DELTA_FIELDS = ('price', 'nav', 'profit_rate', 'has_opportunity', 'fund_name')
+# 限购信息只比较内容（limit_as_of 每次刷新索引都会变，单独变化不推送）
+PURCHASE_LIMIT_FIELDS = ('is_limited', 'limit_amount', 'limit_desc')
+
+
+class MarketPoller:
+    """后台行情轮询器"""
+    
+    def __init__(self, scan_func: Callable[[List[str]], Dict[str, Optional[Dict]]],
+                 fund_codes_func: Callable[[], List[str]],
+                 interval_func: Callable[[datetime], float], max_deltas: int = 100):
+        """
+        初始化轮询器
+        
+        Args:
+            scan_func: 扫描函数，传入基金代码列表，返回 {基金代码: 套利结果或None}
+            fund_codes_func: 返回需要轮询的基金代码列表
+            interval_func: 传入本轮扫描的开始时间，返回扫描结束后距下一轮的等待秒数
+                           （每轮重新读取以支持运行时修改配置）
+            max_deltas: 保留的增量条数（客户端断线重连时可从中补发，更早的需要重新拉全量）
+        """
+        self.scan_func = scan_func
+        self.fund_codes_func = fund_codes_func
+        self.interval_func = interval_func
+        
+        # 基金代码 -> 套利结果（None表示已扫描但无数据，如已清盘）
+        self._table: Dict[str, Optional[Dict]] = {}
+        self.snapshot_time: Optional[str] = None
+        self.last_scan_duration: Optional[float] = None
+        
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 每次reset递增，旧一轮扫描的结果不会覆盖reset之后的数据
+        self._generation = 0
+        
+        # 增量序号：结果表每变化一次（或reset）递增，SSE客户端据此断线续传
+        self.seq = 0
+        self._deltas = deque(maxlen=max_deltas)
+        # 基金代码 -> 该基金结果最后一次变化时的序号（用于 changed_since 查询）
+        self._row_seq: Dict[str, int] = {}
+        # 最近一次reset的序号，早于它的 changed_since 无法按增量回答
+        self._reset_seq = 0
+        self._changed = threading.Condition(self._lock)
+        # 每轮扫描后以有变化的结果调用的回调（在轮询线程中执行）
+        self._listeners: List[Callable[[List[Dict]], None]] = []
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """启动后台轮询线程（重复调用无副作用）"""
+        with self._lock:
+            if self.is_running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='market-poller', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """停止后台轮询线程"""
+        self._stop.set()
+        self._wake.set()
+    
+    def reset(self):
+        """清空结果表并立即重新扫描（切换数据源或模拟模式后调用）"""
+        with self._lock:
+            self._generation += 1
+            self._table = {}
+            self.snapshot_time = None
+            self._ready.clear()
+            self._row_seq = {}
+            # 通知客户端清空表格，下一轮扫描的结果会作为增量全部推送
+            self._append_delta({'reset': True, 'rows': [], 'removed': []})
+            self._reset_seq = self.seq
+        self._wake.set()
+    
+    def add_listener(self, callback: Callable[[List[Dict]], None]):
+        """
+        注册扫描回调：每轮扫描结束后，以本轮有变化的结果行调用
+        
+        Args:
+            callback: 回调函数，传入结果列表
+        """
+        self._listeners.append(callback)
+    
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """
+        等待第一轮扫描完成
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            结果表是否可用
+        """
+        if self._ready.is_set():
+            return True
+        if not self.is_running:
+            return False
+        return self._ready.wait(timeout)
+    
+    def scan_once(self):
+        """执行一轮扫描并替换结果表"""
+        with self._lock:
+            generation = self._generation
+        
+        started = time.time()
+        fund_codes = list(self.fund_codes_func())
+        table = self.scan_func(fund_codes)
+        
+        with self._lock:
+            if generation != self._generation:
+                return
+            previous = self._table
+            self._table = table
+            self.snapshot_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.last_scan_duration = time.time() - started
+            self._ready.set()
+            
+            rows, removed = self._diff(previous, table)
+            if rows or removed:
+                self._append_delta({'reset': False, 'rows': rows, 'removed': removed})
+                for result in rows:
+                    self._row_seq[result['fund_code']] = self.seq
+                for fund_code in removed:
+                    self._row_seq[fund_code] = self.seq
+        
+        print(f"后台轮询完成：{len(fund_codes)} 只基金，耗时 {self.last_scan_duration:.1f} 秒")
+        
+        if rows:
+            for callback in self._listeners:
+                try:
+                    callback(rows)
+                except Exception as e:
+                    print(f"轮询回调执行失败: {e}")
+    
+    def get_result(self, fund_code: str) -> Tuple[bool, Optional[Dict]]:
+        """
+        查询单个基金的最新结果
+        
+        Returns:
+            (是否已扫描过, 套利结果或None)
+        """
+        table = self._table
+        if fund_code in table:
+            return True, table[fund_code]
+        return False, None
+    
+    def get_results(self, fund_codes: List[str]) -> Tuple[List[Dict], List[str]]:
+        """
+        批量查询基金的最新结果
+        
+        Returns:
+            (有数据的套利结果列表, 尚未扫描过的基金代码列表)
+        """
+        table = self._table
+        results = []
+        missing = []
+        for fund_code in fund_codes:
+            if fund_code not in table:
+                missing.append(fund_code)
+            elif table[fund_code] is not None:
+                results.append(table[fund_code])
+        return results, missing
+    
+    def get_changes(self, fund_codes: List[str], since: int) -> Optional[Tuple[List[Dict], List[str], List[str]]]:
+        """
+        查询序号since之后有变化的基金
+        
+        Args:
+            fund_codes: 基金代码列表
+            since: 客户端上次拿到的序号
+        
+        Returns:
+            (有变化的套利结果列表, 变为无数据的基金代码列表, 尚未扫描过的基金代码列表)；
+            since早于最近一次reset或大于当前序号时返回None，客户端需要重新拉全量
+        """
+        with self._lock:
+            if since < self._reset_seq or since > self.seq:
+                return None
+            table = self._table
+            row_seq = self._row_seq
+        
+        results = []
+        removed = []
+        missing = []
+        for fund_code in fund_codes:
+            if fund_code not in table:
+                missing.append(fund_code)
+            elif row_seq.get(fund_code, 0) > since:
+                if table[fund_code] is None:
+                    removed.append(fund_code)
+                else:
+                    results.append(table[fund_code])
+        return results, removed, missing
+    
+    def get_row_seq(self, fund_code: str) -> Optional[int]:
+        """基金结果最后一次变化时的序号（未扫描过返回None）"""
+        return self._row_seq.get(fund_code)
+    
+    def get_snapshot(self) -> Dict:
+        """
+        获取完整结果表及其对应的增量序号（SSE客户端首次连接或无法续传时使用）
+        
+        Returns:
+            {'seq': 序号, 'snapshot_time': 时间, 'rows': 有数据的套利结果列表}
+        """
+        with self._lock:
+            return {
+                'seq': self.seq,
+                'snapshot_time': self.snapshot_time,
+                'rows': [result for result in self._table.values() if result is not None],
+            }
+    
+    def wait_for_deltas(self, after_seq: int, timeout: float = None) -> Optional[List[Dict]]:
+        """
+        等待序号after_seq之后的增量
+        
+        Args:
+            after_seq: 客户端已收到的最后一个序号
+            timeout: 最长等待时间（秒），超时返回空列表
+        
+        Returns:
+            增量列表（按序号递增）；after_seq过旧、增量已被丢弃时返回None，客户端需要重新拉全量
+        """
+        with self._changed:
+            if after_seq == self.seq:
+                self._changed.wait(timeout)
+            if after_seq > self.seq:
+                return None
+            if after_seq == self.seq:
+                return []
+            if not self._deltas or self._deltas[0]['seq'] > after_seq + 1:
+                return None
+            return [delta for delta in self._deltas if delta['seq'] > after_seq]
+    
+    def _append_delta(self, delta: Dict):
+        """记录一条增量并唤醒等待的客户端（调用方需持有锁）"""
+        self.seq += 1
+        delta['seq'] = self.seq
+        delta['snapshot_time'] = self.snapshot_time
+        self._deltas.append(delta)
+        self._changed.notify_all()
+    
+    @staticmethod
+    def _diff(previous: Dict[str, Optional[Dict]], table: Dict[str, Optional[Dict]]) -> Tuple[List[Dict], List[str]]:
+        """
+        比较两轮扫描结果
+        
+        Returns:
+            (新增或 DELTA_FIELDS、限购内容有变化的结果列表, 本轮没有数据的基金代码列表)
+        """
+        rows = []
+        removed = []
+        for fund_code, result in table.items():
+            old = previous.get(fund_code)
+            if result is None:
+                if old is not None:
+                    removed.append(fund_code)
+            elif old is None or MarketPoller._row_changed(old, result):
+                rows.append(result)
+        for fund_code, old in previous.items():
+            if old is not None and fund_code not in table:
+                removed.append(fund_code)
+        return rows, removed
+    
+    @staticmethod
+    def _row_changed(old: Dict, new: Dict) -> bool:
+        """一行结果是否有需要推送的变化"""
+        if any(old.get(field) != new.get(field) for field in DELTA_FIELDS):
+            return True
+        old_limit = old.get('purchase_limit') or {}
+        new_limit = new.get('purchase_limit') or {}
+        return any(old_limit.get(field) != new_limit.get(field) for field in PURCHASE_LIMIT_FIELDS)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            started = datetime.now()
+            self._wake.clear()
+            try:
+                self.scan_once()
+            except Exception as e:
+                print(f"后台轮询失败: {e}")
+            
+            interval = max(1, self.interval_func(started))
+            self._wake.wait(interval)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+净值本地存储模块
+基金净值每个交易日只公布一次，已公布的净值保存在本地SQLite中，
+重启或晚间重复扫描时不再请求上游
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, date
+from typing import Dict, Optional
+
+
+class NavStore:
+    """基金净值本地存储（按 基金代码 + 净值日期 保存）"""
+    
+    def __init__(self, db_file: str = "nav_store.db", publish_hour: int = 21,
+                 recheck_interval: int = 1800, calendar=None):
+        """
+        初始化净值存储
+        
+        Args:
+            db_file: SQLite数据库文件路径
+            publish_hour: 当日净值的预计公布时间（小时），此时间之后才认为当天净值应已公布
+            recheck_interval: 已存净值未达到预期日期时，两次上游检查的最小间隔（秒），
+                              避免QDII、节假日等净值延迟公布的基金被反复请求
+            calendar: 交易日历（TradingCalendar），None时只跳过周末
+        """
+        self.db_file = db_file
+        self.publish_hour = publish_hour
+        self.recheck_interval = recheck_interval
+        self.calendar = calendar
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._init_db()
+    
+    def _init_db(self):
+        """创建数据表"""
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS fund_nav (
+                    fund_code TEXT NOT NULL,
+                    nav_date TEXT NOT NULL,
+                    nav REAL NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (fund_code, nav_date)
+                )
+            """)
+            # 每只基金最近一次上游检查时间（无论是否拿到新净值）
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS nav_check (
+                    fund_code TEXT PRIMARY KEY,
+                    checked_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+    
+    def get_latest(self, fund_code: str) -> Optional[Dict]:
+        """
+        获取基金最新的已存净值
+        
+        Returns:
+            与 get_fund_nav 相同格式的字典（code, nav, date, update_time），没有记录返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT nav_date, nav, fetched_at FROM fund_nav WHERE fund_code = ? "
+                "ORDER BY nav_date DESC LIMIT 1",
+                (fund_code,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'code': fund_code,
+            'nav': row[1],
+            'date': row[0],
+            'update_time': datetime.fromtimestamp(row[2]).strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
+    def save(self, nav_info: Dict):
+        """保存一条净值（同一基金同一日期重复保存时覆盖），同时记录检查时间"""
+        if not nav_info or not nav_info.get('date'):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fund_nav (fund_code, nav_date, nav, fetched_at) VALUES (?, ?, ?, ?)",
+                (nav_info['code'], nav_info['date'], float(nav_info['nav']), now)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nav_check (fund_code, checked_at) VALUES (?, ?)",
+                (nav_info['code'], now)
+            )
+            self._conn.commit()
+    
+    def mark_checked(self, fund_code: str):
+        """记录一次上游检查（未获取到新净值时调用）"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nav_check (fund_code, checked_at) VALUES (?, ?)",
+                (fund_code, time.time())
+            )
+            self._conn.commit()
+    
+    def expected_nav_date(self, now: datetime = None) -> date:
+        """
+        计算当前时间应能取到的最新净值日期
+        
+        公布时间之后为当天，否则为前一个交易日（未配置交易日历时只跳过周末）
+        """
+        now = now or datetime.now()
+        if self.calendar is not None:
+            return self.calendar.latest_nav_date(now, self.publish_hour)
+        expected = now.date()
+        if now.hour < self.publish_hour:
+            expected -= timedelta(days=1)
+        while expected.weekday() >= 5:
+            expected -= timedelta(days=1)
+        return expected
+    
+    def needs_refresh(self, fund_code: str, stored: Optional[Dict]) -> bool:
+        """
+        判断是否需要请求上游
+        
+        已存净值日期不早于预期公布日期时不需要；否则距上次检查超过 recheck_interval 才需要
+        """
+        if stored is None:
+            return True
+        try:
+            stored_date = datetime.strptime(stored['date'], '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            return True
+        if stored_date >= self.expected_nav_date():
+            return False
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT checked_at FROM nav_check WHERE fund_code = ?",
+                (fund_code,)
+            ).fetchone()
+        return row is None or time.time() - row[0] >= self.recheck_interval
+    
+    def count(self) -> int:
+        """已存净值条数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fund_nav").fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
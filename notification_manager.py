@@ -4,10 +4,15 @@
 处理站内信通知的创建、存储和管理
 """
 
+import atexit
 import json
 import os
+import threading
+import time
+from collections import deque
+from itertools import islice
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 
 class NotificationType:
@@ -20,41 +25,211 @@ class NotificationType:
 
 
 class NotificationManager:
-    """通知管理器"""
+    """通知管理器
     
-    def __init__(self, data_file: str = "notifications.json"):
+    内存中按用户保存通知（deque，新通知在最前面）；每次变更只向日志文件追加一行，
+    由后台线程合并写入（一批变更一次fsync），日志达到一定条数后写一次完整快照并清空日志
+    """
+    
+    def __init__(self, data_file: str = "notifications.json", journal_file: str = "notifications.journal",
+                 max_per_user: int = 500, compact_threshold: int = 1000, flush_delay: float = 0.05):
         """
         初始化通知管理器
         
         Args:
-            data_file: 通知数据文件路径
+            data_file: 通知快照文件路径
+            journal_file: 变更日志文件路径（每行一条JSON）
+            max_per_user: 每个用户最多保留的通知数
+            compact_threshold: 日志累计多少条后压缩为快照
+            flush_delay: 收到变更后等待多久再写盘（秒），期间的变更合并为一次写入
         """
         self.data_file = data_file
-        self.notifications = self._load_notifications()
+        self.journal_file = journal_file
+        self.max_per_user = max_per_user
+        self.compact_threshold = compact_threshold
+        self.flush_delay = flush_delay
+        
+        self._lock = threading.RLock()
+        self._pending_cond = threading.Condition(self._lock)
+        # 写盘锁：保证各批日志按顺序写入，写盘期间不阻塞创建通知
+        self._io_lock = threading.Lock()
+        # 已分配的最大日志序号、已写入快照的日志序号、日志文件中的条数
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._journal_count = 0
+        # 尚未写盘的日志行
+        self._pending: List[str] = []
+        self._writer: Optional[threading.Thread] = None
+        
+        self.notifications: Dict[str, deque] = {}
+        # 用户名 -> 未读通知数（随每次变更增量维护）
+        self._unread: Dict[str, int] = {}
+        # (用户名, 通知类型, 基金代码) -> 最近一次通知的时间戳，用于去重
+        self._last_notified: Dict[Tuple[str, str, str], float] = {}
+        self._load_notifications()
+        atexit.register(self.flush)
     
-    def _load_notifications(self) -> Dict[str, List[Dict]]:
-        """加载通知数据（按用户组织）"""
+    def _load_notifications(self):
+        """加载快照并重放日志"""
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    data = json.load(f)
+                if '_journal_seq' in data:
+                    self._snapshot_seq = data['_journal_seq']
+                    data = data.get('users', {})
+                # 旧版文件直接是 {用户名: 通知列表}
+                for username, notifications in data.items():
+                    self.notifications[username] = deque(notifications[:self.max_per_user],
+                                                         maxlen=self.max_per_user)
+                    self._unread[username] = sum(1 for n in self.notifications[username] if not n.get('read', False))
+                    for notification in reversed(self.notifications[username]):
+                        self._index_notification(username, notification)
             except Exception as e:
                 print(f"加载通知数据失败: {e}")
-                return {}
-        return {}
+        self._seq = self._snapshot_seq
+        
+        if not os.path.exists(self.journal_file):
+            return
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 最后一行可能在写入时中断
+                        break
+                    self._journal_count += 1
+                    if entry['seq'] <= self._snapshot_seq:
+                        continue
+                    self._apply(entry)
+                    self._seq = entry['seq']
+        except Exception as e:
+            print(f"重放通知日志失败: {e}")
     
-    def _save_notifications(self):
-        """保存通知数据"""
+    def _index_notification(self, username: str, notification: Dict):
+        """登记带基金代码的通知的时间，供 should_notify 去重"""
+        fund_code = (notification.get('data') or {}).get('fund_code')
+        if not fund_code:
+            return
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.notifications, f, ensure_ascii=False, indent=2)
+            notified_at = datetime.fromisoformat(notification['created_at']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return
+        key = (username, notification.get('type'), fund_code)
+        if notified_at > self._last_notified.get(key, 0):
+            self._last_notified[key] = notified_at
+    
+    def _apply(self, entry: Dict):
+        """把一条日志应用到内存数据（同时维护未读计数和去重索引）"""
+        op = entry['op']
+        username = entry['user']
+        notifications = self._get_user_notifications(username)
+        unread = self._unread.get(username, 0)
+        if op == 'create':
+            # 达到上限时最旧的一条会被挤出
+            if len(notifications) == notifications.maxlen and not notifications[-1].get('read', False):
+                unread -= 1
+            notification = entry['notification']
+            notifications.appendleft(notification)
+            if not notification.get('read', False):
+                unread += 1
+            self._index_notification(username, notification)
+        elif op == 'read':
+            for notification in notifications:
+                if notification['id'] == entry['id']:
+                    if not notification.get('read', False):
+                        unread -= 1
+                    notification['read'] = True
+                    notification['read_at'] = entry['at']
+                    break
+        elif op == 'read_all':
+            for notification in notifications:
+                if not notification.get('read', False):
+                    notification['read'] = True
+                    notification['read_at'] = entry['at']
+            unread = 0
+        elif op == 'delete':
+            for notification in notifications:
+                if notification['id'] == entry['id']:
+                    if not notification.get('read', False):
+                        unread -= 1
+                    notifications.remove(notification)
+                    break
+        elif op == 'delete_read':
+            kept = [n for n in notifications if not n.get('read', False)]
+            notifications.clear()
+            notifications.extend(kept)
+        self._unread[username] = unread
+    
+    def _commit(self, entry: Dict):
+        """应用一条变更并登记到待写日志（调用方需持有锁）"""
+        self._seq += 1
+        entry['seq'] = self._seq
+        self._apply(entry)
+        self._pending.append(json.dumps(entry, ensure_ascii=False))
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run_writer, name='notification-journal', daemon=True)
+            self._writer.start()
+        self._pending_cond.notify()
+    
+    def _run_writer(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._pending_cond.wait()
+            # 等一小段时间，把一批通知合并为一次写入
+            time.sleep(self.flush_delay)
+            self.flush()
+    
+    def flush(self):
+        """把待写日志写盘（一次fsync），日志过长时压缩为快照"""
+        with self._io_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return
+            try:
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                print(f"写入通知日志失败: {e}")
+                with self._lock:
+                    self._pending = lines + self._pending
+                return
+            self._journal_count += len(lines)
+            if self._journal_count >= self.compact_threshold:
+                self._save_snapshot()
+    
+    def _save_snapshot(self):
+        """写完整快照（先写临时文件再替换）并清空日志（调用方需持有写盘锁）"""
+        with self._lock:
+            # 快照包含到当前序号为止的全部变更，之后追加的日志序号更大，重放时不会重复
+            seq = self._seq
+            content = json.dumps({
+                '_journal_seq': seq,
+                'users': {username: list(notifications) for username, notifications in self.notifications.items()}
+            }, ensure_ascii=False)
+        tmp_file = self.data_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.data_file)
+            # 替换后、清空前退出也没关系：重放时按序号跳过快照已包含的日志
+            open(self.journal_file, 'w').close()
+            self._snapshot_seq = seq
+            self._journal_count = 0
         except Exception as e:
-            print(f"保存通知数据失败: {e}")
+            print(f"保存通知快照失败: {e}")
     
-    def _get_user_notifications(self, username: str) -> List[Dict]:
+    def _get_user_notifications(self, username: str) -> deque:
         """获取用户的通知列表"""
         if username not in self.notifications:
-            self.notifications[username] = []
+            self.notifications[username] = deque(maxlen=self.max_per_user)
         return self.notifications[username]
     
     def create_notification(self, username: str, notification_type: str, title: str, 
@@ -68,7 +243,7 @@ class NotificationManager:
             title: 通知标题
             content: 通知内容
             data: 附加数据
-            
+        
         Returns:
             通知ID
         """
@@ -86,15 +261,44 @@ class NotificationManager:
             'read_at': None
         }
         
-        user_notifications = self._get_user_notifications(username)
-        user_notifications.insert(0, notification)  # 新通知插入到最前面
+        # 新通知插入到最前面，超过每个用户的上限时最旧的自动丢弃
+        with self._lock:
+            self._commit({'op': 'create', 'user': username, 'notification': notification})
+        return notification_id
+    
+    def create_notifications(self, usernames: List[str], notification_type: str, title: str,
+                             content: str, data: Dict = None) -> List[str]:
+        """
+        为多个用户创建同一条通知（一次加锁，日志合并写入）
         
-        # 限制每个用户最多保留500条通知
-        if len(user_notifications) > 500:
-            user_notifications[:] = user_notifications[:500]
+        Args:
+            usernames: 用户名列表
+            notification_type: 通知类型
+            title: 通知标题
+            content: 通知内容
+            data: 附加数据
         
-        self._save_notifications()
-        return notification_id
+        Returns:
+            通知ID列表（与 usernames 顺序一致）
+        """
+        import uuid
+        created_at = datetime.now().isoformat()
+        notification_ids = []
+        with self._lock:
+            for username in usernames:
+                notification_id = str(uuid.uuid4())
+                self._commit({'op': 'create', 'user': username, 'notification': {
+                    'id': notification_id,
+                    'type': notification_type,
+                    'title': title,
+                    'content': content,
+                    'data': dict(data or {}),
+                    'read': False,
+                    'created_at': created_at,
+                    'read_at': None
+                }})
+                notification_ids.append(notification_id)
+        return notification_ids
     
     def get_notifications(self, username: str, unread_only: bool = False, 
                          limit: int = None) -> List[Dict]:
@@ -105,19 +309,17 @@ class NotificationManager:
             username: 用户名
             unread_only: 是否只获取未读通知
             limit: 限制返回数量
-            
+        
         Returns:
             通知列表
         """
-        notifications = self._get_user_notifications(username)
-        
-        if unread_only:
-            notifications = [n for n in notifications if not n.get('read', False)]
-        
-        if limit:
-            notifications = notifications[:limit]
-        
-        return notifications
+        with self._lock:
+            notifications = iter(self._get_user_notifications(username))
+            
+            if unread_only:
+                notifications = (n for n in notifications if not n.get('read', False))
+            
+            return list(islice(notifications, limit or None))
     
     def get_unread_count(self, username: str) -> int:
         """
@@ -125,12 +327,28 @@ class NotificationManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             未读通知数量
         """
-        notifications = self._get_user_notifications(username)
-        return sum(1 for n in notifications if not n.get('read', False))
+        return self._unread.get(username, 0)
+    
+    def should_notify(self, username: str, fund_code: str, window: float = 300,
+                      notification_type: str = NotificationType.ARBITRAGE_OPPORTUNITY) -> bool:
+        """
+        是否应该发送通知（同一用户、同一类型、同一基金在时间窗口内只通知一次）
+        
+        Args:
+            username: 用户名
+            fund_code: 基金代码
+            window: 去重时间窗口（秒）
+            notification_type: 通知类型
+        
+        Returns:
+            窗口内没有通知过返回True
+        """
+        last = self._last_notified.get((username, notification_type, fund_code))
+        return last is None or time.time() - last >= window
     
     def mark_as_read(self, username: str, notification_id: str) -> bool:
         """
@@ -139,18 +357,17 @@ class NotificationManager:
         Args:
             username: 用户名
             notification_id: 通知ID
-            
+        
         Returns:
             是否成功
         """
-        notifications = self._get_user_notifications(username)
-        for notification in notifications:
-            if notification['id'] == notification_id:
-                notification['read'] = True
-                notification['read_at'] = datetime.now().isoformat()
-                self._save_notifications()
-                return True
-        return False
+        with self._lock:
+            notifications = self._get_user_notifications(username)
+            if not any(n['id'] == notification_id for n in notifications):
+                return False
+            self._commit({'op': 'read', 'user': username, 'id': notification_id,
+                          'at': datetime.now().isoformat()})
+            return True
     
     def mark_all_as_read(self, username: str) -> bool:
         """
@@ -158,21 +375,15 @@ class NotificationManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             是否成功
         """
-        notifications = self._get_user_notifications(username)
-        updated = False
-        for notification in notifications:
-            if not notification.get('read', False):
-                notification['read'] = True
-                notification['read_at'] = datetime.now().isoformat()
-                updated = True
-        
-        if updated:
-            self._save_notifications()
-        return updated
+        with self._lock:
+            updated = self._unread.get(username, 0) > 0
+            if updated:
+                self._commit({'op': 'read_all', 'user': username, 'at': datetime.now().isoformat()})
+            return updated
     
     def delete_notification(self, username: str, notification_id: str) -> bool:
         """
@@ -181,17 +392,16 @@ class NotificationManager:
         Args:
             username: 用户名
             notification_id: 通知ID
-            
+        
         Returns:
             是否成功
         """
-        notifications = self._get_user_notifications(username)
-        for i, notification in enumerate(notifications):
-            if notification['id'] == notification_id:
-                notifications.pop(i)
-                self._save_notifications()
-                return True
-        return False
+        with self._lock:
+            notifications = self._get_user_notifications(username)
+            if not any(n['id'] == notification_id for n in notifications):
+                return False
+            self._commit({'op': 'delete', 'user': username, 'id': notification_id})
+            return True
     
     def delete_all_read(self, username: str) -> int:
         """
@@ -199,16 +409,13 @@ class NotificationManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             删除的数量
         """
-        notifications = self._get_user_notifications(username)
-        original_count = len(notifications)
-        notifications[:] = [n for n in notifications if not n.get('read', False)]
-        deleted_count = original_count - len(notifications)
-        
-        if deleted_count > 0:
-            self._save_notifications()
-        
-        return deleted_count
+        with self._lock:
+            notifications = self._get_user_notifications(username)
+            deleted_count = sum(1 for n in notifications if n.get('read', False))
+            if deleted_count > 0:
+                self._commit({'op': 'delete_read', 'user': username})
+            return deleted_count
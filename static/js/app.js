@@ -1,6 +1,7 @@
 // LOF基金套利工具 - 前端JavaScript
 
 let autoRefreshInterval = null;
+let fundStream = null; // SSE增量推送连接（自动刷新时优先使用）
 let updateInterval = 60; // 默认60秒
 let favoriteFunds = new Set(); // 自选基金集合
 let showFavoritesOnly = false; // 是否只显示自选基金
@@ -466,9 +467,6 @@ async function loadFunds() {
                 log(`成功加载 ${allResults.length}/${fundCodes.length} 只基金数据`, 'success');
             }
             updateLastUpdateTime();
-            
-            // 异步获取限购信息（不阻塞显示，后台更新）
-            updatePurchaseLimitsAsync(allResults.map(f => f.fund_code));
         } else {
             throw new Error('未能加载任何基金数据');
         }
@@ -526,7 +524,9 @@ function displayFunds(funds) {
         
         // 格式化限购信息
         let purchaseLimitDisplay = '<span style="color: #4CAF50;">不限</span>';
-        if (fund.purchase_limit && fund.purchase_limit.is_limited && fund.purchase_limit.limit_amount) {
+        if (fund.purchase_limit && fund.purchase_limit.is_limited && fund.purchase_limit.limit_amount === 0) {
+            purchaseLimitDisplay = `<span style="color: #f44336;">${fund.purchase_limit.limit_desc || '暂停'}</span>`;
+        } else if (fund.purchase_limit && fund.purchase_limit.is_limited && fund.purchase_limit.limit_amount) {
             const amount = fund.purchase_limit.limit_amount;
             const display = amount >= 10000 ? 
                 (amount / 10000).toFixed(1) + '万' : 
@@ -550,7 +550,7 @@ function displayFunds(funds) {
                 <td class="${fund.price_diff_pct >= 0 ? 'positive' : 'negative'}">${fund.price_diff_pct >= 0 ? '+' : ''}${fund.price_diff_pct.toFixed(2)}%</td>
                 <td><span class="arbitrage-type ${typeClass}">${fund.arbitrage_type}</span></td>
                 <td class="profit-rate ${profitClass}">${profitSign}${fund.profit_rate.toFixed(2)}%</td>
-                <td style="font-size: 12px; white-space: nowrap;">${purchaseLimitDisplay}</td>
+                <td style="font-size: 12px; white-space: nowrap;" title="${fund.limit_as_of ? '限购数据时间: ' + fund.limit_as_of : ''}">${purchaseLimitDisplay}</td>
                 <td><span class="status-badge ${statusClass}">${statusText}</span></td>
                 <td>
                     <button class="btn btn-small btn-secondary" onclick="showDetail('${fund.fund_code}')" style="margin-right: 5px;">详情</button>
@@ -746,7 +746,8 @@ function updateLastUpdateTime() {
 function toggleAutoRefresh() {
     const btn = document.getElementById('autoRefreshBtn');
     
-    if (autoRefreshInterval) {
+    if (autoRefreshInterval || fundStream) {
+        stopFundStream();
         clearInterval(autoRefreshInterval);
         autoRefreshInterval = null;
         btn.textContent = '自动刷新';
@@ -754,11 +755,55 @@ function toggleAutoRefresh() {
         btn.classList.add('btn-secondary');
         log('已停止自动刷新', 'info');
     } else {
-        autoRefreshInterval = setInterval(loadFunds, updateInterval * 1000);
         btn.textContent = '停止刷新';
         btn.classList.remove('btn-secondary');
         btn.classList.add('btn-primary');
-        log(`已开启自动刷新 (间隔: ${updateInterval}秒)`, 'success');
+        if (window.EventSource) {
+            startFundStream();
+            log('已开启自动刷新 (服务端推送变化)', 'success');
+        } else {
+            autoRefreshInterval = setInterval(loadFunds, updateInterval * 1000);
+            log(`已开启自动刷新 (间隔: ${updateInterval}秒)`, 'success');
+        }
+    }
+}
+
+// 订阅套利结果增量推送（只接收有变化的行，断线后浏览器自动携带Last-Event-ID续传）
+function startFundStream() {
+    fundStream = new EventSource('/api/funds/stream');
+    
+    // 完整结果表（首次连接或无法续传时）
+    fundStream.addEventListener('snapshot', (event) => {
+        const snapshot = JSON.parse(event.data);
+        displayFunds(snapshot.rows);
+        updateLastUpdateTime();
+    });
+    
+    // 增量：替换变化的行，移除没有数据的基金
+    fundStream.addEventListener('delta', (event) => {
+        const delta = JSON.parse(event.data);
+        const rows = new Map(delta.reset ? [] : allFundsData.map(fund => [fund.fund_code, fund]));
+        delta.rows.forEach(fund => rows.set(fund.fund_code, fund));
+        delta.removed.forEach(code => rows.delete(code));
+        displayFunds(Array.from(rows.values()));
+        updateLastUpdateTime();
+    });
+    
+    fundStream.onerror = () => {
+        // 服务端不支持推送（如未开启后台轮询）时连接会被关闭，回退到定时刷新
+        if (fundStream && fundStream.readyState === EventSource.CLOSED) {
+            stopFundStream();
+            autoRefreshInterval = setInterval(loadFunds, updateInterval * 1000);
+            log(`服务端推送不可用，改为定时刷新 (间隔: ${updateInterval}秒)`, 'warning');
+        }
+    };
+}
+
+// 关闭增量推送连接
+function stopFundStream() {
+    if (fundStream) {
+        fundStream.close();
+        fundStream = null;
     }
 }
 
@@ -1160,60 +1205,6 @@ async function deleteUser(username) {
 }
 
 // 切换模拟数据模式
-// 异步更新限购信息（不阻塞主流程）
-async function updatePurchaseLimitsAsync(fundCodes) {
-    if (!fundCodes || fundCodes.length === 0) return;
-    
-    try {
-        // #region agent log
-        fetch('http://127.0.0.1:7243/ingest/c359bf7a-79f8-4b93-af0b-f5a5dba44447',{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify({location:'app.js:updatePurchaseLimitsAsync:entry',message:'开始异步获取限购信息',data:{fund_codes_count:fundCodes.length},timestamp:Date.now(),sessionId:'debug-session'})}).catch(()=>{});
-        // #endregion
-        
-        // 分批获取限购信息（每批100只）
-        const batchSize = 100;
-        for (let i = 0; i < fundCodes.length; i += batchSize) {
-            const batch = fundCodes.slice(i, i + batchSize);
-            try {
-                const response = await fetch('/api/funds/purchase-limits', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ codes: batch })
-                });
-                const result = await response.json();
-                
-                if (result.success && result.limits) {
-                    // 更新已显示的基金数据
-                    if (typeof allFundsData !== 'undefined' && allFundsData.length > 0) {
-                        const fundsToUpdate = allFundsData.filter(f => batch.includes(f.fund_code));
-                        fundsToUpdate.forEach(fund => {
-                            if (result.limits[fund.fund_code]) {
-                                fund.purchase_limit = result.limits[fund.fund_code];
-                            }
-                        });
-                        
-                        // 重新显示更新后的数据（只更新一次，避免频繁刷新）
-                        if (i === 0 || i + batchSize >= fundCodes.length) {
-                            displayFunds(allFundsData);
-                        }
-                    }
-                }
-            } catch (error) {
-                // 单批失败不影响其他批次
-                console.error(`批量 ${Math.floor(i / batchSize) + 1} 限购信息获取失败:`, error);
-            }
-        }
-        
-        // 最终更新显示
-        if (typeof allFundsData !== 'undefined' && allFundsData.length > 0) {
-            displayFunds(allFundsData);
-        }
-        log(`限购信息更新完成`, 'info');
-    } catch (error) {
-        console.error('异步获取限购信息失败:', error);
-        // 不显示错误给用户，因为这是后台操作
-    }
-}
-
 async function toggleMockMode() {
     const checked = document.getElementById('mockModeToggle').checked;
     
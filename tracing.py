@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+调试追踪模块
+trace() 只把记录追加到内存环形缓冲区，由后台线程批量写入文件；
+级别关闭时直接返回，几乎没有开销
+"""
+
+import atexit
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import DATA_SOURCE
+
+
+# 追踪级别：数值越大记录越详细
+TRACE_LEVELS = {
+    'off': 0,
+    'error': 1,
+    'info': 2,
+    'debug': 3,
+}
+
+
+class Tracer:
+    """带环形缓冲区和后台刷盘线程的追踪器"""
+    
+    def __init__(self, level: str = 'off', log_file: Optional[str] = 'trace.log',
+                 buffer_size: int = 10000, flush_interval: float = 2.0):
+        """
+        初始化追踪器
+        
+        Args:
+            level: 追踪级别（off/error/info/debug）
+            log_file: 输出文件路径，None表示只保留在内存中
+            buffer_size: 环形缓冲区容量，超出后丢弃最旧的记录
+            flush_interval: 后台刷盘间隔（秒）
+        """
+        self.log_file = log_file
+        self.flush_interval = flush_interval
+        self._level = TRACE_LEVELS.get(level, 0)
+        # deque.append / popleft 是原子操作，trace() 不需要加锁
+        self._buffer = deque(maxlen=buffer_size)
+        # 最近的记录（供管理接口查看），同样是环形缓冲区
+        self._recent = deque(maxlen=min(buffer_size, 500))
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def level(self) -> str:
+        for name, value in TRACE_LEVELS.items():
+            if value == self._level:
+                return name
+        return 'off'
+    
+    def set_level(self, level: str):
+        """切换追踪级别（运行时生效）"""
+        if level not in TRACE_LEVELS:
+            raise ValueError(f"未知的追踪级别: {level}")
+        self._level = TRACE_LEVELS[level]
+        if self._level:
+            self._ensure_flusher()
+    
+    def enabled(self, level: str = 'debug') -> bool:
+        """指定级别是否会被记录（构造追踪数据开销较大时先判断）"""
+        return self._level >= TRACE_LEVELS.get(level, 3)
+    
+    def trace(self, location: str, message: str, data: Dict = None, level: str = 'debug'):
+        """
+        记录一条追踪信息
+        
+        Args:
+            location: 代码位置，如 'data_fetcher.py:get_fund_info:entry'
+            message: 说明
+            data: 附加数据
+            level: 级别（error/info/debug）
+        """
+        if self._level < TRACE_LEVELS.get(level, 3):
+            return
+        record = {
+            'timestamp': int(time.time() * 1000),
+            'level': level,
+            'location': location,
+            'message': message,
+            'data': data,
+            'thread': threading.current_thread().name,
+        }
+        self._buffer.append(record)
+        self._recent.append(record)
+        if self._thread is None:
+            self._ensure_flusher()
+    
+    def recent(self, limit: int = 100) -> List[Dict]:
+        """获取最近的追踪记录（新的在前）"""
+        records = list(self._recent)
+        records.reverse()
+        return records[:limit]
+    
+    def flush(self):
+        """把缓冲区中的记录写入文件"""
+        with self._flush_lock:
+            records = []
+            while True:
+                try:
+                    records.append(self._buffer.popleft())
+                except IndexError:
+                    break
+            if not records or not self.log_file:
+                return
+            try:
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(record, ensure_ascii=False, default=str) + '\n'
+                                    for record in records))
+            except Exception as e:
+                print(f"写入追踪日志失败: {e}")
+    
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._flush_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='trace-flusher', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+def _create_tracer() -> Tracer:
+    config = DATA_SOURCE.get('tracing', {})
+    return Tracer(
+        level=config.get('level', 'off'),
+        log_file=config.get('log_file', 'trace.log'),
+        buffer_size=config.get('buffer_size', 10000),
+        flush_interval=config.get('flush_interval', 2.0)
+    )
+
+
+# 全局追踪器（进程退出前把缓冲区剩余记录写入文件）
+tracer = _create_tracer()
+atexit.register(tracer.flush)
+
+
+def trace(location: str, message: str, data: Dict = None, level: str = 'debug'):
+    """记录一条追踪信息（级别关闭时立即返回）"""
+    if tracer._level < TRACE_LEVELS.get(level, 3):
+        return
+    tracer.trace(location, message, data, level)
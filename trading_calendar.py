@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+交易日历与调度模块
+根据沪深交易所的交易时段和节假日决定下一次抓取时间：
+盘中按配置间隔刷新（开盘、收盘前后加快），收盘后抓取一次收盘价，
+净值公布后抓取一次净值，其余时间空闲到下一个交易时段
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, date, time as dtime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import DATA_SOURCE
+
+
+# 沪深交易所连续竞价时段（上午、下午）
+DEFAULT_SESSIONS = ((dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0)))
+
+
+class TradingCalendar:
+    """A股交易日历（周末 + 本地节假日文件，可从Tushare trade_cal 导入）"""
+    
+    def __init__(self, calendar_file: Optional[str] = 'trading_calendar.json',
+                 sessions: Tuple[Tuple[dtime, dtime], ...] = DEFAULT_SESSIONS):
+        """
+        初始化交易日历
+        
+        Args:
+            calendar_file: 节假日文件路径（JSON：{"holidays": ["2026-01-01", ...], "years": [2026]}），
+                           None或文件不存在时只把周末当作休市日
+            sessions: 交易时段列表
+        """
+        self.calendar_file = calendar_file
+        self.sessions = sessions
+        self._lock = threading.Lock()
+        # 工作日中的休市日期
+        self._holidays: Set[date] = set()
+        # 节假日数据已覆盖的年份
+        self._years: Set[int] = set()
+        self.load()
+    
+    def load(self):
+        """从本地文件加载节假日"""
+        if not self.calendar_file or not os.path.exists(self.calendar_file):
+            return
+        try:
+            with open(self.calendar_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            holidays = {datetime.strptime(day, '%Y-%m-%d').date() for day in data.get('holidays', [])}
+            years = set(data.get('years', [])) or {day.year for day in holidays}
+            with self._lock:
+                self._holidays = holidays
+                self._years = years
+        except Exception as e:
+            print(f"加载交易日历失败: {e}")
+    
+    def save(self):
+        """保存节假日到本地文件"""
+        if not self.calendar_file:
+            return
+        with self._lock:
+            data = {
+                'holidays': sorted(day.strftime('%Y-%m-%d') for day in self._holidays),
+                'years': sorted(self._years),
+            }
+        try:
+            with open(self.calendar_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"保存交易日历失败: {e}")
+    
+    def covers(self, year: int) -> bool:
+        """节假日数据是否已覆盖指定年份"""
+        return year in self._years
+    
+    def seed_from_tushare(self, pro, years: List[int] = None) -> bool:
+        """
+        从Tushare trade_cal 导入休市日并保存到本地文件
+        
+        Args:
+            pro: tushare.pro_api() 返回的接口对象
+            years: 要导入的年份，默认今年和明年
+        
+        Returns:
+            是否导入成功
+        """
+        years = years or [date.today().year, date.today().year + 1]
+        try:
+            df = pro.trade_cal(exchange='SSE', start_date=f'{min(years)}0101', end_date=f'{max(years)}1231',
+                               fields='cal_date,is_open')
+        except Exception as e:
+            print(f"从Tushare获取交易日历失败: {e}")
+            return False
+        if df is None or df.empty:
+            return False
+        
+        holidays = set()
+        covered = set()
+        for cal_date, is_open in zip(df['cal_date'], df['is_open']):
+            day = datetime.strptime(str(cal_date), '%Y%m%d').date()
+            covered.add(day.year)
+            if int(is_open) == 0 and day.weekday() < 5:
+                holidays.add(day)
+        with self._lock:
+            self._holidays = {day for day in self._holidays if day.year not in covered} | holidays
+            self._years |= covered
+        self.save()
+        print(f"交易日历已更新：{sorted(covered)}，休市日 {len(holidays)} 天")
+        return True
+    
+    def is_trading_day(self, day: date) -> bool:
+        """是否为交易日"""
+        return day.weekday() < 5 and day not in self._holidays
+    
+    def previous_trading_day(self, day: date) -> date:
+        """day之前（不含）最近的交易日"""
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+    
+    def next_trading_day(self, day: date) -> date:
+        """day之后（不含）最近的交易日"""
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+    
+    def is_trading_time(self, now: datetime = None) -> bool:
+        """当前是否处于交易时段"""
+        now = now or datetime.now()
+        if not self.is_trading_day(now.date()):
+            return False
+        current = now.time()
+        return any(start <= current < end for start, end in self.sessions)
+    
+    def session_open(self, day: date) -> datetime:
+        """交易日的开盘时间"""
+        return datetime.combine(day, self.sessions[0][0])
+    
+    def session_close(self, day: date) -> datetime:
+        """交易日的收盘时间"""
+        return datetime.combine(day, self.sessions[-1][1])
+    
+    def next_session_start(self, now: datetime = None) -> datetime:
+        """下一个交易时段的开始时间（当前处于交易时段时返回当前时段的开始时间）"""
+        now = now or datetime.now()
+        day = now.date()
+        if self.is_trading_day(day):
+            for start, end in self.sessions:
+                if now.time() < end:
+                    return datetime.combine(day, start)
+        return self.session_open(self.next_trading_day(day))
+    
+    def latest_nav_date(self, now: datetime = None, publish_hour: int = 21) -> date:
+        """
+        当前时间应能取到的最新净值日期
+        
+        交易日公布时间之后为当天，否则为上一个交易日
+        """
+        now = now or datetime.now()
+        day = now.date()
+        if self.is_trading_day(day) and now.hour >= publish_hour:
+            return day
+        return self.previous_trading_day(day)
+
+
+class TradingScheduler:
+    """按交易日历计算下一次抓取的等待时间"""
+    
+    def __init__(self, calendar: TradingCalendar, config: Dict = None):
+        """
+        初始化调度器
+        
+        Args:
+            calendar: 交易日历
+            config: DATA_SOURCE['trading_schedule'] 配置，格式：
+                {
+                    'enabled': True,
+                    'fast_interval': 10,       # 开盘、收盘前后的刷新间隔（秒）
+                    'edge_minutes': 5,         # 开盘后、收盘前多少分钟内使用 fast_interval
+                    'post_close_delay': 120,   # 收盘后多久抓取一次收盘价（秒）
+                    'nav_fetch_hour': 21,      # 交易日晚间抓取当日净值的时间（时）
+                    'pre_open_seconds': 60,    # 开盘前多久醒来（秒）
+                }
+        """
+        config = config or {}
+        self.calendar = calendar
+        self.enabled = config.get('enabled', True)
+        self.fast_interval = config.get('fast_interval', 10)
+        self.edge = timedelta(minutes=config.get('edge_minutes', 5))
+        self.post_close_delay = timedelta(seconds=config.get('post_close_delay', 120))
+        self.nav_fetch_hour = config.get('nav_fetch_hour', 21)
+        self.pre_open = timedelta(seconds=config.get('pre_open_seconds', 60))
+    
+    def next_delay(self, interval: float, now: datetime = None, started: datetime = None) -> float:
+        """
+        距下一次抓取的秒数
+        
+        Args:
+            interval: 盘中的基础刷新间隔（秒）
+            now: 当前时间
+            started: 本轮抓取的开始时间；盘中间隔从该时间算起（扣除抓取耗时），
+                     收盘价、净值等定点抓取仍按各自的时间点，不会因抓取耗时提前
+        
+        Returns:
+            等待秒数；未启用时返回 interval（扣除抓取耗时）
+        """
+        now = now or datetime.now()
+        started = started or now
+        if not self.enabled:
+            return max(0.0, interval - (now - started).total_seconds())
+        target = self.next_run_time(interval, started)
+        if target <= now:
+            # 抓取耗时超过了间隔（或跨过了收盘），从当前时间重新计算
+            target = self.next_run_time(interval, now)
+        return max(0.0, (target - now).total_seconds())
+    
+    def next_run_time(self, interval: float, now: datetime = None) -> datetime:
+        """下一次抓取的时间"""
+        now = now or datetime.now()
+        calendar = self.calendar
+        
+        if calendar.is_trading_time(now):
+            # 盘中：开盘后、各时段收盘前加快刷新，其余按基础间隔
+            current = now.time()
+            for start, end in calendar.sessions:
+                if start <= current < end:
+                    session_start = datetime.combine(now.date(), start)
+                    session_end = datetime.combine(now.date(), end)
+                    step = interval
+                    if now - session_start < self.edge or session_end - now <= self.edge:
+                        step = min(interval, self.fast_interval)
+                    return min(now + timedelta(seconds=step), session_end)
+        
+        session_start = calendar.next_session_start(now)
+        wake = session_start - self.pre_open
+        candidates = [wake if wake > now else session_start]
+        today = now.date()
+        if calendar.is_trading_day(today):
+            # 收盘后抓一次收盘价，净值公布后抓一次净值，之后空闲到下一个交易时段
+            post_close = calendar.session_close(today) + self.post_close_delay
+            nav_fetch = datetime.combine(today, dtime(self.nav_fetch_hour, 0))
+            candidates.extend(t for t in (post_close, nav_fetch) if t > now)
+        return max(now, min(candidates))
+
+
+def _create_calendar() -> TradingCalendar:
+    config = DATA_SOURCE.get('trading_schedule', {})
+    return TradingCalendar(calendar_file=config.get('calendar_file', 'trading_calendar.json'))
+
+
+# 全局交易日历（轮询、持续监控和净值存储共用）
+trading_calendar = _create_calendar()
+
+
+def create_scheduler() -> TradingScheduler:
+    """按当前配置创建调度器"""
+    return TradingScheduler(trading_calendar, DATA_SOURCE.get('trading_schedule', {}))
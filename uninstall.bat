@@ -23,7 +23,18 @@ echo.
 echo [2/3] 删除数据文件...
 if exist "users.json" del /q "users.json"
 if exist "arbitrage_records.json" del /q "arbitrage_records.json"
+if exist "arbitrage_records.json.migrated" del /q "arbitrage_records.json.migrated"
+if exist "arbitrage_records.db" del /q "arbitrage_records.db"
+if exist "arbitrage_records.db-wal" del /q "arbitrage_records.db-wal"
+if exist "arbitrage_records.db-shm" del /q "arbitrage_records.db-shm"
 if exist "notifications.json" del /q "notifications.json"
+if exist "notifications.journal" del /q "notifications.journal"
+if exist "nav_store.db" del /q "nav_store.db"
+if exist "trace.log" del /q "trace.log"
+if exist "trading_calendar.json" del /q "trading_calendar.json"
+if exist "fund_universe.json" del /q "fund_universe.json"
+if exist "fund_list_http_cache.json" del /q "fund_list_http_cache.json"
+if exist "fund_names.json" del /q "fund_names.json"
 if exist "user_config.json" del /q "user_config.json"
 if exist "logs" rmdir /s /q "logs"
 if exist "data" rmdir /s /q "data"
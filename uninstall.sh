@@ -37,7 +37,16 @@ echo ""
 echo "[2/3] 删除数据文件..."
 rm -f "$PROJECT_DIR/users.json"
 rm -f "$PROJECT_DIR/arbitrage_records.json"
+rm -f "$PROJECT_DIR/arbitrage_records.json.migrated"
+rm -f "$PROJECT_DIR/arbitrage_records.db" "$PROJECT_DIR/arbitrage_records.db-wal" "$PROJECT_DIR/arbitrage_records.db-shm"
 rm -f "$PROJECT_DIR/notifications.json"
+rm -f "$PROJECT_DIR/notifications.journal"
+rm -f "$PROJECT_DIR/nav_store.db"
+rm -f "$PROJECT_DIR/trace.log"
+rm -f "$PROJECT_DIR/trading_calendar.json"
+rm -f "$PROJECT_DIR/fund_universe.json"
+rm -f "$PROJECT_DIR/fund_list_http_cache.json"
+rm -f "$PROJECT_DIR/fund_names.json"
 rm -f "$PROJECT_DIR/user_config.json"
 rm -rf "$PROJECT_DIR/logs"
 rm -rf "$PROJECT_DIR/data"
@@ -4,27 +4,43 @@
 处理用户注册、登录、密码加密等
 """
 
+import atexit
 import json
 import os
+import threading
 from datetime import datetime
 from typing import Dict, Optional, List
 from werkzeug.security import generate_password_hash, check_password_hash
+from tracing import trace
 
 
 class UserManager:
-    """用户管理器"""
+    """用户管理器
     
-    def __init__(self, data_file: str = "users.json"):
+    用户数据常驻内存（自选基金以有序集合保存），修改后延迟合并写盘：
+    自选基金、设置、登录时间等在 flush_delay 秒内的多次修改只写一次文件；
+    注册、删除、改密码等账号变更立即写盘
+    """
+    
+    def __init__(self, data_file: str = "users.json", flush_delay: float = 1.0):
         """
         初始化用户管理器
         
         Args:
             data_file: 用户数据文件路径
+            flush_delay: 延迟写盘的时间（秒）
         """
         self.data_file = data_file
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        # 写盘锁：保证同一时间只有一个线程写文件
+        self._io_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
         self.users = self._load_users()
         # 如果用户列表为空，创建默认管理员账号
         self._ensure_default_admin()
+        atexit.register(self.flush)
     
     def _load_users(self) -> Dict:
         """加载用户数据"""
@@ -46,70 +62,76 @@ class UserManager:
                             updated = True
                     # 如果有更新，保存回去
                     if updated:
-                        with open(self.data_file, 'w', encoding='utf-8') as f:
-                            json.dump(users, f, ensure_ascii=False, indent=2)
+                        self._write_file(json.dumps(users, ensure_ascii=False, indent=2))
+                    # 自选基金在内存中用 dict 作有序集合（O(1) 判断是否存在，保持添加顺序）
+                    for user_data in users.values():
+                        user_data['favorites'] = dict.fromkeys(user_data['favorites'])
                     return users
             except Exception as e:
                 print(f"加载用户数据失败: {e}")
                 return {}
         return {}
     
-    def _save_users(self):
-        """保存用户数据"""
-        try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.users, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存用户数据失败: {e}")
+    def _write_file(self, content: str):
+        """写入用户数据文件（先写临时文件再替换，避免写到一半时被读取或中断）"""
+        tmp_file = self.data_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+    
+    def _save_users(self, immediate: bool = False):
+        """
+        标记用户数据已修改，延迟 flush_delay 秒后写盘
+        
+        Args:
+            immediate: 是否立即写盘（账号变更）
+        """
+        with self._lock:
+            self._dirty = True
+            if not immediate and self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        if immediate:
+            self.flush()
+    
+    def flush(self):
+        """把已修改的用户数据写盘"""
+        with self._io_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                users = {
+                    username: dict(user_data,
+                                   favorites=list(user_data.get('favorites') or ()),
+                                   settings=dict(user_data.get('settings') or {}))
+                    for username, user_data in list(self.users.items())
+                }
+            try:
+                self._write_file(json.dumps(users, ensure_ascii=False, indent=2))
+            except Exception as e:
+                print(f"保存用户数据失败: {e}")
+                with self._lock:
+                    self._dirty = True
     
     def _ensure_default_admin(self):
         """确保默认管理员账号存在"""
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'A',
-            'location': 'user_manager.py:_ensure_default_admin:entry',
-            'message': '检查默认管理员账号',
-            'data': {
-                'users_count': len(self.users),
-                'admin_exists': 'admin' in self.users,
-                'data_file': self.data_file,
-                'file_exists': os.path.exists(self.data_file)
-            },
-            'timestamp': int(datetime.now().timestamp() * 1000)
-        }
-        try:
-            # 尝试使用项目根目录下的.cursor/debug.log
-            project_root = os.path.dirname(os.path.abspath(self.data_file))
-            log_path = os.path.join(project_root, '.cursor', 'debug.log')
-            os.makedirs(os.path.dirname(log_path), exist_ok=True)
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('user_manager.py:_ensure_default_admin:entry', '检查默认管理员账号', {
+            'users_count': len(self.users),
+            'admin_exists': 'admin' in self.users,
+            'data_file': self.data_file,
+            'file_exists': os.path.exists(self.data_file)
+        })
         
         # 如果用户列表为空或admin不存在，创建默认管理员
         if not self.users or 'admin' not in self.users:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'A',
-                'location': 'user_manager.py:_ensure_default_admin:creating',
-                'message': '创建默认管理员账号',
-                'data': {},
-                'timestamp': int(datetime.now().timestamp() * 1000)
-            }
-            try:
-                project_root = os.path.dirname(os.path.abspath(self.data_file))
-                log_path = os.path.join(project_root, '.cursor', 'debug.log')
-                os.makedirs(os.path.dirname(log_path), exist_ok=True)
-                with open(log_path, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('user_manager.py:_ensure_default_admin:creating', '创建默认管理员账号')
             
             self.users['admin'] = {
                 'username': 'admin',
@@ -118,29 +140,12 @@ class UserManager:
                 'created_at': datetime.now().isoformat(),
                 'last_login': None,
                 'role': 'admin',
-                'favorites': [],
+                'favorites': {},
                 'settings': {}
             }
-            self._save_users()
+            self._save_users(immediate=True)
             
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'A',
-                'location': 'user_manager.py:_ensure_default_admin:created',
-                'message': '默认管理员账号创建成功',
-                'data': {},
-                'timestamp': int(datetime.now().timestamp() * 1000)
-            }
-            try:
-                project_root = os.path.dirname(os.path.abspath(self.data_file))
-                log_path = os.path.join(project_root, '.cursor', 'debug.log')
-                os.makedirs(os.path.dirname(log_path), exist_ok=True)
-                with open(log_path, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('user_manager.py:_ensure_default_admin:created', '默认管理员账号创建成功')
             
             print("已创建默认管理员账号: admin / admin123")
     
@@ -152,49 +157,29 @@ class UserManager:
             username: 用户名
             password: 密码
             email: 邮箱（可选）
-            
+        
         Returns:
             (是否成功, 消息)
         """
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'user_manager.py:register:entry','message':'开始注册验证','data':{'username':username,'usernameLength':len(username) if username else 0,'passwordLength':len(password) if password else 0},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session','hypothesisId':'1,2'})+'\n')
-        # #endregion
+        trace('user_manager.py:register:entry', '开始注册验证', {'username':username,'usernameLength':len(username) if username else 0,'passwordLength':len(password) if password else 0})
         
         # 验证用户名（确保username不是None）
         if not username:
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'user_manager.py:register:username_empty','message':'用户名为空','data':{'username':username},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session','hypothesisId':'1'})+'\n')
-            # #endregion
+            trace('user_manager.py:register:username_empty', '用户名为空', {'username':username})
             return False, "用户名不能为空"
         
         username_stripped = username.strip() if username else ''
         if len(username_stripped) < 3:
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'user_manager.py:register:username_too_short','message':'用户名太短','data':{'username':username,'length':len(username_stripped)},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session','hypothesisId':'1'})+'\n')
-            # #endregion
+            trace('user_manager.py:register:username_too_short', '用户名太短', {'username':username,'length':len(username_stripped)})
             return False, "用户名至少需要3个字符"
         
         if not username_stripped.isalnum():
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'user_manager.py:register:username_invalid','message':'用户名包含非法字符','data':{'username':username,'isalnum':username_stripped.isalnum()},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session','hypothesisId':'1'})+'\n')
-            # #endregion
+            trace('user_manager.py:register:username_invalid', '用户名包含非法字符', {'username':username,'isalnum':username_stripped.isalnum()})
             return False, "用户名只能包含字母和数字"
         
         # 验证密码
         if not password or len(password) < 6:
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'user_manager.py:register:password_too_short','message':'密码太短','data':{'passwordLength':len(password) if password else 0},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session','hypothesisId':'2'})+'\n')
-            # #endregion
+            trace('user_manager.py:register:password_too_short', '密码太短', {'passwordLength':len(password) if password else 0})
             return False, "密码至少需要6个字符"
         
         # 增强密码强度验证
@@ -212,18 +197,10 @@ class UserManager:
         
         # 检查用户名是否已存在
         if username in self.users:
-            # #region agent log
-            with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-                import json
-                f.write(json.dumps({'location':'user_manager.py:register:username_exists','message':'用户名已存在','data':{'username':username},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session','hypothesisId':'5'})+'\n')
-            # #endregion
+            trace('user_manager.py:register:username_exists', '用户名已存在', {'username':username})
             return False, "用户名已存在"
         
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'user_manager.py:register:before_create','message':'创建用户前','data':{'username':username},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session'})+'\n')
-        # #endregion
+        trace('user_manager.py:register:before_create', '创建用户前', {'username':username})
         
         # 创建用户
         self.users[username] = {
@@ -233,23 +210,15 @@ class UserManager:
             'created_at': datetime.now().isoformat(),
             'last_login': None,
             'role': 'user',  # 默认为普通用户
-            'favorites': [],
+            'favorites': {},
             'settings': {}
         }
         
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'user_manager.py:register:before_save','message':'保存用户前','data':{'username':username,'usersCount':len(self.users)},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session'})+'\n')
-        # #endregion
+        trace('user_manager.py:register:before_save', '保存用户前', {'username':username,'usersCount':len(self.users)})
         
-        self._save_users()
+        self._save_users(immediate=True)
         
-        # #region agent log
-        with open('c:\\lof1\\.cursor\\debug.log', 'a', encoding='utf-8') as f:
-            import json
-            f.write(json.dumps({'location':'user_manager.py:register:success','message':'注册成功','data':{'username':username},'timestamp':int(datetime.now().timestamp()*1000),'sessionId':'debug-session'})+'\n')
-        # #endregion
+        trace('user_manager.py:register:success', '注册成功', {'username':username})
         
         return True, "注册成功"
     
@@ -260,111 +229,41 @@ class UserManager:
         Args:
             username: 用户名
             password: 密码
-            
+        
         Returns:
             (是否成功, 消息, 用户信息)
         """
-        # #region agent log
-        import json
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'user_manager.py:login:entry',
-            'message': '开始登录验证',
-            'data': {
-                'username': username,
-                'username_length': len(username) if username else 0,
-                'password_length': len(password) if password else 0,
-                'users_count': len(self.users),
-                'admin_exists': 'admin' in self.users,
-                'username_in_users': username in self.users if username else False
-            },
-            'timestamp': int(datetime.now().timestamp() * 1000)
-        }
-        try:
-            project_root = os.path.dirname(os.path.abspath(self.data_file))
-            log_path = os.path.join(project_root, '.cursor', 'debug.log')
-            os.makedirs(os.path.dirname(log_path), exist_ok=True)
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('user_manager.py:login:entry', '开始登录验证', {
+            'username': username,
+            'username_length': len(username) if username else 0,
+            'password_length': len(password) if password else 0,
+            'users_count': len(self.users),
+            'admin_exists': 'admin' in self.users,
+            'username_in_users': username in self.users if username else False
+        })
         
         if username not in self.users:
-            # #region agent log
-            log_data = {
-                'sessionId': 'debug-session',
-                'runId': 'run1',
-                'hypothesisId': 'B',
-                'location': 'user_manager.py:login:user_not_found',
-                'message': '用户不存在',
-                'data': {
-                    'username': username,
-                    'available_users': list(self.users.keys())
-                },
-                'timestamp': int(datetime.now().timestamp() * 1000)
-            }
-            try:
-                project_root = os.path.dirname(os.path.abspath(self.data_file))
-                log_path = os.path.join(project_root, '.cursor', 'debug.log')
-                os.makedirs(os.path.dirname(log_path), exist_ok=True)
-                with open(log_path, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-            except: pass
-            # #endregion
+            trace('user_manager.py:login:user_not_found', '用户不存在', {
+                'username': username,
+                'available_users': list(self.users.keys())
+            })
             return False, "用户名或密码错误", None
         
         user = self.users[username]
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'user_manager.py:login:before_password_check',
-            'message': '准备验证密码',
-            'data': {
-                'username': username,
-                'has_password_hash': 'password_hash' in user,
-                'password_hash_length': len(user.get('password_hash', '')) if 'password_hash' in user else 0,
-                'password_hash_preview': user.get('password_hash', '')[:30] + '...' if user.get('password_hash') else None
-            },
-            'timestamp': int(datetime.now().timestamp() * 1000)
-        }
-        try:
-            project_root = os.path.dirname(os.path.abspath(self.data_file))
-            log_path = os.path.join(project_root, '.cursor', 'debug.log')
-            os.makedirs(os.path.dirname(log_path), exist_ok=True)
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('user_manager.py:login:before_password_check', '准备验证密码', {
+            'username': username,
+            'has_password_hash': 'password_hash' in user,
+            'password_hash_length': len(user.get('password_hash', '')) if 'password_hash' in user else 0
+        })
         
         # 验证密码
         password_valid = check_password_hash(user['password_hash'], password)
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'user_manager.py:login:password_check_result',
-            'message': '密码验证结果',
-            'data': {
-                'username': username,
-                'password_valid': password_valid
-            },
-            'timestamp': int(datetime.now().timestamp() * 1000)
-        }
-        try:
-            project_root = os.path.dirname(os.path.abspath(self.data_file))
-            log_path = os.path.join(project_root, '.cursor', 'debug.log')
-            os.makedirs(os.path.dirname(log_path), exist_ok=True)
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('user_manager.py:login:password_check_result', '密码验证结果', {
+            'username': username,
+            'password_valid': password_valid
+        })
         
         if not password_valid:
             return False, "用户名或密码错误", None
@@ -382,27 +281,10 @@ class UserManager:
             'role': user.get('role', 'user')  # 默认为普通用户
         }
         
-        # #region agent log
-        log_data = {
-            'sessionId': 'debug-session',
-            'runId': 'run1',
-            'hypothesisId': 'B',
-            'location': 'user_manager.py:login:success',
-            'message': '登录成功',
-            'data': {
-                'username': username,
-                'role': user_info.get('role')
-            },
-            'timestamp': int(datetime.now().timestamp() * 1000)
-        }
-        try:
-            project_root = os.path.dirname(os.path.abspath(self.data_file))
-            log_path = os.path.join(project_root, '.cursor', 'debug.log')
-            os.makedirs(os.path.dirname(log_path), exist_ok=True)
-            with open(log_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_data, ensure_ascii=False) + '\n')
-        except: pass
-        # #endregion
+        trace('user_manager.py:login:success', '登录成功', {
+            'username': username,
+            'role': user_info.get('role')
+        })
         
         return True, "登录成功", user_info
     
@@ -412,7 +294,7 @@ class UserManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             用户信息（不包含密码），如果用户不存在返回None
         """
@@ -428,13 +310,26 @@ class UserManager:
             'role': user.get('role', 'user')  # 默认为普通用户
         }
     
+    def get_role(self, username: str) -> Optional[str]:
+        """
+        获取用户角色（权限检查用，只查内存）
+        
+        Args:
+            username: 用户名
+        
+        Returns:
+            角色（'admin' 或 'user'），用户不存在返回None
+        """
+        user = self.users.get(username)
+        return user.get('role', 'user') if user else None
+    
     def user_exists(self, username: str) -> bool:
         """
         检查用户是否存在
         
         Args:
             username: 用户名
-            
+        
         Returns:
             是否存在
         """
@@ -446,13 +341,13 @@ class UserManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             自选基金代码列表
         """
         if username not in self.users:
             return []
-        return self.users[username].get('favorites', [])
+        return list(self.users[username].get('favorites') or ())
     
     def set_user_favorites(self, username: str, fund_codes: List[str]) -> bool:
         """
@@ -461,15 +356,13 @@ class UserManager:
         Args:
             username: 用户名
             fund_codes: 基金代码列表
-            
+        
         Returns:
             是否成功
         """
         if username not in self.users:
             return False
-        if 'favorites' not in self.users[username]:
-            self.users[username]['favorites'] = []
-        self.users[username]['favorites'] = fund_codes
+        self.users[username]['favorites'] = dict.fromkeys(fund_codes)
         self._save_users()
         return True
     
@@ -480,16 +373,15 @@ class UserManager:
         Args:
             username: 用户名
             fund_code: 基金代码
-            
+        
         Returns:
             是否成功
         """
         if username not in self.users:
             return False
-        if 'favorites' not in self.users[username]:
-            self.users[username]['favorites'] = []
-        if fund_code not in self.users[username]['favorites']:
-            self.users[username]['favorites'].append(fund_code)
+        favorites = self.users[username].setdefault('favorites', {})
+        if fund_code not in favorites:
+            favorites[fund_code] = None
             self._save_users()
         return True
     
@@ -500,16 +392,15 @@ class UserManager:
         Args:
             username: 用户名
             fund_code: 基金代码
-            
+        
         Returns:
             是否成功
         """
         if username not in self.users:
             return False
-        if 'favorites' not in self.users[username]:
-            return True
-        if fund_code in self.users[username]['favorites']:
-            self.users[username]['favorites'].remove(fund_code)
+        favorites = self.users[username].get('favorites')
+        if favorites and fund_code in favorites:
+            del favorites[fund_code]
             self._save_users()
         return True
     
@@ -519,7 +410,7 @@ class UserManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             用户设置字典
         """
@@ -534,7 +425,7 @@ class UserManager:
         Args:
             username: 用户名
             settings: 设置字典
-            
+        
         Returns:
             是否成功
         """
@@ -571,7 +462,7 @@ class UserManager:
         Args:
             username: 用户名
             role: 角色（'admin' 或 'user'）
-            
+        
         Returns:
             是否成功
         """
@@ -580,7 +471,7 @@ class UserManager:
         if role not in ['admin', 'user']:
             return False
         self.users[username]['role'] = role
-        self._save_users()
+        self._save_users(immediate=True)
         return True
     
     def update_user_email(self, username: str, email: str) -> bool:
@@ -590,14 +481,14 @@ class UserManager:
         Args:
             username: 用户名
             email: 邮箱
-            
+        
         Returns:
             是否成功
         """
         if username not in self.users:
             return False
         self.users[username]['email'] = email
-        self._save_users()
+        self._save_users(immediate=True)
         return True
     
     def reset_user_password(self, username: str, new_password: str) -> bool:
@@ -607,7 +498,7 @@ class UserManager:
         Args:
             username: 用户名
             new_password: 新密码
-            
+        
         Returns:
             是否成功
         """
@@ -616,7 +507,7 @@ class UserManager:
         if len(new_password) < 6:
             return False
         self.users[username]['password_hash'] = generate_password_hash(new_password)
-        self._save_users()
+        self._save_users(immediate=True)
         return True
     
     def delete_user(self, username: str) -> bool:
@@ -625,12 +516,12 @@ class UserManager:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             是否成功
         """
         if username not in self.users:
             return False
         del self.users[username]
-        self._save_users()
+        self._save_users(immediate=True)
         return True